@@ -3,5 +3,6 @@ from distutils.core import setup
 
 setup(name='XDE', version='2.0', description='XDE', author='huku',
     author_email='huku@grhack.net', url='https://github.com/huku-/xde',
-    scripts=['bin/xdec'], packages=['xde', 'xde.classifiers'])
+    scripts=['bin/xdec', 'bin/xdebench'],
+    packages=['xde', 'xde.classifiers', 'xde.benchmark'])
 
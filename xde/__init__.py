@@ -6,8 +6,19 @@ __author__ = 'huku <huku@grhack.net>'
 import cpu
 import disassembler
 import instruction
+import instruction_cache
 import basic_block
+import mm_basic_block_index
+import mm_basic_block_table
+import mm_instruction_table
+import mm_section_data
+import mm_superset_table
 import em_shadow_memory
+import mm_shadow_memory
+import section_index
+import jump_tables
+import relocations
 import em_graph
 import classifiers
+import benchmark
 
@@ -11,6 +11,12 @@ About
 -----
 A simple ``cPickle`` friendly class representing a basic block of assembly code.
 
+Basic blocks are stored by the million in external memory dictionaries, so the
+class is kept as compact as possible. Instruction boundaries are kept in an
+``array.array`` of offsets from the basic block's start address and instances
+are pickled as a short binary string; a fixed size header followed by the raw
+offsets array, as returned by :func:`BasicBlock.pack()`.
+
 Classes
 -------
 '''
@@ -18,6 +24,15 @@ Classes
 __author__ = 'huku <huku@grhack.net>'
 
 
+import array
+import struct
+
+
+# Header of packed basic blocks; start address, end address, type code of the
+# offsets array and number of instructions.
+HEADER = struct.Struct('=QQcI')
+
+
 class BasicBlock(object):
     '''
     Represents a basic block in the CFG.
@@ -25,6 +40,8 @@ class BasicBlock(object):
     .. automethod:: __init__
     '''
 
+    __slots__ = ('start_address', 'end_address', 'offsets')
+
     def __init__(self, start_address, end_address, instructions):
         '''
         :param start_address: Address of first instruction in basic block.
@@ -36,7 +53,13 @@ class BasicBlock(object):
         '''
         self.start_address = start_address
         self.end_address = end_address
-        self.instructions = instructions
+
+        # Offsets fit in 16-bits, unless the basic block is really huge.
+        typecode = 'H'
+        if end_address - start_address > 0xffff:
+            typecode = 'I'
+        self.offsets = array.array(typecode,
+            [address - start_address for address in instructions])
 
     def __str__(self):
         return '<BasicBlock %#x-%#x>' % (self.start_address, self.end_address)
@@ -51,3 +74,56 @@ class BasicBlock(object):
     def __contains__(self, address):
         return self.start_address <= address < self.end_address
 
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getstate__(self):
+        return self.pack()
+
+    def __setstate__(self, state):
+        # Basic blocks pickled by older versions carry their attributes in a
+        # dictionary.
+        if isinstance(state, dict):
+            self.__init__(state['start_address'], state['end_address'],
+                state['instructions'])
+        else:
+            self.unpack(state)
+
+
+    @property
+    def instructions(self):
+        '''List of instruction addresses in basic block.'''
+        return [self.start_address + offset for offset in self.offsets]
+
+
+    def get_last_instruction_address(self):
+        '''
+        Get the address of the basic block's last instruction.
+
+        :returns: Address of last instruction.
+        :rtype: ``long``
+        '''
+        return self.start_address + self.offsets[-1]
+
+
+    def pack(self):
+        '''
+        Serialize basic block in a compact binary string.
+
+        :returns: The packed basic block.
+        :rtype: ``str``
+        '''
+        return HEADER.pack(self.start_address, self.end_address,
+            self.offsets.typecode, len(self.offsets)) + self.offsets.tostring()
+
+
+    def unpack(self, data):
+        '''
+        Initialize basic block from a binary string returned by :func:`pack()`.
+
+        :param data: The packed basic block.
+        '''
+        self.start_address, self.end_address, typecode, _ = \
+            HEADER.unpack_from(data)
+        self.offsets = array.array(typecode)
+        self.offsets.fromstring(data[HEADER.size:])
@@ -0,0 +1,7 @@
+#!/usr/bin/env python
+'''benchmark - XDE's benchmarking module.'''
+
+__author__ = 'huku <huku@grhack.net>'
+
+import synthetic
+import benchmark
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+'''
+:mod:`benchmark` - Disassembly throughput measurements
+======================================================
+
+.. module: benchmark
+   :platform: Unix, Windows
+   :synopsis: Disassembly throughput measurements
+.. moduleauthor:: huku <huku@grhack.net>
+
+
+About
+-----
+Measures the time spent in each pass of
+:func:`disassembler.Disassembler.disassemble()` and reports the overall
+throughput and memory usage in a machine readable form, so that runs before and
+after a change can be compared:
+
+.. code-block:: python
+
+   disasm = xde.disassembler.Disassembler('/tmp/synthetic', loader=loader)
+   report = Benchmark(disasm).run()
+   print json.dumps(report, indent=4)
+
+The report is a dictionary holding the following keys:
+
+* **passes** -- Maps the name of each pass in :data:`PASSES` that was executed
+  to the number of seconds spent in it.
+
+* **total** -- Number of seconds spent in
+  :func:`disassembler.Disassembler.disassemble()`.
+
+* **instructions**, **bytes** -- Number of instructions disassembled and number
+  of bytes in the program's executable sections.
+
+* **instructions_per_second**, **bytes_per_second** -- The above divided by
+  **total**.
+
+* **peak_rss** -- Peak resident set size, in bytes, of the benchmarking process
+  and its worker processes, or ``None`` if it can't be measured on this
+  platform.
+
+Passes are timed by shadowing the disassembler's methods with timed wrappers
+for the duration of the run; the disassembler's code is not modified.
+
+
+Classes
+-------
+'''
+
+__author__ = 'huku <huku@grhack.net>'
+
+
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Passes of the disassembly process, in order of execution.
+PASSES = [
+    '_analyze_relocations',
+    '_disassemble_entry_points',
+    '_disassemble_functions',
+    '_disassemble_relocated',
+    '_disassemble_deferred',
+    '_disassemble_orphan',
+    '_build_basic_block_set',
+    '_build_cfg',
+    '_build_function_map'
+]
+
+
+def get_peak_rss():
+    '''
+    Get the peak resident set size of the current process and its terminated
+    children.
+
+    :returns: Peak resident set size in bytes or ``None`` if it can't be
+        measured on this platform.
+    :rtype: ``long``
+    '''
+
+    r = None
+    if resource is not None:
+        r = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+        # Linux reports kilobytes, OS X reports bytes.
+        if sys.platform != 'darwin':
+            r *= 1024
+    return r
+
+
+
+class Benchmark(object):
+    '''
+    Times the passes of a disassembler's :func:`disassemble()` method.
+
+    .. automethod:: __init__
+    .. automethod:: _time_pass
+    '''
+
+    def __init__(self, disassembler):
+        '''
+        :param disassembler: The :class:`disassembler.Disassembler` instance to
+            benchmark. Its :func:`disassemble()` method should not have been
+            called yet.
+        '''
+        self.disassembler = disassembler
+
+        # Maps pass names to seconds spent.
+        self.timings = {}
+
+
+    def _time_pass(self, name):
+        '''
+        Shadow the disassembler's method *name* with a wrapper accumulating the
+        time spent in it in :attr:`timings`.
+
+        :param name: Name of method to time.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        method = getattr(self.disassembler, name)
+
+        def timed(*args, **kwargs):
+            start = time.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.timings[name] = self.timings.get(name, 0.0) + \
+                    time.time() - start
+
+        setattr(self.disassembler, name, timed)
+
+
+
+    def run(self):
+        '''
+        Disassemble the program and report the measurements.
+
+        :returns: The report, as described in the module's documentation.
+        :rtype: ``dict``
+        '''
+
+        disasm = self.disassembler
+
+        self.timings = {}
+        for name in PASSES:
+            self._time_pass(name)
+
+        try:
+            start = time.time()
+            disasm.disassemble()
+            total = time.time() - start
+        finally:
+            for name in PASSES:
+                delattr(disasm, name)
+
+        instructions = len(disasm.instruction_table)
+        size = sum([len(s.data) for s in disasm.loader.sections \
+            if 'x' in s.flags])
+
+        r = {
+            'passes': dict(self.timings),
+            'total': total,
+            'instructions': instructions,
+            'bytes': size,
+            'instructions_per_second': instructions / total if total else None,
+            'bytes_per_second': size / total if total else None,
+            'peak_rss': get_peak_rss()
+        }
+
+        return r
@@ -0,0 +1,536 @@
+#!/usr/bin/env python
+'''
+:mod:`synthetic` - Synthetic S.EX. project generator
+====================================================
+
+.. module: synthetic
+   :platform: Unix, Windows
+   :synopsis: Synthetic S.EX. project generator
+.. moduleauthor:: huku <huku@grhack.net>
+
+
+About
+-----
+Generates synthetic programs of configurable size and shape, so that XDE can be
+benchmarked without a real binary and without the section extractor installed.
+The generated program is served by :class:`SyntheticLoader`, an object offering
+the same interface as the section extractor's loader, which can be passed to
+the constructor of :class:`disassembler.Disassembler`:
+
+.. code-block:: python
+
+   loader = SyntheticLoader(functions=10000, jump_tables=500,
+       relocation_density=0.5, data_in_code=0.05)
+
+   disasm = xde.disassembler.Disassembler('/tmp/synthetic', loader=loader)
+   disasm.disassemble()
+
+Programs are made of functions with the usual prologue and epilogue, whose
+bodies mix plain instructions, direct calls, conditional branches, calls via
+import slots and references to data. The shape of a program is controlled by
+the following parameters:
+
+* **functions** -- Number of functions. The first function is the program's
+  entry point, while each of the others is listed in :attr:`functions` with
+  probability *symbol_ratio*.
+
+* **jump_tables** -- Number of functions holding a ``switch`` statement,
+  compiled as a bounds check on the index register followed by an indirect
+  jump through a jump table in the read-only data section.
+
+* **relocation_density** -- Fraction of the data section's pointer sized slots
+  holding relocated pointers to functions. If 0, the program is not
+  relocatable and no relocations are reported at all, not even for jump
+  tables.
+
+* **data_in_code** -- Fraction of the text section's bytes that are random data
+  placed between functions.
+
+Programs are generated from a seeded pseudo-random number generator, so the
+same parameters always produce the same program. Attribute :attr:`truth` of
+the loader holds the number of instructions and code bytes actually generated.
+
+
+Classes
+-------
+'''
+
+__author__ = 'huku <huku@grhack.net>'
+
+
+import struct
+import random
+
+
+# Base addresses of the generated program's sections.
+TEXT_ADDRESS = 0x401000
+SECTION_ALIGNMENT = 0x1000
+
+# Number of import slots in the GOT section.
+IMPORTS = 64
+
+# Number of pointer sized slots in the data section, per function.
+DATA_SLOTS_PER_FUNCTION = 4
+
+# Number of labels referenced by data references, per function.
+DATA_LABELS_PER_FUNCTION = 2
+
+# Bounds of the number of cases of generated jump tables.
+MIN_CASES = 3
+MAX_CASES = 64
+
+
+# Fixup kinds.
+FIXUP_REL32 = 0         # 32-bit displacement relative to the fixup's end
+FIXUP_ABS32 = 1         # 32-bit absolute address
+
+
+class _Assembler(object):
+    '''
+    Minimal assembler emitting machine code in a buffer. Branches and memory
+    references to labels are recorded as fixups and are resolved once the
+    addresses of all labels are known.
+
+    .. automethod:: __init__
+    '''
+
+    def __init__(self):
+        self.code = bytearray()
+        self.labels = {}
+        self.fixups = []
+        self.instructions = 0
+        self.code_bytes = 0
+
+
+    def label(self, name):
+        '''
+        Define label *name* at the current offset.
+
+        :param name: The label's name.
+        '''
+        self.labels[name] = len(self.code)
+
+
+    def emit(self, data, label=None, kind=FIXUP_REL32):
+        '''
+        Emit an instruction, optionally followed by a 32-bit fixup.
+
+        :param data: The instruction's bytes, up to the fixup.
+        :param label: Name of label the fixup refers to, or ``None``.
+        :param kind: The fixup's kind.
+        '''
+        self.code += data
+        length = len(data)
+        if label is not None:
+            self.fixups.append((len(self.code), label, kind))
+            self.code += '\0\0\0\0'
+            length += 4
+        self.instructions += 1
+        self.code_bytes += length
+
+
+    def emit_data(self, data):
+        '''
+        Emit raw data bytes.
+
+        :param data: The bytes to emit.
+        '''
+        self.code += data
+
+
+    def resolve(self, base, addresses):
+        '''
+        Resolve all fixups.
+
+        :param base: Address where the code will be loaded.
+        :param addresses: Maps labels defined outside the code to addresses.
+        :returns: List of addresses of absolute fixups.
+        :rtype: ``list``
+        '''
+
+        r = []
+        for offset, label, kind in self.fixups:
+            if label in self.labels:
+                target = base + self.labels[label]
+            else:
+                target = addresses[label]
+
+            if kind == FIXUP_REL32:
+                value = target - (base + offset + 4)
+            else:
+                value = target
+                r.append(base + offset)
+
+            self.code[offset:offset + 4] = struct.pack('<I',
+                value & 0xffffffff)
+        return r
+
+
+
+class SyntheticSection(object):
+    '''
+    A section of a synthetic program. Offers the same attributes as the section
+    objects of the section extractor.
+
+    .. automethod:: __init__
+    '''
+
+    def __init__(self, name, start_address, data, flags):
+        '''
+        :param name: The section's name.
+        :param start_address: Address of the section's first byte.
+        :param data: The section's contents.
+        :param flags: Combination of ``'r'``, ``'w'``, ``'x'`` and ``'l'``.
+        '''
+        self.name = name
+        self.start_address = start_address
+        self.end_address = start_address + len(data) - 1
+        self.data = data
+        self.flags = flags
+
+    def __str__(self):
+        return '<SyntheticSection %s %#x-%#x %s>' % (self.name,
+            self.start_address, self.end_address, self.flags)
+
+
+
+class SyntheticLoader(object):
+    '''
+    Generates a synthetic program and serves it with the interface of the
+    section extractor's loader.
+
+    .. automethod:: __init__
+    .. automethod:: _align
+    .. automethod:: _emit_filler
+    .. automethod:: _emit_block
+    .. automethod:: _emit_switch
+    .. automethod:: _emit_function
+    '''
+
+    def __init__(self, functions=1000, jump_tables=100, relocation_density=0.5,
+            data_in_code=0.05, arch='x86_64', symbol_ratio=0.5, seed=0):
+        '''
+        :param functions: Number of functions to generate.
+        :param jump_tables: Number of functions holding a jump table.
+        :param relocation_density: Fraction of data slots holding relocated
+            pointers, 0 for a program that is not relocatable.
+        :param data_in_code: Fraction of the text section's bytes that are
+            data.
+        :param arch: Either ``'i386'`` or ``'x86_64'``.
+        :param symbol_ratio: Probability of a function being listed in
+            :attr:`functions`.
+        :param seed: Seed of the pseudo-random number generator.
+        :raises ValueError: Raised when a parameter is out of range.
+        '''
+
+        if functions < 1:
+            raise ValueError('At least one function is needed')
+
+        if not 0 <= jump_tables <= functions:
+            raise ValueError('Invalid number of jump tables %d' % jump_tables)
+
+        if not 0 <= relocation_density <= 1:
+            raise ValueError('Invalid relocation density %f' % \
+                relocation_density)
+
+        if not 0 <= data_in_code < 1:
+            raise ValueError('Invalid data in code ratio %f' % data_in_code)
+
+        if arch not in ['i386', 'x86_64']:
+            raise ValueError('Unknown architecture "%s"' % arch)
+
+        self.arch = arch
+
+        self._random = random.Random(seed)
+        self._wide = arch == 'x86_64'
+        self._pointer_size = 8 if self._wide else 4
+        self._pointer_fmt = '<Q' if self._wide else '<I'
+
+        # Plain instructions used to fill function bodies. REX.W prefixed
+        # forms are only available in 64-bit mode.
+        rex_w = '\x48' if self._wide else ''
+        self._fillers = [
+            lambda: '\xb8' + struct.pack('<I', self._random.getrandbits(16)),
+            lambda: '\x01\xc8',                     # add eax, ecx
+            lambda: '\x31\xd2',                     # xor edx, edx
+            lambda: '\x89\xc1',                     # mov ecx, eax
+            lambda: '\x85\xc0',                     # test eax, eax
+            lambda: '\x0f\xaf\xc1',                 # imul eax, ecx
+            lambda: '\xc1\xe0\x03',                 # shl eax, 3
+            lambda: '\x0f\xb6\x45\xff',             # movzx eax, byte [xbp-1]
+            lambda: rex_w + '\x89\x45\xf8',         # mov [xbp-8], xax
+            lambda: rex_w + '\x8b\x45\xf8',         # mov xax, [xbp-8]
+            lambda: '\x90'                          # nop
+        ]
+
+        asm = _Assembler()
+
+        # Pick the functions holding jump tables.
+        switches = set(self._random.sample(xrange(functions), jump_tables))
+
+        # Jump tables, as lists of case labels.
+        self._jump_tables = []
+
+        for i in xrange(functions):
+            start = len(asm.code)
+            self._emit_function(asm, i, functions, i in switches)
+
+            # Place data between functions so that they account for the given
+            # fraction of the text section.
+            if data_in_code > 0:
+                size = int((len(asm.code) - start) * data_in_code / \
+                    (1 - data_in_code))
+                asm.emit_data(bytearray(self._random.getrandbits(8) \
+                    for _ in xrange(size)))
+
+        # Lay out data sections after the text section.
+        text_address = TEXT_ADDRESS
+        address = self._align(text_address + len(asm.code))
+
+        # Read-only data section holding the jump tables.
+        addresses = {}
+        rodata_address = address
+        for i, cases in enumerate(self._jump_tables):
+            addresses[('table', i)] = address
+            address += len(cases) * self._pointer_size
+        address = self._align(address)
+
+        # Data section holding random data and pointers to functions; the
+        # targets of data references are picked among its slots.
+        data_address = address
+        data_slots = functions * DATA_SLOTS_PER_FUNCTION
+        for i in xrange(functions * DATA_LABELS_PER_FUNCTION):
+            addresses[('data', i)] = data_address + \
+                self._random.randrange(data_slots) * self._pointer_size
+        address = self._align(address + data_slots * self._pointer_size)
+
+        # GOT section holding the import slots.
+        got_address = address
+        for i in xrange(IMPORTS):
+            addresses[('import', i)] = got_address + i * self._pointer_size
+
+        # Absolute addresses in code are only relocated in 32-bit programs;
+        # 64-bit programs are assumed to be linked at a fixed address, which is
+        # what absolute jump table references require.
+        relocations = asm.resolve(text_address, addresses)
+        if self._wide:
+            relocations = []
+
+        def function_address(i):
+            return text_address + asm.labels[('function', i)]
+
+        # Build the jump tables.
+        rodata = bytearray()
+        for cases in self._jump_tables:
+            for label in cases:
+                relocations.append(rodata_address + len(rodata))
+                rodata += struct.pack(self._pointer_fmt,
+                    text_address + asm.labels[label])
+
+        # Fill the data section; relocated slots point to functions.
+        data = bytearray()
+        for i in xrange(data_slots):
+            if self._random.random() < relocation_density:
+                relocations.append(data_address + len(data))
+                data += struct.pack(self._pointer_fmt,
+                    function_address(self._random.randrange(functions)))
+            else:
+                data += struct.pack(self._pointer_fmt,
+                    self._random.getrandbits(16))
+
+        self.sections = [
+            SyntheticSection('.text', text_address, str(asm.code), 'rxl'),
+            SyntheticSection('.rodata', rodata_address, str(rodata), 'rl'),
+            SyntheticSection('.data', data_address, str(data), 'rwl'),
+            SyntheticSection('.got', got_address,
+                '\0' * (IMPORTS * self._pointer_size), 'rwl')
+        ]
+
+        # Programs without jump tables have no read-only data.
+        self.sections = [s for s in self.sections if len(s.data) > 0]
+
+        # Programs whose data holds no relocated pointers are considered not
+        # relocatable.
+        self.relocations = []
+        if relocation_density > 0:
+            self.relocations = sorted(relocations)
+
+        self.entry_points = [function_address(0)]
+
+        self.functions = [function_address(i) for i in xrange(1, functions) \
+            if self._random.random() < symbol_ratio]
+
+        self.exit_points = [got_address + i * self._pointer_size \
+            for i in xrange(IMPORTS)]
+
+        # Properties of the generated program.
+        self.truth = {
+            'functions': functions,
+            'jump_tables': jump_tables,
+            'instructions': asm.instructions,
+            'code_bytes': asm.code_bytes,
+            'text_bytes': len(asm.code),
+            'relocations': len(self.relocations)
+        }
+
+
+    def __str__(self):
+        return '<SyntheticLoader %s %d functions>' % (self.arch,
+            self.truth['functions'])
+
+
+
+    def _align(self, address):
+        '''
+        Align *address* to the next section boundary.
+
+        :param address: Address to align.
+        :returns: The aligned address.
+        :rtype: ``long``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        return (address + SECTION_ALIGNMENT - 1) & ~(SECTION_ALIGNMENT - 1)
+
+
+    def _emit_filler(self, asm, count):
+        '''
+        Emit *count* random plain instructions.
+
+        :param asm: The assembler to emit instructions with.
+        :param count: Number of instructions to emit.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        for _ in xrange(count):
+            asm.emit(self._random.choice(self._fillers)())
+
+
+    def _emit_block(self, asm, i, functions, j):
+        '''
+        Emit the *j*-th random basic block of the *i*-th function.
+
+        :param asm: The assembler to emit instructions with.
+        :param i: Index of function being emitted.
+        :param functions: Number of functions in the program.
+        :param j: Index of block in the function.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        self._emit_filler(asm, self._random.randint(1, 6))
+
+        kind = self._random.randrange(4)
+
+        # Call another function.
+        if kind == 0:
+            asm.emit('\xe8', ('function', self._random.randrange(functions)))
+
+        # Skip some instructions conditionally.
+        elif kind == 1:
+            asm.emit('\x85\xc0')                            # test eax, eax
+            asm.emit('\x0f\x84', ('skip', i, j))            # jz skip
+            self._emit_filler(asm, self._random.randint(1, 4))
+            asm.label(('skip', i, j))
+
+        # Call an imported function.
+        elif kind == 2:
+            label = ('import', self._random.randrange(IMPORTS))
+            if self._wide:
+                asm.emit('\xff\x15', label)                 # call [rip+import]
+            else:
+                asm.emit('\xff\x15', label, FIXUP_ABS32)    # call [import]
+
+        # Load the address of some data.
+        else:
+            label = ('data', self._random.randrange(functions * \
+                DATA_LABELS_PER_FUNCTION))
+            if self._wide:
+                asm.emit('\x48\x8d\x05', label)             # lea rax, [rip+data]
+            else:
+                asm.emit('\xb8', label, FIXUP_ABS32)        # mov eax, data
+
+
+    def _emit_switch(self, asm, i):
+        '''
+        Emit a ``switch`` statement in the *i*-th function. The index register
+        is bounds checked before jumping through the jump table.
+
+        :param asm: The assembler to emit instructions with.
+        :param i: Index of function being emitted.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        n = self._random.randint(MIN_CASES, MAX_CASES)
+        table = ('table', len(self._jump_tables))
+        cases = [('case', i, k) for k in xrange(n)]
+        self._jump_tables.append(cases)
+
+        asm.emit('\x83\xff' + chr(n - 1))                   # cmp edi, n - 1
+        asm.emit('\x0f\x87', ('default', i))                # ja default
+        asm.emit('\x89\xff')                                # mov edi, edi
+        if self._wide:
+            asm.emit('\xff\x24\xfd', table, FIXUP_ABS32)    # jmp [table+rdi*8]
+        else:
+            asm.emit('\xff\x24\xbd', table, FIXUP_ABS32)    # jmp [table+edi*4]
+
+        for label in cases:
+            asm.label(label)
+            self._emit_filler(asm, self._random.randint(1, 3))
+            asm.emit('\xe9', ('end', i))                    # jmp end
+
+        asm.label(('default', i))
+        self._emit_filler(asm, self._random.randint(1, 3))
+        asm.label(('end', i))
+
+
+    def _emit_function(self, asm, i, functions, switch):
+        '''
+        Emit the *i*-th function.
+
+        :param asm: The assembler to emit instructions with.
+        :param i: Index of function to emit.
+        :param functions: Number of functions in the program.
+        :param switch: If ``True``, the function holds a jump table.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        rex_w = '\x48' if self._wide else ''
+
+        asm.label(('function', i))
+        asm.emit('\x55')                                    # push xbp
+        asm.emit(rex_w + '\x89\xe5')                        # mov xbp, xsp
+        asm.emit(rex_w + '\x83\xec\x20')                    # sub xsp, 0x20
+
+        blocks = self._random.randint(2, 8)
+        for j in xrange(blocks):
+            self._emit_block(asm, i, functions, j)
+            if switch and j == blocks // 2:
+                self._emit_switch(asm, i)
+
+        asm.emit('\xc9')                                    # leave
+        asm.emit('\xc3')                                    # ret
+
+
+
+    def read(self, address, length):
+        '''
+        Read *length* bytes from address *address*.
+
+        :param address: Address to read data from.
+        :param length: Number of bytes to read.
+        :returns: A string of *length* bytes or ``None`` if the bytes are not
+            held by a single section.
+        :rtype: ``str``
+        '''
+
+        r = None
+        for section in self.sections:
+            if section.start_address <= address and \
+                    address + length - 1 <= section.end_address:
+                offset = address - section.start_address
+                r = section.data[offset:offset + length]
+                break
+        return r
@@ -38,6 +38,27 @@ Using this module is straightforward (assuming it's under :file:`classifiers/`):
    c = classifier.Classifier(classifier.CLASSIFIER_NAIVE)
    print c.is_code(insns)
 
+Many instruction streams can be classified in a single call, in which case the
+backend scores all of them at once using vectorized table lookups:
+
+.. code-block:: python
+
+   print c.is_code_many([insns_1, insns_2, insns_3])
+
+Backends are looked up in a registry by their id, so new ones can be plugged in
+using :func:`register_classifier()`. A backend is any object, usually a module,
+that exports the following:
+
+* **WINDOW_SIZE** -- Number of instructions examined by the backend.
+
+* **is_code(insns)** -- Returns ``True`` if the ``list`` of decoded
+  instructions *insns* looks like code.
+
+* **is_code_batch(iclasses, lengths)** -- Vectorized version of ``is_code()``.
+  Receives a two dimensional array holding the instruction classes of a window
+  in each row, and the number of valid elements in each row, and returns a
+  boolean array.
+
 
 [1] https://indefinitestudies.org/2010/12/19/the-halting-problem-for-reverse-engineers/
 
@@ -49,12 +70,74 @@ Classes
 __author__ = 'huku <huku@grhack.net>'
 
 
+import sys
+
+try:
+    import numpy
+except ImportError:
+    sys.exit('NumPy not installed?')
+
 from xde.classifiers import naive
 
 
 CLASSIFIER_NAIVE = 0
 
 
+# Maps classifier ids to classification backends.
+_classifiers = {}
+
+
+def register_classifier(classifier_id, backend):
+    '''
+    Register classification backend *backend* under id *classifier_id*,
+    replacing any backend previously registered under the same id.
+
+    :param classifier_id: Id of the classifier.
+    :param backend: The classification backend.
+    '''
+    _classifiers[classifier_id] = backend
+
+
+def pack_iclasses(iclass_lists, window_size):
+    '''
+    Pack the first *window_size* instruction classes of each ``list`` in
+    *iclass_lists* in a two dimensional array.
+
+    :param iclass_lists: Sequence of ``list`` objects of instruction classes.
+    :param window_size: Number of instruction classes to pack from each
+        ``list``.
+    :returns: Tuple holding the array of instruction classes and the array of
+        the number of valid elements in each of its rows.
+    :rtype: ``tuple``
+    '''
+
+    iclasses = numpy.zeros((len(iclass_lists), window_size), dtype=numpy.uint16)
+    lengths = numpy.zeros(len(iclass_lists), dtype=numpy.intp)
+
+    for i, iclass_list in enumerate(iclass_lists):
+        iclass_list = iclass_list[:window_size]
+        iclasses[i, :len(iclass_list)] = iclass_list
+        lengths[i] = len(iclass_list)
+
+    return iclasses, lengths
+
+
+def pack_windows(insn_lists, window_size):
+    '''
+    Pack the instruction classes of the first *window_size* instructions of each
+    ``list`` in *insn_lists* in a two dimensional array.
+
+    :param insn_lists: Sequence of ``list`` objects of decoded instructions.
+    :param window_size: Number of instructions to pack from each ``list``.
+    :returns: Tuple holding the array of instruction classes and the array of
+        the number of valid elements in each of its rows.
+    :rtype: ``tuple``
+    '''
+    return pack_iclasses([[insn.get_iclass() for insn in insns[:window_size]] \
+        for insns in insn_lists], window_size)
+
+
+
 class Classifier(object):
     '''
     Main classification class.
@@ -66,7 +149,12 @@ class Classifier(object):
         '''
         :param classifier_id: Id of classifier to instantiate and use as backend.
         '''
+
+        if classifier_id not in _classifiers:
+            raise ValueError('Unknown classifier id %r' % classifier_id)
+
         self.classifier_id = classifier_id
+        self.backend = _classifiers[classifier_id]
 
     def is_code(self, insns):
         '''
@@ -76,10 +164,7 @@ class Classifier(object):
         :returns: ``True`` if *insns* look like code, ``False`` otherwise.
         :rtype: ``bool``
         '''
-        r = False
-        if self.classifier_id == CLASSIFIER_NAIVE:
-            r = naive.is_code(insns)
-        return r
+        return self.backend.is_code(insns)
 
     def is_data(self, insns):
         '''
@@ -91,3 +176,46 @@ class Classifier(object):
         '''
         return not(self.is_code(insns))
 
+    def is_code_many(self, insn_lists):
+        '''
+        Determine if each ``list`` in *insn_lists* looks like valid code or
+        data, in a single call to the backend.
+
+        :param insn_lists: Sequence of ``list`` objects of decoded instructions
+            to examine.
+        :returns: Boolean array, ``True`` for instruction lists that look like
+            code and ``False`` otherwise.
+        :rtype: ``numpy.ndarray``
+        '''
+        iclasses, lengths = pack_windows(insn_lists, self.backend.WINDOW_SIZE)
+        return self.backend.is_code_batch(iclasses, lengths)
+
+    def is_data_many(self, insn_lists):
+        '''
+        This is the exact opposite of :func:`is_code_many()` defined above.
+
+        :param insn_lists: Sequence of ``list`` objects of decoded instructions
+            to examine.
+        :returns: Boolean array, ``True`` for instruction lists that look like
+            data and ``False`` otherwise.
+        :rtype: ``numpy.ndarray``
+        '''
+        return ~self.is_code_many(insn_lists)
+
+    def is_code_iclasses(self, iclass_lists):
+        '''
+        Like :func:`is_code_many()`, but examines lists of instruction classes,
+        e.g. as looked up in a superset disassembly table, instead of lists of
+        decoded instructions.
+
+        :param iclass_lists: Sequence of ``list`` objects of instruction classes
+            to examine.
+        :returns: Boolean array, ``True`` for lists that look like code and
+            ``False`` otherwise.
+        :rtype: ``numpy.ndarray``
+        '''
+        iclasses, lengths = pack_iclasses(iclass_lists, self.backend.WINDOW_SIZE)
+        return self.backend.is_code_batch(iclasses, lengths)
+
+
+register_classifier(CLASSIFIER_NAIVE, naive)
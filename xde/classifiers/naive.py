@@ -16,6 +16,10 @@ code or data that was erroneously treated as an instruction stream. The method
 implemented is based on a simple heuristic that tries to guess if the series of
 decoded instructions look like a function prologue or not.
 
+Windows of many candidate instruction streams can be classified at once by
+:func:`is_code_batch()`, which looks up the instruction classes of all windows
+in a boolean mask indexed by instruction class.
+
 Functions
 ---------
 '''
@@ -23,6 +27,13 @@ Functions
 __author__ = 'huku <huku@grhack.net>'
 
 
+import sys
+
+try:
+    import numpy
+except ImportError:
+    sys.exit('NumPy not installed?')
+
 import pyxed
 
 
@@ -78,6 +89,14 @@ PROLOGUE_ICLASSES = [
 ]
 
 
+# Boolean mask of instruction classes in `PROLOGUE_ICLASSES'. The last element
+# is always `False' and stands for all instruction classes beyond the mask.
+PROLOGUE_ICLASS_MASK = numpy.zeros(max(PROLOGUE_ICLASSES) + 2, dtype=numpy.bool_)
+PROLOGUE_ICLASS_MASK[PROLOGUE_ICLASSES] = True
+
+_PROLOGUE_ICLASSES = frozenset(PROLOGUE_ICLASSES)
+
+
 WINDOW_SIZE = 4
 
 
@@ -96,9 +115,32 @@ def is_code(insns):
 
     # Examine at most `WINDOW_SIZE' instructions from the instruction stream.
     for insn in insns[:WINDOW_SIZE]:
-        if insn.get_iclass() not in PROLOGUE_ICLASSES:
+        if insn.get_iclass() not in _PROLOGUE_ICLASSES:
             r = False
             break
 
     return r
 
+
+def is_code_batch(iclasses, lengths):
+    '''
+    Vectorized version of :func:`is_code()`.
+
+    :param iclasses: A two dimensional array holding, in each row, the classes
+        of the first :data:`WINDOW_SIZE` instructions of an instruction stream.
+    :param lengths: Array holding the number of valid elements of each row of
+        *iclasses*.
+    :returns: Boolean array, ``True`` for rows that look like a valid function
+        prologue and ``False`` otherwise.
+    :rtype: ``numpy.ndarray``
+    '''
+
+    # Out of range instruction classes are clipped to the last element of the
+    # mask, which is `False'.
+    r = PROLOGUE_ICLASS_MASK.take(iclasses, mode='clip')
+
+    # Elements beyond each row's length are ignored.
+    r |= numpy.arange(iclasses.shape[1]) >= lengths[:, numpy.newaxis]
+
+    return r.all(axis=1)
+
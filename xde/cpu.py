@@ -30,6 +30,40 @@ X86_MODE_PROTECTED_32BIT = 2
 X86_MODE_PROTECTED_64BIT = 3
 
 
+# General purpose registers grouped by the widest register enclosing them.
+_REGISTER_FAMILIES = [
+    (pyxed.XED_REG_RAX, pyxed.XED_REG_EAX, pyxed.XED_REG_AX, pyxed.XED_REG_AL,
+        pyxed.XED_REG_AH),
+    (pyxed.XED_REG_RBX, pyxed.XED_REG_EBX, pyxed.XED_REG_BX, pyxed.XED_REG_BL,
+        pyxed.XED_REG_BH),
+    (pyxed.XED_REG_RCX, pyxed.XED_REG_ECX, pyxed.XED_REG_CX, pyxed.XED_REG_CL,
+        pyxed.XED_REG_CH),
+    (pyxed.XED_REG_RDX, pyxed.XED_REG_EDX, pyxed.XED_REG_DX, pyxed.XED_REG_DL,
+        pyxed.XED_REG_DH),
+    (pyxed.XED_REG_RBP, pyxed.XED_REG_EBP, pyxed.XED_REG_BP, pyxed.XED_REG_BPL),
+    (pyxed.XED_REG_RSI, pyxed.XED_REG_ESI, pyxed.XED_REG_SI, pyxed.XED_REG_SIL),
+    (pyxed.XED_REG_RDI, pyxed.XED_REG_EDI, pyxed.XED_REG_DI, pyxed.XED_REG_DIL),
+    (pyxed.XED_REG_R8, pyxed.XED_REG_R8D, pyxed.XED_REG_R8W, pyxed.XED_REG_R8B),
+    (pyxed.XED_REG_R9, pyxed.XED_REG_R9D, pyxed.XED_REG_R9W, pyxed.XED_REG_R9B),
+    (pyxed.XED_REG_R10, pyxed.XED_REG_R10D, pyxed.XED_REG_R10W,
+        pyxed.XED_REG_R10B),
+    (pyxed.XED_REG_R11, pyxed.XED_REG_R11D, pyxed.XED_REG_R11W,
+        pyxed.XED_REG_R11B),
+    (pyxed.XED_REG_R12, pyxed.XED_REG_R12D, pyxed.XED_REG_R12W,
+        pyxed.XED_REG_R12B),
+    (pyxed.XED_REG_R13, pyxed.XED_REG_R13D, pyxed.XED_REG_R13W,
+        pyxed.XED_REG_R13B),
+    (pyxed.XED_REG_R14, pyxed.XED_REG_R14D, pyxed.XED_REG_R14W,
+        pyxed.XED_REG_R14B),
+    (pyxed.XED_REG_R15, pyxed.XED_REG_R15D, pyxed.XED_REG_R15W,
+        pyxed.XED_REG_R15B)
+]
+
+# Maps general purpose registers to the widest register enclosing them.
+_ENCLOSING_REGISTERS = dict([(name, family[0]) \
+    for family in _REGISTER_FAMILIES for name in family])
+
+
 class CPU(object):
     '''
     Represents an IA-32 or AMD64 CPU.
@@ -172,3 +206,16 @@ class CPU(object):
 
         return names
 
+
+    def get_register_family(self, name):
+        '''
+        Get the widest general purpose register enclosing register *name*
+        (e.g. ``XED_REG_RAX`` for ``XED_REG_EAX``). Registers sharing the same
+        family alias the same storage, so writing one modifies all others.
+
+        :param name: Name of register whose family to return.
+        :returns: Name of enclosing register, or *name* itself if it's not a
+            general purpose register.
+        :rtype: ``int``
+        '''
+        return _ENCLOSING_REGISTERS.get(name, name)
@@ -19,8 +19,9 @@ The constructor of :class:`Disassembler`, analyzed below, takes the directory
 where the S.EX. [1] project to be analyzed is located. Several external memory
 data structures will be stored at this location:
 
-* **shadow** -- An :class:`em_shadow_memory.EMShadowMemory` instance mapping
-  program addresses to properties (integers).
+* **shadow** -- An :class:`mm_shadow_memory.MMShadowMemory` or, depending on
+  the backend selected, an :class:`em_shadow_memory.EMShadowMemory` instance
+  mapping program addresses to properties (integers).
 
 * **code_xrefs** -- An :class:`em_graph.EMGraph` instance mapping instruction
   addresses to sets of other instruction addresses referenced from them.
@@ -31,6 +32,32 @@ data structures will be stored at this location:
 * **basic_blocks** -- A ``pyrsistence.EMDict`` [2] instance mapping basic block
   addresses to the corresponding :class:`basic_block.BasicBlock` instances.
 
+* **basic_block_table** -- An :class:`mm_basic_block_table.MMBasicBlockTable`
+  instance holding all basic blocks in columnar form, sorted by address. Used
+  for mapping arbitrary addresses to basic blocks and for streaming basic blocks
+  in whole-program passes.
+
+* **probes** -- A ``pyrsistence.EMDict`` instance mapping addresses probed for
+  code to the verdict of the probe and the boundaries of the instructions it
+  decoded, so that the same address is never probed twice.
+
+* **worklist** -- A ``pyrsistence.EMDict`` instance used as a FIFO queue of
+  basic block leaders that were discovered before being analyzed. The deferred
+  disassembly pass drains it, instead of rescanning the executable sections.
+
+* **section_data** -- An :class:`mm_section_data.MMSectionData` instance serving
+  the contents of the program's sections from memory mapped files, to the
+  decoder and the memory readers.
+
+* **superset_table** -- An :class:`mm_superset_table.MMSupersetTable` instance
+  holding the result of decoding an instruction at every byte offset of the
+  executable sections, or ``None`` unless requested. When present, code probes
+  look instructions up in the table instead of decoding them.
+
+* **instruction_table** -- An :class:`mm_instruction_table.MMInstructionTable`
+  instance holding a record for each decoded instruction, so that later passes
+  don't have to decode instructions again.
+
 * **cfg** -- An :class:`em_graph.EMGraph` instance holding the program's CFG.
 
 [1] https://github.com/huku-/sex
@@ -46,14 +73,21 @@ __author__ = 'huku <huku@grhack.net>'
 
 
 import sys
-import struct
+import array
 import time
 
 
+try:
+    import numpy
+except ImportError:
+    sys.exit('NumPy not installed?')
+
+# S.EX. is only needed for loading projects; a loader object offering the same
+# interface may be passed to the constructor instead.
 try:
     import sex
 except ImportError:
-    sys.exit('S.EX. not installed?')
+    sex = None
 
 try:
     import pyxed
@@ -68,8 +102,17 @@ except ImportError:
 
 import cpu
 import instruction
+import instruction_cache
 import basic_block
+import mm_basic_block_table
+import mm_instruction_table
+import mm_section_data
+import mm_superset_table
 import em_shadow_memory
+import mm_shadow_memory
+import section_index
+import jump_tables
+import relocations
 import em_graph
 import classifiers
 
@@ -77,6 +120,60 @@ import classifiers
 DEBUG = True
 
 
+SHADOW_MEMORY_EM = 0        # Shadow memory on external memory lists
+SHADOW_MEMORY_MM = 1        # Shadow memory on memory mapped files
+
+
+# Kinds of control flow transfer, as kept in the dispatch table.
+FLOW_NORMAL = 0         # Doesn't modify the program counter
+FLOW_BRANCH = 1         # Modifies the program counter, may fall through
+FLOW_TERMINATOR = 2     # Unconditionally transfers control elsewhere
+
+
+# Categories of instructions that unconditionally transfer control elsewhere.
+TERMINATOR_CATEGORIES = frozenset([
+    pyxed.XED_CATEGORY_RET,
+    pyxed.XED_CATEGORY_UNCOND_BR
+])
+
+# Forms of direct jumps with relative branch displacement.
+JMP_REL_IFORMS = frozenset([
+    pyxed.XED_IFORM_JMP_RELBRb,
+    pyxed.XED_IFORM_JMP_RELBRd,
+    pyxed.XED_IFORM_JMP_RELBRz
+])
+
+# Forms of indirect near and far jumps with memory operands.
+JMP_MEM_IFORMS = frozenset([
+    pyxed.XED_IFORM_JMP_MEMv,
+    pyxed.XED_IFORM_JMP_FAR_MEMp2
+])
+
+# Forms of direct near calls with relative branch displacement.
+CALL_REL_IFORMS = frozenset([
+    pyxed.XED_IFORM_CALL_NEAR_RELBRz,
+    pyxed.XED_IFORM_CALL_NEAR_RELBRd
+])
+
+# Forms of indirect near and far calls with memory operands.
+CALL_MEM_IFORMS = frozenset([
+    pyxed.XED_IFORM_CALL_NEAR_MEMv,
+    pyxed.XED_IFORM_CALL_FAR_MEMp2
+])
+
+# Native address width for each CPU mode.
+ADDRESS_WIDTHS = {
+    cpu.X86_MODE_REAL: 16,
+    cpu.X86_MODE_PROTECTED_32BIT: 32,
+    cpu.X86_MODE_PROTECTED_64BIT: 64
+}
+
+
+# Maximum number of instructions decoded by code probes that are kept in main
+# memory, for reuse by recursive disassembly.
+PROBE_CACHE_SIZE = 65536
+
+
 def _msg(message):
     '''
     Display a formatted message if :data:`DEBUG` is true.
@@ -95,17 +192,25 @@ class Disassembler(object):
     .. automethod:: __init__
     .. automethod:: _analyze_normal_instruction_memory_operands
     .. automethod:: _disassemble_normal_instruction
-    .. automethod:: _get_jump_table_element
     .. automethod:: _analyze_flow_control_instruction_memory_operand
     .. automethod:: _analyze_flow_control_instruction_memory_operands
     .. automethod:: _disassemble_unconditional_jump_instruction
     .. automethod:: _disassemble_conditional_jump_instruction
     .. automethod:: _disassemble_call_instruction
     .. automethod:: _disassemble_flow_control_instruction
+    .. automethod:: _make_decoder
+    .. automethod:: _get_decoder
+    .. automethod:: _mark_as_basic_block_leader
+    .. automethod:: _pop_basic_block_leader
+    .. automethod:: _get_unique
+    .. automethod:: _get_dispatch_entry
     .. automethod:: _disassemble_instruction
     .. automethod:: _do_recursive_disassembly
     .. automethod:: _do_linear_sweep_disassembly
+    .. automethod:: _do_superset_sweep
+    .. automethod:: _add_probe
     .. automethod:: _is_code
+    .. automethod:: _probe_many
     .. automethod:: _disassemble_entry_points
     .. automethod:: _disassemble_functions
     .. automethod:: _disassemble_relocated
@@ -114,21 +219,65 @@ class Disassembler(object):
     .. automethod:: _build_basic_block_set_for_range
     .. automethod:: _build_basic_block_set
     .. automethod:: _build_cfg
-    .. automethod:: _analyze_relocation
+    .. automethod:: _get_function_addresses
+    .. automethod:: _build_function_map
     .. automethod:: _analyze_relocations
     '''
 
-    def __init__(self, dirname):
+    def __init__(self, dirname, shadow_memory=SHADOW_MEMORY_MM, jobs=1,
+            instruction_cache_size=0, superset=False, loader=None):
         '''
         :param dirname: Path to directory that holds the S.EX. project to be
             analyzed. Several external memory data structures will be stored in
             this directory.
+        :param shadow_memory: Shadow memory backend to use. May be
+            :data:`SHADOW_MEMORY_MM` (the default), or :data:`SHADOW_MEMORY_EM`
+            for projects analyzed with the external memory list backend.
+        :param jobs: Number of worker processes used for building the superset
+            disassembly tables.
+        :param instruction_cache_size: Maximum number of instructions cached by
+            :func:`get_instruction()`, or 0 to disable caching.
+        :param superset: If ``True``, decode an instruction at every byte offset
+            of the executable sections before disassembly starts, using *jobs*
+            worker processes, and serve code probes from the results.
+        :param loader: Loader object to analyze instead of the S.EX. project in
+            *dirname*, e.g. a :class:`benchmark.synthetic.SyntheticLoader`. It
+            should offer the same interface as S.EX.'s ``SexLoader``.
         '''
 
         _msg('Initializing disassembler for S.EX. project "%s"' % dirname)
 
-        # Load project created by "sex.sh".
-        self.loader = sex.sex_loader.SexLoader(dirname)
+        self.dirname = dirname
+        self.jobs = jobs
+
+        # Load project created by "sex.sh", unless a loader was given.
+        if loader is None:
+            if sex is None:
+                sys.exit('S.EX. not installed?')
+            loader = sex.sex_loader.SexLoader(dirname)
+        self.loader = loader
+
+        # Index of the program's sections, used for answering memory protection
+        # queries.
+        self.section_index = section_index.SectionIndex(self.loader.sections)
+
+        # Contents of the program's sections, memory mapped.
+        self.section_data = mm_section_data.MMSectionData('%s/section_data' % \
+            dirname)
+
+        # Addresses reported by the executable's metadata. The loader's
+        # containers are queried in hot paths, so copy them once in containers
+        # whose cost is known; entry points and functions keep the loader's
+        # order, exit points are looked up in a hashed set and relocations in
+        # a sorted array.
+        self._entry_points = self._get_unique(self.loader.entry_points)
+        self._functions = self._get_unique(self.loader.functions)
+        self._exit_points = frozenset(self.loader.exit_points)
+        self._relocations = numpy.unique(numpy.fromiter(self.loader.relocations,
+            dtype=numpy.uint64))
+
+        # True if the binary is relocatable.
+        self._is_relocatable = len(self._relocations) > 0
 
         # Determine the CPU of the target executable.
         if self.loader.arch == 'i386':
@@ -136,26 +285,72 @@ class Disassembler(object):
         elif self.loader.arch == 'x86_64':
             self.cpu = cpu.CPU(cpu.X86_MODE_PROTECTED_64BIT)
 
-        # Initialize `pyxed' based decoder object.
-        self.decoder = pyxed.Decoder()
+        # Machine mode and address width of `pyxed' based decoder objects.
         if self.cpu.mode == cpu.X86_MODE_REAL:
-            self.decoder.set_mode(pyxed.XED_MACHINE_MODE_LEGACY_16,
+            self._decoder_mode = (pyxed.XED_MACHINE_MODE_LEGACY_16,
                 pyxed.XED_ADDRESS_WIDTH_16b)
         elif self.cpu.mode == cpu.X86_MODE_PROTECTED_32BIT:
-            self.decoder.set_mode(pyxed.XED_MACHINE_MODE_LEGACY_32,
+            self._decoder_mode = (pyxed.XED_MACHINE_MODE_LEGACY_32,
                 pyxed.XED_ADDRESS_WIDTH_32b)
         elif self.cpu.mode == cpu.X86_MODE_PROTECTED_64BIT:
-            self.decoder.set_mode(pyxed.XED_MACHINE_MODE_LONG_64,
+            self._decoder_mode = (pyxed.XED_MACHINE_MODE_LONG_64,
                 pyxed.XED_ADDRESS_WIDTH_64b)
 
-        # Initialize external memory list holding program's shadow memory.
+        # Initialize pools of decoder objects, one per section, each seated on
+        # its section's contents once and for all. Recursive disassembly uses
+        # the first pool, while code probes and instruction queries, which may
+        # run in the middle of recursive disassembly, use the second. Decoders
+        # are created on demand by `_get_decoder()', so that sections never
+        # decoded are never mapped.
+        self._decoders = {}
+        self._query_decoders = {}
+
+        # Decoder currently used by recursive disassembly.
+        self.decoder = None
+
+        # Native address width for the CPU mode of the target executable.
+        self._address_width = ADDRESS_WIDTHS[self.cpu.mode]
+
+        # Map flow control instruction categories to their handlers; `None' for
+        # instructions that need no further analysis. Handlers are plain
+        # functions, called as `handler(self, insn)'; bound methods would form
+        # a reference cycle through `self', which has a `__del__()' method and
+        # would, thus, never be collected.
+        self._flow_control_handlers = {
+            pyxed.XED_CATEGORY_CALL: Disassembler._disassemble_call_instruction,
+            pyxed.XED_CATEGORY_UNCOND_BR:
+                Disassembler._disassemble_unconditional_jump_instruction,
+            pyxed.XED_CATEGORY_COND_BR:
+                Disassembler._disassemble_conditional_jump_instruction,
+            pyxed.XED_CATEGORY_RET: None,
+            pyxed.XED_CATEGORY_INTERRUPT: None,
+            pyxed.XED_CATEGORY_SYSCALL: None,
+            pyxed.XED_CATEGORY_SYSRET: None
+        }
+
+        # Dispatch table mapping instruction forms to handlers and kinds of
+        # control flow transfer. Filled in as new forms are encountered; see
+        # `_get_dispatch_entry()'.
+        self._dispatch_table = {}
+
+        # Initialize program's shadow memory using the requested backend.
         # Remember that the section array is sorted by address.
-        self.shadow = em_shadow_memory.EMShadowMemory('%s/shadow' % dirname,
-           [(s.start_address, s.end_address) for s in self.loader.sections])
+        memory_ranges = [(s.start_address, s.end_address) \
+            for s in self.loader.sections]
+        if shadow_memory == SHADOW_MEMORY_EM:
+            self.shadow = em_shadow_memory.EMShadowMemory('%s/shadow' % dirname,
+                memory_ranges)
+        elif shadow_memory == SHADOW_MEMORY_MM:
+            self.shadow = mm_shadow_memory.MMShadowMemory('%s/shadow' % dirname,
+                memory_ranges)
+        else:
+            raise RuntimeError('Unknown shadow memory backend %d' % shadow_memory)
 
         # Initialize graph of code cross references. Maps instruction addresses
-        # to sets of referenced instruction addresses.
-        self.code_xrefs = em_graph.EMGraph('%s/code_xrefs' % dirname)
+        # to sets of referenced instruction addresses. Edges leaving conditional
+        # branches carry a boolean `predicate' attribute.
+        self.code_xrefs = em_graph.EMGraph('%s/code_xrefs' % dirname,
+            edge_columns={'predicate': bool})
 
         # Initialize graph of data cross references. Maps instruction addresses
         # to sets of referenced data addresses.
@@ -165,10 +360,56 @@ class Disassembler(object):
         # to corresponding `BasicBlock' instances.
         self.basic_blocks = pyrsistence.EMDict('%s/basic_blocks' % dirname)
 
+        # Initialize columnar table of basic blocks. Maps arbitrary addresses
+        # to the basic blocks containing them.
+        self.basic_block_table = mm_basic_block_table.MMBasicBlockTable(
+            '%s/basic_block_table' % dirname)
+
+        # Initialize table of code probe verdicts. Maps addresses probed by
+        # `_is_code()' to the verdict and the instruction offsets of the probe.
+        self.probes = pyrsistence.EMDict('%s/probes' % dirname)
+
+        # Instructions decoded by successful code probes, reused when recursive
+        # disassembly reaches them.
+        self._probed_instructions = instruction_cache.InstructionCache(
+            PROBE_CACHE_SIZE)
+
+        # Code/data classifier used by code probes.
+        self.classifier = classifiers.classifier.Classifier()
+
+        # Initialize worklist of unanalyzed basic block leaders. Maps sequence
+        # numbers to leader addresses; the queue's head and tail are recovered
+        # from the keys of a previously saved worklist.
+        self.worklist = pyrsistence.EMDict('%s/worklist' % dirname)
+        self._worklist_head = self._worklist_tail = 0
+        if len(self.worklist):
+            keys = list(self.worklist.keys())
+            self._worklist_head = min(keys)
+            self._worklist_tail = max(keys) + 1
+
+        # Initialize table of decoded instructions. Maps instruction addresses
+        # to records of instruction properties.
+        self.instruction_table = mm_instruction_table.MMInstructionTable(
+            '%s/instruction_table' % dirname)
+
+        # Initialize superset disassembly tables, if requested.
+        self.superset_table = None
+        if superset:
+            self.superset_table = mm_superset_table.MMSupersetTable(
+                '%s/superset_table' % dirname)
+
         # Initialize intra-procedural CFG. Maps basic block addresses to sets of
         # children basic block addresses.
         self.cfg = em_graph.EMGraph('%s/cfg' % dirname)
 
+        # Initialize cache of instructions returned by `get_instruction()'. Cached
+        # instructions are dropped when the shadow memory of their bytes changes.
+        self.instruction_cache = None
+        if instruction_cache_size > 0:
+            self.instruction_cache = instruction_cache.InstructionCache(
+                instruction_cache_size)
+            self.shadow.add_listener(self.instruction_cache.invalidate)
+
 
     def __del__(self):
         '''Wrapper around :func:`close()`.'''
@@ -226,17 +467,9 @@ class Disassembler(object):
         # Get instruction's runtime address.
         runtime_address = insn.runtime_address
 
-        # Get the native address width given the current CPU mode.
-        width_map = {
-            cpu.X86_MODE_REAL: 16,
-            cpu.X86_MODE_PROTECTED_32BIT: 32,
-            cpu.X86_MODE_PROTECTED_64BIT: 64
-        }
-        width = width_map[self.cpu.mode]
-
-        # If the instruction has an unsigned immediate, read it and check if it
-        # looks like an address.
-        if insn.get_immediate_width_bits() == width:
+        # If the instruction has an unsigned immediate of the native address
+        # width, read it and check if it looks like an address.
+        if insn.get_immediate_width_bits() == self._address_width:
 
             # Get instruction's immediate value.
             immediate = insn.get_unsigned_immediate()
@@ -244,14 +477,11 @@ class Disassembler(object):
             # Immediate value looks like an executable memory address.
             if self.is_memory_executable(immediate):
 
-                # True if the binary is relocatable.
-                is_relocatable = len(self.loader.relocations) > 0
-
                 # If the binary is relocatable and the immediate represents an
                 # executable memory address, there should be a leaf relocation
                 # entry for the address in question.
                 if self.shadow.is_marked_as_relocated_leaf(immediate) or \
-                        not is_relocatable:
+                        not self._is_relocatable:
 
                     # Last but not least, the immediate should represent an
                     # address of, what it looks like, executable code. If this
@@ -268,61 +498,18 @@ class Disassembler(object):
         self.code_xrefs.add_edge((runtime_address, next_address))
 
 
-    def _get_jump_table_element(self, address, length):
-        '''
-        Unpack an element of *length* bytes from address *address* and attempt
-        to determine if it's a jump table element or not.
-
-        :param address: Address to unpack a jump table element from.
-        :param length: Length of jump table element to unpack.
-        :returns: The jump table element or ``None``
-        :rtype: ``long``
-
-        .. warning:: This is a private function, don't use it directly.
-        '''
-
-        r = None
-
-        # Maps memory operand sizes of indirect flow control instructions to
-        # format strings corresponding to the native address width.
-        fmt_map = {
-            4: 'I',     # 32-bit EIP
-            6: '=HI',   # 48-bit pointer (CS+EIP for far branching)
-            8: 'Q',     # 64-bit RIP
-            10: '=HQ'   # 80-bit pointer (CS+RIP for far branching)
-        }
-
-        # Get memory operand's format (shouldn't throw an exception).
-        fmt = fmt_map[length]
-
-        # True if the binary is relocatable.
-        is_relocatable = len(self.loader.relocations) > 0
-
-        # If the binary is relocatable, the memory displacement should have been
-        # marked as relocated.
-        if self.shadow.is_marked_as_relocated(address) or not is_relocatable:
-
-            # Unpack one element from memory.
-            data = self.read_memory(address, length)
-            element = long(struct.unpack(fmt, data)[-1])
-
-            # If the binary is relocatable, the unpacked jump table element should
-            # have been marked as relocatable leaf.
-            if self.shadow.is_marked_as_relocated_leaf(element) or \
-                    not is_relocatable:
-
-                # Last but not least, the jump table element should point to an
-                # executable memory address.
-                if self.is_memory_executable(element):
-                    r = element
-        return r
-
-
     def _analyze_flow_control_instruction_memory_operand(self, insn, i):
         '''
         Analyze the *i*-th memory operand of a flow control instruction. The
         sets of code and data cross references are updated accordingly.
 
+        If the memory operand has an index register, its displacement is
+        considered to be the base of a jump table. When the table's bound can be
+        inferred by :func:`jump_tables.get_bound()`, exactly that many elements
+        are read, otherwise elements are read in chunks of
+        :data:`jump_tables.CHUNK_SIZE` until one that doesn't look like a jump
+        table element is found.
+
         :param insn: Instruction object whose memory operand will be analyzed.
         :param i: Index of memory operand of *insn* to be analyzed.
 
@@ -338,38 +525,57 @@ class Disassembler(object):
         displacement = insn.get_memory_displacement(i)
         length = insn.get_memory_operand_length(i)
 
-        # Start unpacking elements from the given memory displacement to discover
-        # possible jump table elements.
-        while self.is_memory_mapped(displacement):
-
-            # This is not a pointer to an imported symbol. Analyze possible jump
-            # table element.
-            if displacement not in self.loader.exit_points:
-
-                # Attempt to read a jump table element.
-                element = self._get_jump_table_element(displacement, length)
-
-                # If no jump table element was recovered, break.
-                if not element:
-                    break
+        # If we don't have an index register, there's only one element in the
+        # jump table.
+        bound = 1
+        if index_reg != pyxed.XED_REG_INVALID:
+            bound = jump_tables.get_bound(self, insn, index_reg)
 
-                # Add jump table element in code cross references and mark it as
-                # a basic block leader.
-                self.code_xrefs.add_edge((runtime_address, element))
-                self.shadow.mark_as_basic_block_leader(element)
+        count = bound or jump_tables.CHUNK_SIZE
+        while True:
 
-            # Looks like a pointer to an imported symbol, just add it in the set
-            # of code cross references.
-            else:
-                self.code_xrefs.add_edge((runtime_address, displacement))
+            # Read the next `count' possible jump table elements at once.
+            addresses = numpy.uint64(displacement) + \
+                numpy.arange(count, dtype=numpy.uint64) * numpy.uint64(scale)
+            mapped = self.is_memory_mapped_many(addresses)
+            valid, elements = jump_tables.get_elements(self, addresses, length)
+
+            for j in xrange(count):
+
+                address = long(addresses[j])
+                if not mapped[j]:
+                    return
+
+                # This is not a pointer to an imported symbol. Analyze possible
+                # jump table element.
+                if address not in self._exit_points:
+
+                    # If the binary is relocatable, the element should have been
+                    # marked as relocated and should point to an address marked
+                    # as relocated leaf.
+                    element = long(elements[j])
+                    shadow = self.shadow
+                    if not valid[j] or element == 0 or \
+                            (self._is_relocatable and \
+                                (not shadow.is_marked_as_relocated(address) or \
+                                not shadow.is_marked_as_relocated_leaf(element))):
+                        return
+
+                    # Add jump table element in code cross references and mark
+                    # it as a basic block leader.
+                    self.code_xrefs.add_edge((runtime_address, element))
+                    self._mark_as_basic_block_leader(element)
+
+                # Looks like a pointer to an imported symbol, just add it in the
+                # set of code cross references.
+                else:
+                    self.code_xrefs.add_edge((runtime_address, address))
 
-            # If we don't have an index register, there's only one element in
-            # the jump table.
-            if index_reg == pyxed.XED_REG_INVALID:
-                break
+            # Stop at the bound, if known, otherwise read the next chunk.
+            if bound is not None:
+                return
 
-            # Memory displacement should be increased by scale.
-            displacement += scale
+            displacement += count * scale
 
 
     def _analyze_flow_control_instruction_memory_operands(self, insn):
@@ -415,17 +621,16 @@ class Disassembler(object):
         iform = insn.get_iform()
 
         # Handle direct jumps with relative branch displacement.
-        if iform in [pyxed.XED_IFORM_JMP_RELBRb, pyxed.XED_IFORM_JMP_RELBRd,
-                pyxed.XED_IFORM_JMP_RELBRz]:
+        if iform in JMP_REL_IFORMS:
 
             # Mark jump target as basic block leader.
             displacement = insn.get_branch_displacement()
             if self.is_memory_executable(displacement):
                 self.code_xrefs.add_edge((runtime_address, displacement))
-                self.shadow.mark_as_basic_block_leader(displacement)
+                self._mark_as_basic_block_leader(displacement)
 
         # Handle indirect near and far jumps with memory operands.
-        elif iform in [pyxed.XED_IFORM_JMP_MEMv, pyxed.XED_IFORM_JMP_FAR_MEMp2]:
+        elif iform in JMP_MEM_IFORMS:
             self._analyze_flow_control_instruction_memory_operands(insn)
 
         # We can't do anything for indirect jumps with register operand.
@@ -439,7 +644,7 @@ class Disassembler(object):
             displacement = insn.get_branch_displacement()
             if self.is_memory_executable(displacement):
                 self.code_xrefs.add_edge((runtime_address, displacement))
-                self.shadow.mark_as_basic_block_leader(displacement)
+                self._mark_as_basic_block_leader(displacement)
 
         elif iform == pyxed.XED_IFORM_XABORT_IMMb:
             pass
@@ -470,14 +675,14 @@ class Disassembler(object):
                 edge = (runtime_address, displacement)
                 self.code_xrefs.add_edge(edge)
                 self.code_xrefs.add_edge_attribute(edge, 'predicate', True)
-                self.shadow.mark_as_basic_block_leader(displacement)
+                self._mark_as_basic_block_leader(displacement)
 
         # Next instruction is also a basic block leader.
         next_address = insn.get_next_instruction_address()
         edge = (runtime_address, next_address)
         self.code_xrefs.add_edge(edge)
         self.code_xrefs.add_edge_attribute(edge, 'predicate', False)
-        self.shadow.mark_as_basic_block_leader(next_address)
+        self._mark_as_basic_block_leader(next_address)
 
 
     def _disassemble_call_instruction(self, insn):
@@ -497,8 +702,7 @@ class Disassembler(object):
         iform = insn.get_iform()
 
         # Handle direct near calls with relative branch displacement.
-        if iform in [pyxed.XED_IFORM_CALL_NEAR_RELBRz,
-                pyxed.XED_IFORM_CALL_NEAR_RELBRd]:
+        if iform in CALL_REL_IFORMS:
 
             # Calls to the immediately following instruction are used by several
             # compilers (e.g. LLVM) in PIC code for reading the value of the
@@ -510,17 +714,15 @@ class Disassembler(object):
 
                 # Otherwise, mark it as function.
                 self.code_xrefs.add_edge((runtime_address, displacement))
-                self.shadow.mark_as_function(displacement)
+                self._mark_as_basic_block_leader(displacement, function=True)
 
         # Handle indirect near and far calls with memory operands.
-        elif iform in [pyxed.XED_IFORM_CALL_NEAR_MEMv,
-                pyxed.XED_IFORM_CALL_FAR_MEMp2]:
-
+        elif iform in CALL_MEM_IFORMS:
             self._analyze_flow_control_instruction_memory_operands(insn)
 
             # Mark all callees as functions.
             for address in self.code_xrefs.get_successors(runtime_address):
-                self.shadow.mark_as_function(address)
+                self._mark_as_basic_block_leader(address, function=True)
 
         # We can't do anything for indirect calls with register operand.
         elif iform == pyxed.XED_IFORM_CALL_NEAR_GPRv:
@@ -532,7 +734,8 @@ class Disassembler(object):
             # Ignore possible change in segment.
             displacement = insn.get_branch_displacement()
             if self.is_memory_executable(displacement):
-                self.shadow.mark_as_function(displacement)
+                self.code_xrefs.add_edge((runtime_address, displacement))
+                self._mark_as_basic_block_leader(displacement, function=True)
 
         else:
             raise RuntimeError('Unknown call instruction form "%s"' % \
@@ -557,30 +760,163 @@ class Disassembler(object):
 
         category = insn.get_category()
 
-        if category == pyxed.XED_CATEGORY_CALL:
-            self._disassemble_call_instruction(insn)
+        if category not in self._flow_control_handlers:
+            raise RuntimeError('Unknown flow control instruction "%s"' % \
+                insn.dump_intel_format())
 
-        elif category == pyxed.XED_CATEGORY_UNCOND_BR:
-            self._disassemble_unconditional_jump_instruction(insn)
+        handler = self._flow_control_handlers[category]
+        if handler is not None:
+            handler(self, insn)
 
-        elif category == pyxed.XED_CATEGORY_COND_BR:
-            self._disassemble_conditional_jump_instruction(insn)
 
-        elif category == pyxed.XED_CATEGORY_RET:
-            pass
+    def _get_unique(self, addresses):
+        '''
+        Return the distinct elements of *addresses* in order of first
+        appearance.
 
-        elif category == pyxed.XED_CATEGORY_INTERRUPT:
-            pass
+        :param addresses: Iterable of addresses.
+        :returns: Tuple of distinct addresses.
+        :rtype: ``tuple``
 
-        elif category == pyxed.XED_CATEGORY_SYSCALL:
-            pass
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        seen = set()
+        r = []
+        for address in addresses:
+            if address not in seen:
+                seen.add(address)
+                r.append(address)
+        return tuple(r)
 
-        elif category == pyxed.XED_CATEGORY_SYSRET:
-            pass
 
+    def _make_decoder(self, section):
+        '''
+        Create a decoder object for the instructions of section *section*. The
+        decoder is handed the memory mapped contents of the section.
+
+        :param section: The section whose instructions will be decoded.
+        :returns: The decoder object.
+        :rtype: ``pyxed.Decoder``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        decoder = pyxed.Decoder()
+        decoder.set_mode(*self._decoder_mode)
+        decoder.itext = self.section_data.get_buffer(section)
+        decoder.runtime_address = section.start_address
+        return decoder
+
+
+    def _get_decoder(self, address, decoders):
+        '''
+        Return the decoder of the section holding *address* from the pool of
+        decoders *decoders*, ready to decode the instruction at *address*.
+
+        :param address: Address of instruction to decode next.
+        :param decoders: Pool of decoders to pick the decoder from.
+        :returns: The decoder object.
+        :rtype: ``pyxed.Decoder``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        section = self.section_index.get_section(address)
+
+        decoder = decoders.get(section.start_address)
+        if decoder is None:
+            decoder = decoders[section.start_address] = \
+                self._make_decoder(section)
+
+        decoder.itext_offset = address - section.start_address
+        return decoder
+
+
+    def _mark_as_basic_block_leader(self, address, function=False):
+        '''
+        Mark *address* as a basic block leader and, if it hasn't been analyzed
+        yet, push it in the worklist of the deferred disassembly pass. All marks
+        that make an address a basic block leader, function entry points
+        included, should go through this function, so that no leader is left
+        undisassembled.
+
+        :param address: Address to mark as basic block leader.
+        :param function: If ``True``, also mark *address* as function entry
+            point.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        if function:
+            self.shadow.mark_as_function(address)
         else:
-            raise RuntimeError('Unknown flow control instruction "%s"' % \
-                insn.dump_intel_format())
+            self.shadow.mark_as_basic_block_leader(address)
+        if not self.shadow.is_marked_as_analyzed(address):
+            self.worklist[self._worklist_tail] = address
+            self._worklist_tail += 1
+
+
+    def _pop_basic_block_leader(self):
+        '''
+        Pop the next basic block leader from the worklist of the deferred
+        disassembly pass.
+
+        :returns: Address of basic block leader or ``None`` if the worklist is
+            empty.
+        :rtype: ``long``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        address = None
+        if self._worklist_head < self._worklist_tail:
+            address = self.worklist[self._worklist_head]
+            del self.worklist[self._worklist_head]
+            self._worklist_head += 1
+        return address
+
+
+    def _get_dispatch_entry(self, insn):
+        '''
+        Return the dispatch table entry for the form of instruction *insn*. An
+        instruction's form determines its operands, hence whether it modifies
+        the program counter, and its category. Each form is thus classified the
+        first time it's encountered, and the result is reused for all other
+        instructions of the same form.
+
+        :param insn: Instruction object whose entry to return.
+        :returns: Tuple holding the function that analyzes *insn*, called as
+            ``handler(self, insn)``, or ``None``, and the kind of control flow
+            transfer performed by *insn*.
+        :rtype: ``tuple``
+        :raises RuntimeError: Raised when an unknown flow control instruction is
+            encountered.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        iform = insn.get_iform()
+        entry = self._dispatch_table.get(iform)
+        if entry is None:
+            category = insn.get_category()
+
+            # Distinguish between instructions that modify the program counter
+            # and those that don't (referred to as "normal" here).
+            if insn.writes_program_counter():
+                if category not in self._flow_control_handlers:
+                    raise RuntimeError('Unknown flow control instruction "%s"' % \
+                        insn.dump_intel_format())
+                handler = self._flow_control_handlers[category]
+                kind = FLOW_BRANCH
+                if category in TERMINATOR_CATEGORIES:
+                    kind = FLOW_TERMINATOR
+            else:
+                handler = Disassembler._disassemble_normal_instruction
+                kind = FLOW_NORMAL
+                if category in TERMINATOR_CATEGORIES:
+                    kind = FLOW_TERMINATOR
+
+            entry = self._dispatch_table[iform] = (handler, kind)
+
+        return entry
 
 
     def _disassemble_instruction(self):
@@ -593,20 +929,33 @@ class Disassembler(object):
         .. warning:: This is a private function, don't use it directly.
         '''
 
-        insn = self.decoder.decode()
+        decoder = self.decoder
+
+        # Reuse the instruction if it was decoded by a code probe, otherwise
+        # decode it now.
+        insn = None
+        if len(self._probed_instructions):
+            insn = self._probed_instructions.get(decoder.runtime_address + \
+                decoder.itext_offset)
+            if insn is not None:
+                decoder.itext_offset += insn.get_length()
+
+        if insn is None:
+            insn = decoder.decode()
+            if insn is not None:
+                # Wrap `pyxed.Instruction' into an `instruction.Instruction'.
+                insn = instruction.Instruction(insn, self.cpu)
+
         if insn is not None:
             # print insn.dump_intel_format()
 
-            # Wrap `pyxed.Instruction' into an `instruction.Instruction'.
-            insn = instruction.Instruction(insn, self.cpu)
+            # Look up the function that analyzes instructions of this form.
+            handler, kind = self._get_dispatch_entry(insn)
+            if handler is not None:
+                handler(self, insn)
 
-            # Distinguish between instructions that modify the program counter
-            # and those that don't (referred to as "normal" here).
-            written_registers = insn.get_written_registers()
-            if self.cpu.get_program_counter_name() in written_registers:
-                self._disassemble_flow_control_instruction(insn)
-            else:
-                self._disassemble_normal_instruction(insn)
+            # Keep a record of the instruction's properties.
+            self.instruction_table.add(insn, kind != FLOW_NORMAL)
 
             # Mark instruction address range as analyzed code.
             length = insn.get_length()
@@ -638,15 +987,12 @@ class Disassembler(object):
 
             # Don't analyze regions already analyzed and skip code that transfers
             # control outside the executable.
-            if self.shadow.is_marked_as_analyzed(address) or \
-                    address in self.loader.exit_points:
+            if address in self._exit_points or \
+                    self.shadow.is_marked_as_analyzed(address):
                 continue
 
-            # Setup decoder's input.
-            section = self.loader.get_section_for_address_range(address)
-            self.decoder.itext = section.data
-            self.decoder.itext_offset = address - section.start_address
-            self.decoder.runtime_address = section.start_address
+            # Pick the decoder of the section holding `address'.
+            self.decoder = self._get_decoder(address, self._decoders)
 
             # The following loop performs a linear sweep disassembly until an
             # instruction that unconditionally modifies the program counter is
@@ -667,8 +1013,8 @@ class Disassembler(object):
                             stack.append(address)
 
                     # If it unconditionally modifies the program counter, break.
-                    if insn.get_category() in [pyxed.XED_CATEGORY_RET,
-                            pyxed.XED_CATEGORY_UNCOND_BR]:
+                    if self._dispatch_table[insn.get_iform()][1] == \
+                            FLOW_TERMINATOR:
                         break
 
                     # If next instruction has already been analyzed, break.
@@ -688,11 +1034,11 @@ class Disassembler(object):
             # If we have successfully disassembled linearly from `start_address'
             # without raising an exception, mark it as a basic block leader.
             if not error:
-                self.shadow.mark_as_basic_block_leader(start_address)
+                self._mark_as_basic_block_leader(start_address)
 
 
 
-    def _do_linear_sweep_disassembly(self, address):
+    def _do_linear_sweep_disassembly(self, address, classify=True):
         '''
         Starts a linear sweep disassembly from instruction at address *address*.
         This function is mainly used to verify that *address* marks, in fact,
@@ -702,26 +1048,19 @@ class Disassembler(object):
         performs various sanity checks on the disassembled instruction stream.
 
         :param address: Address to start linear sweep disassembly from.
-        :returns: ``True`` if *address* marks a valid code region, ``False``
-            otherwise.
-        :rtype: ``bool``
+        :param classify: If ``False``, the disassembled instruction stream is not
+            passed to the code/data classifier.
+        :returns: Tuple holding ``True`` if *address* marks a valid code region,
+            ``False`` otherwise, and the list of disassembled instructions.
+        :rtype: ``tuple``
 
         .. warning:: This is a private function, don't use it directly.
         '''
 
-        # Get section object for address `address'.
-        section = self.loader.get_section_for_address_range(address)
-
-        # Keep a reference to the decoder object.
-        decoder = self.decoder
-
-        # Save decoder's state.
-        state = decoder.itext, decoder.itext_offset, decoder.runtime_address
-
-        # Modify decoder's state.
-        decoder.itext = section.data
-        decoder.itext_offset = address - section.start_address
-        decoder.runtime_address = section.start_address
+        # Pick the decoder of the section holding `address'. Probes may run in
+        # the middle of recursive disassembly, so, use a decoder other than the
+        # one in `self.decoder'.
+        decoder = self._get_decoder(address, self._query_decoders)
 
         # List of disassembled instructions.
         insns = []
@@ -768,19 +1107,75 @@ class Disassembler(object):
 
             # Instruction modifies the program counter unconditionally, we don't
             # know what lies beyond. Stop linear sweep and break.
-            if category in [pyxed.XED_CATEGORY_UNCOND_BR, pyxed.XED_CATEGORY_RET]:
+            if category in TERMINATOR_CATEGORIES:
                 break
 
-        # Restore decoder's state.
-        decoder.itext, decoder.itext_offset, decoder.runtime_address = state
-
-        # Use classification only if not error.
-        if not error:
-            # Instantiate classifier and set the error flag if not code.
-            error = classifiers.classifier.Classifier().is_data(insns)
+        # Use classification only if not error; set the error flag if not code.
+        if classify and not error:
+            error = self.classifier.is_data(insns)
 
         # Return sucess if the error flag is not set.
-        return not error
+        return not error, insns
+
+
+    def _do_superset_sweep(self, address):
+        '''
+        Counterpart of :func:`_do_linear_sweep_disassembly()` that follows the
+        instruction stream starting at *address* in the superset disassembly
+        table, instead of decoding it. The same sanity checks are performed,
+        but the instruction stream is not classified.
+
+        :param address: Address to start linear sweep disassembly from.
+        :returns: Tuple holding ``True`` if *address* marks a valid code region,
+            ``False`` otherwise, the list of instruction addresses and the list
+            of instruction classes in the stream.
+        :rtype: ``tuple``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        section = self.section_index.get_section(address)
+        records = self.superset_table.get_records(section)
+
+        addresses = []
+        iclasses = []
+
+        # Sections with no contents have no table.
+        if records is None:
+            return True, addresses, iclasses
+
+        offset = address - section.start_address
+
+        error = False
+        while offset < len(records):
+
+            # Make sure we have a valid instruction.
+            target, iclass, length, category = records[offset].item()
+            if length == 0:
+                error = True
+                break
+
+            runtime_address = section.start_address + offset
+            addresses.append(runtime_address)
+            iclasses.append(iclass)
+
+            # Instruction bytes should not overlap with a data region.
+            if self.shadow.is_marked_as_data(runtime_address, length):
+                error = True
+                break
+
+            # Branch displacement, if any, should point to executable memory.
+            if target and not self.is_memory_executable(target):
+                error = True
+                break
+
+            # Instruction modifies the program counter unconditionally.
+            if category in TERMINATOR_CATEGORIES:
+                break
+
+            offset += length
+
+        return not error, addresses, iclasses
 
 
     def _is_code(self, address):
@@ -808,10 +1203,101 @@ class Disassembler(object):
         r = False
         if not self.shadow.is_marked_as_data(address) and \
                 self.is_memory_executable(address):
-            r = self._do_linear_sweep_disassembly(address)
+
+            # Reuse the verdict of a previous probe. Data marks are never
+            # removed, so, negative verdicts are final, while positive ones
+            # hold as long as none of the probed instructions has been marked
+            # as data since.
+            if address in self.probes:
+                r, offsets = self.probes[address]
+                if r:
+                    for offset in offsets:
+                        if self.shadow.is_marked_as_data(address + offset):
+                            r = False
+                            self.probes[address] = (r, None)
+                            break
+
+            # Otherwise, probe address and remember the verdict.
+            elif self.superset_table is not None:
+                r, addresses, iclasses = self._do_superset_sweep(address)
+                if r:
+                    r = bool(self.classifier.is_code_iclasses([iclasses])[0])
+                self._add_probe(address, r, addresses)
+
+            else:
+                r, insns = self._do_linear_sweep_disassembly(address)
+                self._add_probe(address, r,
+                    [insn.runtime_address for insn in insns], insns)
+
         return r
 
 
+    def _add_probe(self, address, r, addresses, insns=()):
+        '''
+        Remember the verdict of a code probe. Instructions decoded by successful
+        probes are kept around, as they are likely to be disassembled soon.
+
+        :param address: Probed address.
+        :param r: ``True`` if *address* holds executable code, ``False``
+            otherwise.
+        :param addresses: List of addresses of the instructions in the probed
+            instruction stream.
+        :param insns: List of instructions decoded by the probe, if any.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        offsets = None
+        if r:
+            offsets = array.array('I', [a - address for a in addresses])
+            for insn in insns:
+                self._probed_instructions.put(insn.runtime_address, insn)
+        self.probes[address] = (r, offsets)
+
+
+    def _probe_many(self, addresses):
+        '''
+        Probe all addresses in *addresses* for executable code, classifying the
+        disassembled instruction streams in a single call to the code/data
+        classifier. Verdicts are remembered, so that subsequent calls to
+        :func:`_is_code()` don't have to probe again.
+
+        :param addresses: List of addresses to probe.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        # Linearly disassemble from addresses not probed yet, using the superset
+        # disassembly table if available.
+        probes = []
+        for address in addresses:
+            if address not in self.probes and \
+                    not self.shadow.is_marked_as_data(address) and \
+                    self.is_memory_executable(address):
+
+                if self.superset_table is not None:
+                    r, insn_addresses, iclasses = \
+                        self._do_superset_sweep(address)
+                    insns = ()
+                else:
+                    r, insns = self._do_linear_sweep_disassembly(address,
+                        classify=False)
+                    insn_addresses = [insn.runtime_address for insn in insns]
+                    iclasses = [insn.get_iclass() for insn in insns]
+
+                if r:
+                    probes.append((address, insn_addresses, iclasses, insns))
+                else:
+                    self._add_probe(address, r, insn_addresses, insns)
+
+        # Classify all instruction streams that were disassembled successfully.
+        if len(probes):
+            verdicts = self.classifier.is_code_iclasses([p[2] for p in probes])
+            for (address, insn_addresses, _, insns), r in \
+                    zip(probes, verdicts.tolist()):
+                self._add_probe(address, r, insn_addresses, insns)
+
+
     def _disassemble_entry_points(self):
         '''
         Start recursive disassembly from each entry point.
@@ -820,8 +1306,8 @@ class Disassembler(object):
         '''
 
         _msg('Disassembling entry points')
-        for entry_point in self.loader.entry_points:
-            self.shadow.mark_as_function(entry_point)
+        for entry_point in self._entry_points:
+            self._mark_as_basic_block_leader(entry_point, function=True)
             self._do_recursive_disassembly(entry_point)
 
 
@@ -834,18 +1320,19 @@ class Disassembler(object):
         '''
 
         _msg('Disassembling functions')
-        for address in self.loader.functions:
+        self._probe_many(self._functions)
+        for address in self._functions:
             # Looks like function tables in PE executables, sometimes, mark jump
             # tables, as well as other data regions in executable segments, as
             # function entry points.
             if self._is_code(address):
-                self.shadow.mark_as_function(address)
+                self._mark_as_basic_block_leader(address, function=True)
                 self._do_recursive_disassembly(address)
 
         # Also mark exit points as function entry points.
-        for address in self.loader.exit_points:
+        for address in self._exit_points:
             self.shadow.mark_as_analyzed(address)
-            self.shadow.mark_as_function(address)
+            self._mark_as_basic_block_leader(address, function=True)
 
 
     def _disassemble_relocated(self):
@@ -860,17 +1347,23 @@ class Disassembler(object):
 
         _msg('Disassembling relocated code regions')
 
-        # Iterate through all addresses marked as containers of relocated elements.
+        # Collect all addresses marked as containers of relocated elements and
+        # probe them for code.
+        mark = em_shadow_memory.M_RELOCATED_LEAF
+        addresses = []
         for section in sections:
-            for address in xrange(section.start_address, section.end_address):
-                if self.shadow.is_marked_as_relocated_leaf(address):
+            addresses.extend(self.shadow.find_all(mark, mark,
+                section.start_address, section.end_address))
+        self._probe_many(addresses)
 
-                    # Current address holds a relocated element, which points to
-                    # either code or data. If it looks like code, mark it as a
-                    # basic block leader and start recursive disassembly.
-                    if self._is_code(address):
-                        self.shadow.mark_as_basic_block_leader(address)
-                        self._do_recursive_disassembly(address)
+        for address in addresses:
+
+            # Current address holds a relocated element, which points to either
+            # code or data. If it looks like code, mark it as a basic block
+            # leader and start recursive disassembly.
+            if self._is_code(address):
+                self._mark_as_basic_block_leader(address)
+                self._do_recursive_disassembly(address)
 
 
     def _disassemble_deferred(self):
@@ -885,26 +1378,28 @@ class Disassembler(object):
         # Get list of executable sections.
         sections = [s for s in self.loader.sections if 'x' in s.flags]
 
-        # Standard fixed point loop. We disassemble all unanalyzed regions until
-        # no more unanalyzed regions exist.
-        done = False
-        while not done:
-
-            done = True
-            for section in sections:
-                for address in xrange(section.start_address, section.end_address):
-                    if not self.shadow.is_marked_as_analyzed(address) and \
-                            self.shadow.is_marked_as_basic_block_leader(address):
-
-                        # Start recursive disassembly from each address that
-                        # hasn't been analyzed yet. Analysis may generate new
-                        # code regions that should be analyzed and so on.
-                        _msg('Disassembling from @%#x' % address)
-                        self._do_recursive_disassembly(address)
-                        done = False
-
-            if not done:
-                _msg('Fixed-point not reached, restarting')
+        # Look for basic block leaders that haven't been analyzed yet. A single
+        # scan catches leaders marked without going through the worklist, e.g.
+        # by a previous session.
+        mask = em_shadow_memory.M_ANALYZED | em_shadow_memory.M_BASIC_BLOCK_LEADER
+        value = em_shadow_memory.M_BASIC_BLOCK_LEADER
+        for section in sections:
+            for address in self.shadow.find_all(mask, value,
+                    section.start_address, section.end_address):
+                self.worklist[self._worklist_tail] = address
+                self._worklist_tail += 1
+
+        # Standard fixed point loop. We disassemble unanalyzed regions until the
+        # worklist is empty. Analysis may generate new code regions, which are
+        # pushed in the worklist as soon as they are discovered. Only leaders in
+        # executable sections are considered.
+        address = self._pop_basic_block_leader()
+        while address is not None:
+            if not self.shadow.is_marked_as_analyzed(address) and \
+                    self.is_memory_executable(address):
+                _msg('Disassembling from @%#x' % address)
+                self._do_recursive_disassembly(address)
+            address = self._pop_basic_block_leader()
 
 
     def _disassemble_orphan(self):
@@ -921,13 +1416,13 @@ class Disassembler(object):
 
         # If there's any relocated address which has been marked as a basic block
         # leader with no incoming edges, mark it as function entry point.
+        mark = em_shadow_memory.M_RELOCATED_LEAF | \
+            em_shadow_memory.M_BASIC_BLOCK_LEADER
         for section in sections:
-            for address in xrange(section.start_address, section.end_address):
-                if self.shadow.is_marked_as_relocated_leaf(address) and \
-                        self.shadow.is_marked_as_basic_block_leader(address) and \
-                        len(self.code_xrefs.get_predecessors(address)) == 0:
-                    self.shadow.mark_as_function(address)
-
+            for address in self.shadow.find_all(mark, mark,
+                    section.start_address, section.end_address):
+                if len(self.code_xrefs.get_predecessors(address)) == 0:
+                    self._mark_as_basic_block_leader(address, function=True)
 
 
     def _build_basic_block_set_for_range(self, start_address, end_address):
@@ -938,36 +1433,40 @@ class Disassembler(object):
         .. warning:: This is a private function, don't use it directly.
         '''
 
-        address = start_address
-        while address <= end_address:
+        leader = em_shadow_memory.M_BASIC_BLOCK_LEADER
+        code = em_shadow_memory.M_CODE
+        head = em_shadow_memory.M_HEAD
 
-            # Get the address of the next available basic block leader.
-            while address <= end_address and \
-                    not self.shadow.is_marked_as_basic_block_leader(address):
-                address += 1
+        address = start_address
+        while True:
 
-            # If no more basic block leaders, break.
-            if address > end_address:
+            # Get the address of the next available basic block leader. If no
+            # more basic block leaders, break.
+            address = self.shadow.find_next(address, leader, leader,
+                end_address + 1)
+            if address is None:
                 break
 
             # This is the basic block's start address.
             bb_start_address = address
-            address += 1
 
             # This basic block extends up to the next basic block leader or to
             # the end of the current code region (a data region may lie between
             # two basic block leaders).
-            instructions = [bb_start_address]
-            while address <= end_address and \
-                    self.shadow.is_marked_as_code(address) and \
-                    not self.shadow.is_marked_as_basic_block_leader(address):
+            limit = self.shadow.find_next(bb_start_address + 1, leader, leader,
+                end_address + 1)
+            if limit is None:
+                limit = end_address + 1
 
-                # Each address marked as code and head is the first byte of an
-                # instruction.
-                if self.shadow.is_marked_as_head(address):
-                    instructions.append(address)
+            address = self.shadow.find_next(bb_start_address + 1, code, 0, limit)
+            if address is None:
+                address = limit
 
-                address += 1
+            # Each address marked as code and head is the first byte of an
+            # instruction.
+            instructions = [bb_start_address]
+            instructions += self.shadow.find_all(head, head,
+                bb_start_address + 1, address)
 
             # This is the basic block's end address (i.e. the address of the
             # next instruction - this is how IDA Pro does it).
@@ -977,6 +1476,10 @@ class Disassembler(object):
             self.basic_blocks[bb_start_address] = \
                 basic_block.BasicBlock(bb_start_address, bb_end_address, instructions)
 
+            # Also add it in the basic block table.
+            self.basic_block_table.add(bb_start_address, bb_end_address,
+                instructions)
+
 
     def _build_basic_block_set(self):
         '''
@@ -987,9 +1490,13 @@ class Disassembler(object):
 
         _msg('Building basic block set')
 
+        self.basic_block_table.clear()
+
         for start_address, end_address in self.shadow.memory_ranges:
             self._build_basic_block_set_for_range(start_address, end_address)
 
+        self.basic_block_table.flush()
+
 
     def _build_cfg(self):
         '''
@@ -1004,31 +1511,48 @@ class Disassembler(object):
 
         _msg('Building CFG')
 
-        program_counter_name = self.cpu.get_program_counter_name()
+        # Look up the records of all basic blocks' last instructions at once and
+        # keep their flags.
+        table = self.basic_block_table
+        rows = self.instruction_table.lookup_many(
+            table.get_last_instruction_addresses())
+        flags = self.instruction_table.get_flags(rows).tolist()
+        rows = rows.tolist()
 
-        for block in self.basic_blocks.values():
+        # Stream basic blocks from the basic block table; no need to unpickle
+        # `BasicBlock' objects just to read their boundaries.
+        for i, (start_address, end_address, address) in \
+                enumerate(table.iter_basic_blocks()):
 
             # If basic block is an exit point (e.g. a symbol imported from an
             # external library), skip it.
-            if block.start_address in self.loader.exit_points:
+            if start_address in self._exit_points:
                 continue
 
-            # Get basic block's last instruction.
-            address = block.instructions[-1]
-            insn = self.get_instruction(address)
+            # Instructions that were marked but never disassembled (e.g. leaders
+            # marked by a previous session) have no record; decode them now.
+            writes_program_counter = flags[i] & \
+                mm_instruction_table.F_WRITES_PROGRAM_COUNTER
+            if rows[i] < 0:
+                insn = self.get_instruction(address)
 
-            # Should not happen, but if it does, then something is really wrong
-            # with the disassembly logic.
-            if insn is None:
-                raise RuntimeError('Instruction at %#x not found' % address)
+                # Should not happen, but if it does, then something is really
+                # wrong with the disassembly logic.
+                if insn is None:
+                    raise RuntimeError('Instruction at %#x not found' % address)
+
+                _, kind = self._get_dispatch_entry(insn)
+                writes_program_counter = kind != FLOW_NORMAL
 
-            # Get set of target addresses of this instruction.
-            successors = self.code_xrefs.get_successors(address)
+            # Get sorted target addresses of this instruction. The graph of code
+            # cross references is frozen at this point; convert the view of its
+            # arrays to normal Python integers.
+            successors = self.code_xrefs.get_successor_array(address).tolist()
 
             # If last instruction in this basic block modifies the program
             # counter, add CFG links for all possible target addresses. If it's
             # a RET instruction, the target addresses set should be empty.
-            if program_counter_name in insn.get_written_registers():
+            if writes_program_counter:
                 for successor in successors:
 
                     # Create CFG links only for target addresses which are basic
@@ -1036,109 +1560,101 @@ class Disassembler(object):
                     # in a forest of intra-procedural CFGs.
                     if self.shadow.is_marked_as_basic_block_leader(successor) and \
                             not self.shadow.is_marked_as_function(successor):
-                        self.cfg.add_edge((block.start_address, successor))
+                        self.cfg.add_edge((start_address, successor))
 
             # If last instruction in this basic block doesn't modify the program
             # counter, execution flow continues to the basic block physically
             # bordering the current one.
             else:
-                self.cfg.add_edge((block.start_address, block.end_address))
+                self.cfg.add_edge((start_address, end_address))
 
 
-
-    def _analyze_relocation(self, address, fmt, size):
+    def _get_function_addresses(self, address):
         '''
-        Recursively analyze relocation at address *address*.
+        Traverse the CFG and collect the basic block addresses of function at
+        address *address*.
 
-        :param address: Address holding a relocated element.
-        :param fmt: CPU mode-specific Format string used for unpacking pointers
-            passed to ``struct.unpack()``.
-        :param size: Number of bytes corresponding to *fmt*.
+        :param address: Address of function whose basic block addresses to
+            return.
+        :returns: List of basic block addresses of function.
+        :rtype: ``list``
 
         .. warning:: This is a private function, don't use it directly.
         '''
 
-        # Make sure the relocation entry is valid.
-        if self.is_memory_mapped(address, size):
+        # List of basic block addresses belonging to function.
+        addresses = []
 
-            # Mark `address' as analyzed.
-            self.shadow.mark_as_analyzed(address)
-            self.shadow.mark_as_relocated(address)
-
-            # Extract the relocated element.
-            data = self.read_memory(address, size)
-            element = struct.unpack(fmt, data)[0]
-
-            # Sometimes the relocated elements are not mapped addresses (don't
-            # know why, have seen that in Adobe Flash and haven't investigated
-            # it further).
-            if self.is_memory_mapped(element):
-
-                # The current address may hold a relocated element, which, in
-                # turn, may point to another relocated element. If this is the
-                # case, recursively analyze the relocated element.
-                if element in self.loader.relocations:
-                    self._analyze_relocation(element, fmt, size)
-
-                # Otherwise, this is the leaf entry in the current chain of
-                # relocations. Mark it accordingly and continue. We will later
-                # attempt to determine if this element points to code or data.
-                else:
-                    self.shadow.mark_as_relocated_leaf(element)
+        # Set of seen basic blocks.
+        seen = set()
 
-        # Otherwise let the user know something is wrong.
-        else:
-            _msg('Invalid relocation entry @%#x' % address)
+        # DFS stack of basic blocks.
+        stack = [address]
 
+        while len(stack):
+            address = stack.pop()
 
-    def _analyze_relocations(self):
+            # Add in basic blocks set.
+            if address not in seen:
+                seen.add(address)
+                addresses.append(address)
+
+            # Visit successors in address order.
+            successors = self.cfg.get_successor_array(address).tolist()
+
+            # Push basic block addresses that have not been visited yet but skip
+            # calls to other functions.
+            stack += [a for a in successors \
+                if a not in seen and not self.shadow.is_marked_as_function(a)]
+
+        return addresses
+
+
+    def _build_function_map(self):
         '''
-        Normally, relocations form a series of chains. We refer to chains' last
-        elements as *relocated leaves*. This function is responsible for parsing
-        the relocation entries of a binary and setting the appropriate marks in
-        the program's shadow memory.
+        Assign each basic block in the basic block table to the function it
+        belongs to. Basic blocks shared by several functions are assigned to the
+        function at the lowest address.
 
         .. warning:: This is a private function, don't use it directly.
         '''
 
-        # Map CPU modes to native address width format strings.
-        fmt_map = {
-            cpu.X86_MODE_REAL: '=H',
-            cpu.X86_MODE_PROTECTED_32BIT: '=I',
-            cpu.X86_MODE_PROTECTED_64BIT: '=Q'
-        }
+        _msg('Building function map')
 
-        # Get format and corresponding size for the current CPU mode.
-        fmt = fmt_map[self.cpu.mode]
-        size = struct.calcsize(fmt)
+        table = self.basic_block_table
 
-        # Now, recursively parse all relocation entries.
-        _msg('Analyzing relocations')
-        for address in self.loader.relocations:
-            self._analyze_relocation(address, fmt, size)
+        mark = em_shadow_memory.M_FUNCTION
+        for address in self.shadow.find_all(mark, mark):
 
-        # Discover data regions by examining contiguous relocated addresses.
-        _msg('Analyzing relocated data regions')
-        for section in self.loader.sections:
-            address = section.start_address
-            while address < section.end_address:
+            # Exit points, for example, are not part of any basic block.
+            function = table.get_row(address)
+            if function < 0:
+                continue
 
-                # Three or more contiguous addresses marked as relocated, usually
-                # indicate a data region.
-                if self.shadow.is_marked_as_relocated(address) and \
-                        self.shadow.is_marked_as_relocated(address + size) and \
-                        self.shadow.is_marked_as_relocated(address + size + size):
+            # Assign the function's basic blocks not assigned to any function.
+            rows = table.lookup_many(self._get_function_addresses(address))
+            rows = rows[rows >= 0]
+            table.set_functions(rows[table.functions[rows] < 0], function)
 
-                    # Start marking as data until a non-relocated address is hit.
-                    while self.shadow.is_marked_as_relocated(address) and \
-                            address < section.end_address:
 
-                        # Already marked as analyzed.
-                        self.shadow.mark_as_data(address)
-                        address += size
 
-                else:
-                    address += 1
+    def _analyze_relocations(self):
+        '''
+        Parse the relocation entries of the binary and set the appropriate marks
+        in the program's shadow memory using :func:`relocations.analyze()`.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        _msg('Analyzing relocations')
+        if len(self._relocations) == 0:
+            return
+
+        # Let the user know about invalid relocation entries.
+        size = ADDRESS_WIDTHS[self.cpu.mode] // 8
+        invalid = relocations.analyze(self, self._relocations, size)
+        for address in invalid.tolist():
+            _msg('Invalid relocation entry @%#x' % address)
 
 
     # Public API definitions begin here.
@@ -1146,19 +1662,42 @@ class Disassembler(object):
     def disassemble(self):
         '''Start disassembly of S.EX. project.'''
 
+        # Graphs frozen by a previous run need to be modified again.
+        self.code_xrefs.thaw()
+        self.data_xrefs.thaw()
+        self.cfg.thaw()
+
+        if self.superset_table is not None:
+            _msg('Building superset disassembly tables')
+            self.superset_table.build([s for s in self.loader.sections \
+                if 'x' in s.flags], self.section_data, self._decoder_mode,
+                self.cpu, self.jobs)
+
         _msg('Beginning early analysis')
         self._analyze_relocations()
 
-        _msg('Beginning disassembly')
-        self._disassemble_entry_points()
-        self._disassemble_functions()
-        self._disassemble_relocated()
-        self._disassemble_deferred()
+        # Cross references are discovered one instruction at a time. Buffer them
+        # and write them in batches.
+        with self.code_xrefs.batch(), self.data_xrefs.batch():
+            _msg('Beginning disassembly')
+            self._disassemble_entry_points()
+            self._disassemble_functions()
+            self._disassemble_relocated()
+            self._disassemble_deferred()
+
+        # No more cross references are discovered past this point. Freeze the
+        # cross reference graphs for faster traversals.
+        self.code_xrefs.freeze()
+        self.data_xrefs.freeze()
+        self.instruction_table.flush()
+
         self._disassemble_orphan()
 
         _msg('Building program structure')
         self._build_basic_block_set()
         self._build_cfg()
+        self.cfg.freeze()
+        self._build_function_map()
 
         _msg('Disassembly completed')
 
@@ -1174,8 +1713,8 @@ class Disassembler(object):
         :returns: ``True`` if memory region is readable, ``False`` otherwise.
         :rtype: ``bool``
         '''
-        section = self.loader.get_section_for_address_range(address, length)
-        return section is not None and 'r' in section.flags
+        return self.section_index.has_permissions(address,
+            section_index.P_READ, length)
 
 
     def is_memory_writable(self, address, length=1):
@@ -1187,8 +1726,8 @@ class Disassembler(object):
         :returns: ``True`` if memory region is writable, ``False`` otherwise.
         :rtype: ``bool``
         '''
-        section = self.loader.get_section_for_address_range(address, length)
-        return section is not None and 'w' in section.flags
+        return self.section_index.has_permissions(address,
+            section_index.P_WRITE, length)
 
 
     def is_memory_executable(self, address, length=1):
@@ -1200,8 +1739,8 @@ class Disassembler(object):
         :returns: ``True`` if memory region is executable, ``False`` otherwise.
         :rtype: ``bool``
         '''
-        section = self.loader.get_section_for_address_range(address, length)
-        return section is not None and 'x' in section.flags
+        return self.section_index.has_permissions(address,
+            section_index.P_EXECUTE, length)
 
 
     def is_memory_mapped(self, address, length=1):
@@ -1214,8 +1753,78 @@ class Disassembler(object):
         :returns: ``True`` if memory region is mapped, ``False`` otherwise.
         :rtype: ``bool``
         '''
-        section = self.loader.get_section_for_address_range(address, length)
-        return section is not None and 'l' in section.flags
+        return self.section_index.has_permissions(address,
+            section_index.P_LOAD, length)
+
+
+    def is_memory_executable_many(self, addresses, length=1):
+        '''
+        Vectorized version of :func:`is_memory_executable()`.
+
+        :param addresses: Array, or any sequence, of addresses to check.
+        :param length: Number of bytes to check, starting at each address.
+        :returns: Boolean array, ``True`` for executable memory regions.
+        :rtype: ``numpy.ndarray``
+        '''
+        return self.section_index.has_permissions_many(addresses,
+            section_index.P_EXECUTE, length)
+
+
+    def is_memory_mapped_many(self, addresses, length=1):
+        '''
+        Vectorized version of :func:`is_memory_mapped()`.
+
+        :param addresses: Array, or any sequence, of addresses to check.
+        :param length: Number of bytes to check, starting at each address.
+        :returns: Boolean array, ``True`` for mapped memory regions.
+        :rtype: ``numpy.ndarray``
+        '''
+        return self.section_index.has_permissions_many(addresses,
+            section_index.P_LOAD, length)
+
+
+    def read_pointers_many(self, addresses, size):
+        '''
+        Read the pointer sized elements stored at all addresses in *addresses*
+        at once, by viewing the sections' data as NumPy arrays.
+
+        :param addresses: Sorted array of addresses to read elements from.
+        :param size: Size of pointers in bytes.
+        :returns: Tuple holding a boolean array, ``True`` for addresses whose
+            *size* bytes are mapped, and the array of elements read from them,
+            0 where not mapped.
+        :rtype: ``tuple``
+        '''
+
+        valid = numpy.zeros(len(addresses), dtype=numpy.bool_)
+        elements = numpy.zeros(len(addresses), dtype=numpy.uint64)
+        dtype = numpy.dtype('=u%d' % size)
+
+        # Only visit the sections actually holding any of the addresses; the
+        # data of sections not accessed yet need not be mapped.
+        index = self.section_index
+        indices = index.get_indices_many(addresses, size)
+        for k in numpy.unique(indices[indices >= 0]).tolist():
+            section = index.sections[k]
+            data = self.section_data.get_array(section)
+            if len(data) < size:
+                continue
+
+            # Locate the addresses whose elements lie within the section's data.
+            i = numpy.searchsorted(addresses, section.start_address)
+            j = numpy.searchsorted(addresses,
+                section.start_address + len(data) - size, side='right')
+            if i >= j:
+                continue
+
+            # Gather the bytes of each element in a row and view each row as a
+            # single pointer; elements need not be aligned.
+            offsets = (addresses[i:j] - section.start_address).astype(numpy.intp)
+            rows = data[offsets[:, numpy.newaxis] + numpy.arange(size)]
+            elements[i:j] = rows.view(dtype).ravel()
+            valid[i:j] = True
+
+        return valid, elements
 
 
     def read_memory(self, address, length):
@@ -1227,7 +1836,17 @@ class Disassembler(object):
         :returns: A string of *length* bytes.
         :rtype: ``str``
         '''
-        return self.loader.read(address, length)
+        r = None
+
+        # Serve bytes from the memory mapped section contents, if possible.
+        section = self.section_index.get_section(address, length)
+        if section is not None:
+            r = self.section_data.read(section, address, length)
+
+        if r is None:
+            r = self.loader.read(address, length)
+
+        return r
 
 
     # Public API for examining program structure and so on.
@@ -1242,30 +1861,48 @@ class Disassembler(object):
         :rtype: :class:`instruction.Instruction`
         '''
 
+        # Serve hot instructions from the cache, if enabled.
+        cache = self.instruction_cache
+        if cache is not None:
+            r = cache.get(address)
+            if r is not None:
+                return r
+
         r = None
 
         # Make sure `address' points to the first byte of a valid instruction.
         if self.shadow.is_marked_as_code(address) and \
                 self.shadow.is_marked_as_head(address):
 
-            # Get the section containing this instruction and prepare decoder's
-            # input.
-            section = self.loader.get_section_for_address_range(address)
-            self.decoder.itext = section.data
-            self.decoder.itext_offset = address - section.start_address
-            self.decoder.runtime_address = section.start_address
+            # Pick the decoder of the section holding this instruction.
+            decoder = self._get_decoder(address, self._query_decoders)
 
             try:
-                insn = self.decoder.decode()
+                insn = decoder.decode()
             except (pyxed.InvalidInstructionError, pyxed.InvalidOffsetError):
                 insn = None
 
             if insn is not None:
                 r = instruction.Instruction(insn, self.cpu)
+                if cache is not None:
+                    cache.put(address, r)
 
         return r
 
 
+    def get_instruction_record(self, address):
+        '''
+        Return the record of the instruction at address *address*, as kept in
+        the instruction table during disassembly. Unlike :func:`get_instruction()`,
+        the instruction is not decoded again.
+
+        :param address: Address of instruction whose record to return.
+        :returns: Record of instruction at *address* or ``None``.
+        :rtype: :class:`mm_instruction_table.InstructionRecord`
+        '''
+        return self.instruction_table.get(address)
+
+
     def get_basic_block(self, address):
         '''
         Return the :class:`basic_block.BasicBlock` instance of the basic block
@@ -1278,10 +1915,44 @@ class Disassembler(object):
 
         r = None
 
-        if self.shadow.start_address <= address <= self.shadow.end_address:
-            while not self.shadow.is_marked_as_basic_block_leader(address):
-                address -= 1
-            r = self.basic_blocks[address]
+        # Binary search the basic block table for the basic block containing
+        # `address'.
+        i = self.basic_block_table.get_row(address)
+        if i >= 0:
+            r = self.basic_block_table.get_basic_block(i)
+
+        return r
+
+
+    def get_basic_blocks(self, addresses):
+        '''
+        Return the :class:`basic_block.BasicBlock` instances of the basic blocks
+        that contain the addresses in *addresses*. Addresses are mapped to basic
+        blocks in a single pass over the basic block table. If *addresses* is
+        sorted, each basic block is loaded only once, no matter how many of the
+        given addresses it contains.
+
+        :param addresses: Sequence of addresses whose basic block objects to look
+            up and return.
+        :returns: List holding the basic block instance that contains each
+            address or ``None``.
+        :rtype: ``list``
+        '''
+
+        r = []
+
+        i = -1
+        block = None
+        for j in self.basic_block_table.lookup_many(addresses):
+
+            # Consecutive addresses usually fall in the same basic block.
+            if j != i:
+                i = j
+                block = None
+                if i >= 0:
+                    block = self.basic_block_table.get_basic_block(i)
+
+            r.append(block)
 
         return r
 
@@ -1301,30 +1972,10 @@ class Disassembler(object):
         # Make sure `address' is a function entry point.
         if self.shadow.is_marked_as_function(address):
 
-            # List of basic block addresses belonging to function.
-            addresses = []
-
-            # Set of seen basic blocks.
-            seen = set()
-
-            # DFS stack of basic blocks.
-            stack = [address]
-
-            while len(stack):
-                address = stack.pop()
-
-                # Add in basic blocks set.
-                if address not in seen:
-                    seen.add(address)
-                    addresses.append(address)
-
-                # Push basic block addresses that have not been visited yet but
-                # skip calls to other functions.
-                stack += [a for a in self.cfg.get_successors(address) \
-                    if a not in seen and not self.shadow.is_marked_as_function(a)]
-
             # Return corresponding basic block objects.
-            r = [self.basic_blocks[a] for a in addresses]
+            table = self.basic_block_table
+            rows = table.lookup_many(self._get_function_addresses(address))
+            r = [table.get_basic_block(i) for i in rows if i >= 0]
 
         return r
 
@@ -1333,6 +1984,13 @@ class Disassembler(object):
         '''Release all resources and finalize the disassembler.'''
         self.shadow.close()
         self.basic_blocks.close()
+        self.probes.close()
+        self.worklist.close()
+        self.section_data.close()
+        if self.superset_table is not None:
+            self.superset_table.close()
+        self.basic_block_table.close()
+        self.instruction_table.close()
         self.code_xrefs.close()
         self.data_xrefs.close()
         self.cfg.close()
@@ -23,8 +23,10 @@ An :class:`EMGraph` is composed of four private ``EMDict`` instances:
 * The second holds the graph's transpose, the inverse adjacency lists.
 
 * The third maps each vertex to a normal Python dictionary, which, in turn,
-  maps attribute names to their values. You can use the relevant :class:`EMGraph`
-  API to set vertex attributes as shown below:
+  maps attribute names to their values. Dictionaries are created when the
+  first attribute is set, so vertices without attributes take no space. You
+  can use the relevant :class:`EMGraph` API to set vertex attributes as shown
+  below:
 
   .. code-block:: python
 
@@ -41,6 +43,20 @@ An :class:`EMGraph` is composed of four private ``EMDict`` instances:
      edge = (tail_vertex, head_vertex)
      graph.add_edge_attribute(edge, 'weight', 0.4)
 
+Small attributes set on many edges, like flags, are better stored in typed
+*edge columns*. Each column is an :class:`EdgeColumn`, which keeps edges sorted
+in packed, memory mapped arrays of integers, alongside an array of values of
+the column's type, instead of pickling a dictionary per edge. Only edges whose
+vertices are non-negative integers (e.g. addresses) can be stored in columns.
+Columns are declared when the graph is instantiated and are otherwise accessed
+with the very same API. Values set on an edge before its attribute's column was
+declared are still returned, and are moved in the column when updated:
+
+.. code-block:: python
+
+   graph = EMGraph('/tmp/graph', edge_columns={'predicate': bool})
+   graph.add_edge_attribute(edge, 'predicate', True)
+
 A vertex can be any object as long as it's ``cPickle`` friendly. To avoid strange
 behavior make sure your objects implement ``__eq__()`` and ``__hash__()``. People
 already familiar with Python object serialization are aware of these complications.
@@ -63,6 +79,42 @@ An example vertex object is shown in the following example:
 
 An edge is just a 2-tuple of vertex objects.
 
+Once a graph is no longer modified, it can be *frozen*. Calling
+:func:`EMGraph.freeze()` compacts the adjacency structure and its transpose in
+memory mapped arrays in CSR (compressed sparse row) format; a sorted array of
+vertices and, for each direction, an array of offsets and an array of sorted
+neighbors. Vertex *i*'s successors are then found at:
+
+.. code-block:: python
+
+   successors[successor_offsets[i]:successor_offsets[i + 1]]
+
+A frozen graph serves :func:`EMGraph.get_successor_array()` and
+:func:`EMGraph.get_predecessor_array()` as read-only ``numpy.ndarray`` views of
+its CSR arrays, instead of unpickling Python sets, and rejects any modification
+of its structure (attributes can still be modified) until :func:`EMGraph.thaw()`
+is called. :func:`EMGraph.get_successors()` and :func:`EMGraph.get_predecessors()`
+keep returning sets, built from the same views. Only graphs whose vertices are
+non-negative integers (e.g. addresses) can be frozen. Frozen graphs remain
+frozen when re-opened.
+
+Adding edges one by one costs two read-modify-write cycles of whole adjacency
+sets per edge. When many edges are to be added, they can be buffered in main
+memory and written in batches, using either :func:`EMGraph.add_edges()` or the
+:func:`EMGraph.batch()` context manager, as shown below:
+
+.. code-block:: python
+
+   with graph.batch():
+       for edge in edges:
+           graph.add_edge(edge)
+
+Buffered edges are grouped by vertex and are flushed when the batch is closed,
+or when the number of buffered edges exceeds the batch budget, so that each
+touched adjacency set is rewritten only once per flush. Buffered edges are
+visible to :func:`EMGraph.get_successors()` and :func:`EMGraph.get_predecessors()`
+while the batch is open.
+
 
 Classes
 -------
@@ -73,6 +125,7 @@ __author__ = 'huku <huku@grhack.net>'
 
 import sys
 import os
+import contextlib
 
 
 try:
@@ -80,6 +133,206 @@ try:
 except ImportError:
     sys.exit('Pyrsistence not installed?')
 
+try:
+    import numpy
+except ImportError:
+    sys.exit('NumPy not installed?')
+
+
+# Default maximum number of edges buffered in main memory by batches.
+BATCH_BUDGET = 65536
+
+
+class EdgeColumn(object):
+    '''
+    Typed column of an edge attribute, stored in packed, memory mapped arrays.
+    Edges are kept sorted by tail and head in two arrays of unsigned 64-bit
+    integers, and their values in a third array of the column's type. Updates
+    are buffered in main memory and merged in the arrays when
+    :func:`flush()` is called, or when more than *budget* updates have been
+    buffered. Only edges whose vertices are non-negative integers can be
+    stored in a column.
+
+    .. automethod:: __init__
+    .. automethod:: _load
+    .. automethod:: _find
+    .. automethod:: _check_edge
+    '''
+
+    def __init__(self, dirname, value_type, budget=BATCH_BUDGET):
+        '''
+        :param dirname: Directory where the column's arrays will be stored. The
+            directory is created if it does not exist.
+        :param value_type: Type of the column's values (e.g. ``bool``).
+        :param budget: Maximum number of updates buffered before they are
+            merged in the column's arrays.
+        '''
+
+        # Create container directory if not there.
+        if os.access(dirname, os.F_OK) == False:
+            os.makedirs(dirname, 0750)
+
+        self.dirname = dirname
+        self.value_type = value_type
+        self.budget = budget
+
+        # Maps buffered edges to their new values, or to `None' if removed.
+        self._pending = {}
+
+        self._tails = self._heads = self._values = None
+        self._load()
+
+
+    def __del__(self):
+        self.close()
+
+
+    def _load(self):
+        '''
+        Memory map the column's arrays. Arrays left inconsistent by an
+        interrupted merge are ignored and the column starts empty.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        self._tails = numpy.zeros(0, dtype=numpy.uint64)
+        self._heads = numpy.zeros(0, dtype=numpy.uint64)
+        self._values = numpy.zeros(0, dtype=self.value_type)
+
+        arrays = []
+        for name in ['tails', 'heads', 'values']:
+            filename = '%s/%s.npy' % (self.dirname, name)
+            if os.access(filename, os.F_OK):
+                arrays.append(numpy.load(filename, mmap_mode='r'))
+
+        if len(arrays) == 3 and len(set([len(a) for a in arrays])) == 1:
+            self._tails, self._heads, self._values = arrays
+
+
+    def _find(self, edge):
+        '''
+        Locate *edge* in the column's arrays.
+
+        :param edge: The edge to look for.
+        :returns: Index of *edge* in the column's arrays or ``None``.
+        :rtype: ``int``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        r = None
+
+        tail, head = edge
+        if self._check_edge(edge):
+            tail = numpy.uint64(tail)
+            head = numpy.uint64(head)
+            lo = int(numpy.searchsorted(self._tails, tail, side='left'))
+            hi = int(numpy.searchsorted(self._tails, tail, side='right'))
+            i = lo + int(numpy.searchsorted(self._heads[lo:hi], head))
+            if i < hi and self._heads[i] == head:
+                r = i
+
+        return r
+
+
+    def _check_edge(self, edge):
+        '''
+        Check if *edge* can be stored in the column.
+
+        :param edge: The edge to check.
+        :returns: ``True`` if both vertices of *edge* are non-negative integers,
+            ``False`` otherwise.
+        :rtype: ``bool``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        for vertex in edge:
+            if not isinstance(vertex, (int, long, numpy.integer)) or \
+                    vertex < 0:
+                return False
+        return True
+
+
+    def __contains__(self, edge):
+        if edge in self._pending:
+            return self._pending[edge] is not None
+        return self._find(edge) is not None
+
+
+    def __getitem__(self, edge):
+        if edge in self._pending:
+            value = self._pending[edge]
+        else:
+            value = None
+            i = self._find(edge)
+            if i is not None:
+                value = self._values[i].item()
+        if value is None:
+            raise KeyError(edge)
+        return value
+
+
+    def __setitem__(self, edge, value):
+        if not self._check_edge(edge):
+            raise RuntimeError('Cannot store edge %r in column' % (edge, ))
+        self._pending[edge] = self.value_type(value)
+        if len(self._pending) >= self.budget:
+            self.flush()
+
+
+    def __delitem__(self, edge):
+        if edge not in self:
+            raise KeyError(edge)
+        self._pending[edge] = None
+        if len(self._pending) >= self.budget:
+            self.flush()
+
+
+    def flush(self):
+        '''Merge buffered updates in the column's arrays.'''
+
+        if len(self._pending) == 0:
+            return
+
+        # Buffered updates replace stored values of the same edges.
+        edges = sorted(self._pending)
+        tails = numpy.array([e[0] for e in edges], dtype=numpy.uint64)
+        heads = numpy.array([e[1] for e in edges], dtype=numpy.uint64)
+        keep = numpy.ones(len(self._tails), dtype=numpy.bool_)
+        for edge in edges:
+            i = self._find(edge)
+            if i is not None:
+                keep[i] = False
+
+        # Removed edges are simply not merged.
+        added = numpy.array([self._pending[e] is not None for e in edges],
+            dtype=numpy.bool_)
+        values = numpy.array([self._pending[e] for e in edges \
+            if self._pending[e] is not None], dtype=self.value_type)
+
+        tails = numpy.concatenate((self._tails[keep], tails[added]))
+        heads = numpy.concatenate((self._heads[keep], heads[added]))
+        values = numpy.concatenate((self._values[keep], values))
+        order = numpy.lexsort((heads, tails))
+
+        # Arrays are written under temporary names and renamed once complete;
+        # tails are renamed last.
+        for name, array in [('values', values[order]),
+                ('heads', heads[order]), ('tails', tails[order])]:
+            filename = '%s/%s.npy' % (self.dirname, name)
+            with open('%s.tmp' % filename, 'wb') as fp:
+                numpy.save(fp, array)
+            os.rename('%s.tmp' % filename, filename)
+
+        self._pending = {}
+        self._load()
+
+
+    def close(self):
+        '''Finalize this :class:`EdgeColumn` instance.'''
+        if self._tails is not None:
+            self.flush()
+            self._tails = self._heads = self._values = None
 
 
 class EMGraph(object):
@@ -90,12 +343,26 @@ class EMGraph(object):
     .. automethod:: _add_attribute
     .. automethod:: _remove_attribute
     .. automethod:: _get_attribute
+    .. automethod:: _remove_attributes
+    .. automethod:: _has_edge
+    .. automethod:: _add_edge_attribute
+    .. automethod:: _check_not_frozen
+    .. automethod:: _load_csr
+    .. automethod:: _make_csr
+    .. automethod:: _get_csr_neighbors
+    .. automethod:: _is_pending_vertex
+    .. automethod:: _is_pending_edge
+    .. automethod:: _flush_batch
     '''
 
-    def __init__(self, dirname):
+    def __init__(self, dirname, batch_budget=BATCH_BUDGET, edge_columns=None):
         '''
         :param dirname: Directory where memory mapped files will be stored. The
             directory is created if it does not exist.
+        :param batch_budget: Maximum number of edges buffered by batches before
+            they are flushed.
+        :param edge_columns: Dictionary mapping names of edge attributes stored
+            in typed columns to their types (e.g. ``{'predicate': bool}``).
         '''
 
         # Create container directory if not there.
@@ -109,6 +376,26 @@ class EMGraph(object):
         self._vertex_attributes = pyrsistence.EMDict('%s/vertex_attributes' % dirname)
         self._edge_attributes = pyrsistence.EMDict('%s/edge_attributes' % dirname)
 
+        # Open typed edge attribute columns.
+        self._edge_columns = {}
+        for name, value_type in (edge_columns or {}).iteritems():
+            self._edge_columns[name] = EdgeColumn('%s/edge_columns/%s' % \
+                (dirname, name), value_type, batch_budget)
+
+        # Load CSR arrays if the graph has been frozen.
+        self.dirname = dirname
+        self._csr = None
+        self._load_csr()
+
+        # Edges buffered by open batches, grouped by tail and head, as well as
+        # attributes set on them.
+        self._batch_depth = 0
+        self.batch_budget = batch_budget
+        self._pending_successors = {}
+        self._pending_predecessors = {}
+        self._pending_edge_attributes = {}
+        self._pending_edges = 0
+
 
     def __del__(self):
         self.close()
@@ -134,19 +421,18 @@ class EMGraph(object):
         '''
         prev_value = None
 
-        # Check if the subject has any attributes set.
+        # Read dictionary of subject attributes and the current attribute value
+        # if one is set. The dictionary is created on the first attribute.
+        subject_attributes = dict()
         if subject in attributes:
-
-            # Read dictionary of subject attributes and the current attribute
-            # value if one is set.
             subject_attributes = attributes[subject]
             prev_value = subject_attributes.get(name, None)
 
-            # Add or replace attribute value.
-            subject_attributes[name] = value
+        # Add or replace attribute value.
+        subject_attributes[name] = value
 
-            # Update subject's attributes in attributes container.
-            attributes[subject] = subject_attributes
+        # Update subject's attributes in attributes container.
+        attributes[subject] = subject_attributes
 
         return prev_value
 
@@ -175,13 +461,14 @@ class EMGraph(object):
             # Read dictionary of subject attributes and the current attribute
             # value if one is set.
             subject_attributes = attributes[subject]
-            value = subject_attributes.get(name, None)
-
-            # Delete given attribute.
-            del subject_attributes[name]
+            value = subject_attributes.pop(name, None)
 
-            # Update subject's attributes in attribute container.
-            attributes[subject] = subject_attributes
+            # Update subject's attributes in attribute container. Drop the
+            # dictionary altogether once the last attribute is removed.
+            if len(subject_attributes) > 0:
+                attributes[subject] = subject_attributes
+            else:
+                del attributes[subject]
 
         return value
 
@@ -215,6 +502,208 @@ class EMGraph(object):
         return value
 
 
+    def _remove_attributes(self, attributes, subject):
+        '''
+        Remove all attributes of *subject*, if any.
+
+        :param attributes: An external memory dictionary that maps subjects to
+            their attributes.
+        :param subject: The subject whose attributes to remove.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        if subject in attributes:
+            del attributes[subject]
+
+
+    def _has_edge(self, edge):
+        '''
+        Check if *edge* is in the graph.
+
+        :param edge: The graph edge to check.
+        :returns: ``True`` if *edge* exists, ``False`` otherwise.
+        :rtype: ``bool``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        tail, head = edge
+        return head in self.get_successors(tail)
+
+
+    def _add_edge_attribute(self, edge, name, value):
+        '''
+        Add or update attribute *name* of *edge*, either in the attribute's
+        column, if one was declared, or in the edge's attribute dictionary.
+
+        :param edge: The graph edge whose attributes to update.
+        :param name: Attribute name to add or update.
+        :param value: Value to set the attribute to.
+        :returns: Previous attribute value, if any, or ``None``.
+        :rtype: ``object``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        if name in self._edge_columns:
+            column = self._edge_columns[name]
+
+            # Values set before the column was declared are moved in it.
+            prev_value = self._remove_attribute(self._edge_attributes, edge,
+                name)
+            if edge in column:
+                prev_value = column[edge]
+            column[edge] = value
+        else:
+            prev_value = self._add_attribute(self._edge_attributes, edge, name,
+                value)
+
+        return prev_value
+
+
+    def _check_not_frozen(self):
+        '''
+        Raise ``RuntimeError`` if the graph is frozen.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        if self._csr is not None:
+            raise RuntimeError('Graph %s is frozen' % self.dirname)
+
+
+    def _load_csr(self):
+        '''
+        Memory map the CSR arrays of a frozen graph, if any.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        dirname = '%s/csr' % self.dirname
+        if os.access('%s/vertices.npy' % dirname, os.F_OK):
+            self._csr = {}
+            for name in ['vertices', 'successor_offsets', 'successors',
+                    'predecessor_offsets', 'predecessors']:
+                self._csr[name] = numpy.load('%s/%s.npy' % (dirname, name),
+                    mmap_mode='r')
+
+
+    def _make_csr(self, adjacency, vertices):
+        '''
+        Compact adjacency lists in CSR format.
+
+        :param adjacency: An external memory dictionary that maps vertices to
+            sets of neighbors.
+        :param vertices: Sorted list of vertices.
+        :returns: A tuple holding the array of offsets and the array of sorted
+            neighbors.
+        :rtype: ``tuple``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        offsets = [0]
+        neighbors = []
+        for vertex in vertices:
+            neighbors.extend(sorted(adjacency[vertex]))
+            offsets.append(len(neighbors))
+
+        offsets = numpy.array(offsets, dtype=numpy.int64)
+        neighbors = numpy.array(neighbors, dtype=numpy.uint64)
+        return offsets, neighbors
+
+
+    def _get_csr_neighbors(self, vertex, offsets, neighbors):
+        '''
+        Return a view of the neighbors of *vertex* in a frozen graph.
+
+        :param vertex: The vertex whose neighbors to return.
+        :param offsets: Name of CSR offsets array.
+        :param neighbors: Name of CSR neighbors array.
+        :returns: Sorted array of neighbors.
+        :rtype: ``numpy.ndarray``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        vertices = self._csr['vertices']
+        neighbors = self._csr[neighbors]
+
+        r = neighbors[0:0]
+        i = int(numpy.searchsorted(vertices, vertex))
+        if i < len(vertices) and vertices[i] == vertex:
+            offsets = self._csr[offsets]
+            r = neighbors[offsets[i]:offsets[i + 1]]
+
+        return r
+
+
+    def _is_pending_vertex(self, vertex):
+        '''
+        Check if *vertex* is referenced by buffered edges.
+
+        :param vertex: The vertex to check.
+        :returns: ``True`` if *vertex* is buffered, ``False`` otherwise.
+        :rtype: ``bool``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        return vertex in self._pending_successors or \
+            vertex in self._pending_predecessors
+
+
+    def _is_pending_edge(self, edge):
+        '''
+        Check if *edge* is buffered.
+
+        :param edge: The edge to check.
+        :returns: ``True`` if *edge* is buffered, ``False`` otherwise.
+        :rtype: ``bool``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        tail, head = edge
+        return head in self._pending_successors.get(tail, ())
+
+
+    def _flush_batch(self):
+        '''
+        Write buffered edges in the external memory dictionaries. Each touched
+        adjacency set is read and written exactly once.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        if self._pending_edges == 0:
+            return
+
+        # Make sure all vertices are there.
+        for vertex in set(self._pending_successors) | \
+                set(self._pending_predecessors):
+            if vertex not in self._graph:
+                self._graph[vertex] = set()
+                self._transpose_graph[vertex] = set()
+
+        # Update successor sets.
+        for tail, heads in self._pending_successors.iteritems():
+            successors = self._graph[tail]
+            successors.update(heads)
+            self._graph[tail] = successors
+
+        # Update predecessor sets.
+        for head, tails in self._pending_predecessors.iteritems():
+            predecessors = self._transpose_graph[head]
+            predecessors.update(tails)
+            self._transpose_graph[head] = predecessors
+
+        # Write attributes of buffered edges.
+        for edge, attributes in self._pending_edge_attributes.iteritems():
+            for name, value in attributes.iteritems():
+                self._add_edge_attribute(edge, name, value)
+
+        self._pending_successors = {}
+        self._pending_predecessors = {}
+        self._pending_edge_attributes = {}
+        self._pending_edges = 0
+
+
 
     def add_vertex(self, vertex):
         '''
@@ -222,12 +711,12 @@ class EMGraph(object):
 
         :param vertex: The vertex to add in the graph.
         '''
+        self._check_not_frozen()
 
         # Make sure we don't overwrite existing vertex.
         if vertex not in self._graph:
             self._graph[vertex] = set()
             self._transpose_graph[vertex] = set()
-            self._vertex_attributes[vertex] = dict()
 
 
     def remove_vertex(self, vertex):
@@ -239,6 +728,8 @@ class EMGraph(object):
 
         :param vertex: The vertex to remove from the graph.
         '''
+        self._check_not_frozen()
+        self._flush_batch()
 
         # Make sure vertex is in the graph.
         if vertex in self._graph:
@@ -255,7 +746,7 @@ class EMGraph(object):
                 del predecessors
 
                 # Remove edge attributes.
-                del self._edge_attributes[(vertex, successor)]
+                self.remove_edge_attributes((vertex, successor))
 
 
             # Remove incoming edges.
@@ -270,13 +761,13 @@ class EMGraph(object):
                 del successors
 
                 # Remove edge attributes.
-                del self._edge_attributes[(predecessor, vertex)]
+                self.remove_edge_attributes((predecessor, vertex))
 
 
             # Now remove the vertex.
             del self._graph[vertex]
             del self._transpose_graph[vertex]
-            del self._vertex_attributes[vertex]
+            self._remove_attributes(self._vertex_attributes, vertex)
 
 
     def remove_orphan_vertices(self):
@@ -284,12 +775,15 @@ class EMGraph(object):
         Remove orphan nodes from the graph (nodes that have neither incoming nor
         outgoing edges).
         '''
+        self._check_not_frozen()
+        self._flush_batch()
+
         for vertex in self._graph.keys():
             if len(self._graph[vertex]) == 0 and \
                     len(self._transpose_graph[vertex]) == 0:
                 del self._graph[vertex]
                 del self._transpose_graph[vertex]
-                del self._vertex_attributes[vertex]
+                self._remove_attributes(self._vertex_attributes, vertex)
 
 
     def get_vertices(self):
@@ -299,8 +793,14 @@ class EMGraph(object):
         :returns: Generator for all vertices in graph.
         :rtype: ``generator``
         '''
-        for vertex in self._graph.keys():
-            yield vertex
+        self._flush_batch()
+
+        if self._csr is not None:
+            for vertex in self._csr['vertices'].tolist():
+                yield vertex
+        else:
+            for vertex in self._graph.keys():
+                yield vertex
 
 
     def add_vertex_attribute(self, vertex, name, value):
@@ -313,7 +813,14 @@ class EMGraph(object):
         :returns: Previous attribute value, if any, or ``None``.
         :rtype: ``object``
         '''
-        return self._add_attribute(self._vertex_attributes, vertex, name, value)
+        if self._is_pending_vertex(vertex):
+            self._flush_batch()
+
+        prev_value = None
+        if vertex in self._graph:
+            prev_value = self._add_attribute(self._vertex_attributes, vertex,
+                name, value)
+        return prev_value
 
 
     def remove_vertex_attribute(self, vertex, name):
@@ -325,6 +832,8 @@ class EMGraph(object):
         :returns: Previous attribute value, if any, or ``None``.
         :rtype: ``object``
         '''
+        if self._is_pending_vertex(vertex):
+            self._flush_batch()
         return self._remove_attribute(self._vertex_attributes, vertex, name)
 
 
@@ -337,6 +846,8 @@ class EMGraph(object):
         :returns: Attribute value or ``None``.
         :rtype: ``object``
         '''
+        if self._is_pending_vertex(vertex):
+            self._flush_batch()
         return self._get_attribute(self._vertex_attributes, vertex, name)
 
 
@@ -349,10 +860,18 @@ class EMGraph(object):
         :returns: Set of vertex successors.
         :rtype: ``set``
         '''
-        if vertex in self._graph:
+        if self._csr is not None:
+            vertices = set(self._get_csr_neighbors(vertex, 'successor_offsets',
+                'successors').tolist())
+        elif vertex in self._graph:
             vertices = self._graph[vertex]
         else:
             vertices = set()
+
+        # Also return buffered successors.
+        if vertex in self._pending_successors:
+            vertices = vertices | self._pending_successors[vertex]
+
         return vertices
 
 
@@ -365,10 +884,58 @@ class EMGraph(object):
         :returns: Set of vertex predecessors.
         :rtype: ``set``
         '''
-        if vertex in self._transpose_graph:
+        if self._csr is not None:
+            vertices = set(self._get_csr_neighbors(vertex,
+                'predecessor_offsets', 'predecessors').tolist())
+        elif vertex in self._transpose_graph:
             vertices = self._transpose_graph[vertex]
         else:
             vertices = set()
+
+        # Also return buffered predecessors.
+        if vertex in self._pending_predecessors:
+            vertices = vertices | self._pending_predecessors[vertex]
+
+        return vertices
+
+
+    def get_successor_array(self, vertex):
+        '''
+        Get sorted array of immediate successors of vertex. If the graph is
+        frozen, a read-only view of its CSR arrays is returned, otherwise the
+        array is built from :func:`get_successors()`. Only graphs whose vertices
+        are non-negative integers are supported.
+
+        :param vertex: The vertex whose successors to return.
+        :returns: Array of vertex successors.
+        :rtype: ``numpy.ndarray``
+        '''
+        if self._csr is not None:
+            vertices = self._get_csr_neighbors(vertex, 'successor_offsets',
+                'successors')
+        else:
+            vertices = numpy.array(sorted(self.get_successors(vertex)),
+                dtype=numpy.uint64)
+        return vertices
+
+
+    def get_predecessor_array(self, vertex):
+        '''
+        Get sorted array of immediate predecessors of vertex. If the graph is
+        frozen, a read-only view of its CSR arrays is returned, otherwise the
+        array is built from :func:`get_predecessors()`. Only graphs whose
+        vertices are non-negative integers are supported.
+
+        :param vertex: The vertex whose predecessors to return.
+        :returns: Array of vertex predecessors.
+        :rtype: ``numpy.ndarray``
+        '''
+        if self._csr is not None:
+            vertices = self._get_csr_neighbors(vertex, 'predecessor_offsets',
+                'predecessors')
+        else:
+            vertices = numpy.array(sorted(self.get_predecessors(vertex)),
+                dtype=numpy.uint64)
         return vertices
 
 
@@ -378,9 +945,21 @@ class EMGraph(object):
 
         :param edge: The graph edge to add.
         '''
+        self._check_not_frozen()
 
         tail, head = edge
 
+        # If a batch is open, buffer the edge and flush buffered edges if the
+        # batch budget is exceeded.
+        if self._batch_depth > 0:
+            if not self._is_pending_edge(edge):
+                self._pending_successors.setdefault(tail, set()).add(head)
+                self._pending_predecessors.setdefault(head, set()).add(tail)
+                self._pending_edges += 1
+                if self._pending_edges >= self.batch_budget:
+                    self._flush_batch()
+            return
+
         # Make sure vertices are there.
         self.add_vertex(tail)
         self.add_vertex(head)
@@ -406,8 +985,41 @@ class EMGraph(object):
             # We are done with this variable, release some memory.
             del predecessors
 
-            # Initialize edge attributes to an empty dictionary.
-            self._edge_attributes[edge] = dict()
+
+    def add_edges(self, edges):
+        '''
+        Add several edges in the graph at once. Edges are written in batches.
+
+        :param edges: Iterable of graph edges to add.
+        '''
+        with self.batch():
+            for edge in edges:
+                self.add_edge(edge)
+
+
+    @contextlib.contextmanager
+    def batch(self):
+        '''
+        Context manager that buffers edges added by :func:`add_edge()` until
+        the context is exited, or until :attr:`batch_budget` edges have been
+        buffered. Batches may be nested; buffered edges are flushed when the
+        outermost batch is closed.
+        '''
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._flush_batch()
+
+
+    def flush(self):
+        '''Write any edges buffered by open batches, as well as any buffered
+        edge column values.'''
+        self._flush_batch()
+        for column in self._edge_columns.itervalues():
+            column.flush()
 
 
     def remove_edge(self, edge):
@@ -418,6 +1030,8 @@ class EMGraph(object):
 
         :param edge: The graph edge to remove.
         '''
+        self._check_not_frozen()
+        self._flush_batch()
 
         tail, head = edge
 
@@ -446,7 +1060,7 @@ class EMGraph(object):
                 del predecessors
 
                 # Delete edge attributes.
-                del self._edge_attributes[edge]
+                self.remove_edge_attributes(edge)
 
 
     def get_edges(self):
@@ -456,9 +1070,19 @@ class EMGraph(object):
         :returns: Generator for all edges in graph.
         :rtype: ``generator``
         '''
-        for vertex in self._graph.keys():
-            for successor in self._graph[vertex]:
-                yield (vertex, successor)
+        self._flush_batch()
+
+        if self._csr is not None:
+            vertices = self._csr['vertices'].tolist()
+            offsets = self._csr['successor_offsets']
+            successors = self._csr['successors']
+            for i, vertex in enumerate(vertices):
+                for successor in successors[offsets[i]:offsets[i + 1]].tolist():
+                    yield (vertex, successor)
+        else:
+            for vertex in self._graph.keys():
+                for successor in self._graph[vertex]:
+                    yield (vertex, successor)
 
 
     def add_edge_attribute(self, edge, name, value):
@@ -471,7 +1095,16 @@ class EMGraph(object):
         :returns: Previous attribute value, if any, or ``None``.
         :rtype: ``object``
         '''
-        return self._add_attribute(self._edge_attributes, edge, name, value)
+        # Attributes of buffered edges are buffered as well.
+        if self._is_pending_edge(edge):
+            prev_value = self.get_edge_attribute(edge, name)
+            self._pending_edge_attributes.setdefault(edge, {})[name] = value
+            return prev_value
+
+        prev_value = None
+        if self._has_edge(edge):
+            prev_value = self._add_edge_attribute(edge, name, value)
+        return prev_value
 
 
     def remove_edge_attribute(self, edge, name):
@@ -483,7 +1116,32 @@ class EMGraph(object):
         :returns: Previous attribute value, if any, or ``None``.
         :rtype: ``object``
         '''
-        return self._remove_attribute(self._edge_attributes, edge, name)
+        if self._is_pending_edge(edge):
+            self._flush_batch()
+
+        value = self._remove_attribute(self._edge_attributes, edge, name)
+        if name in self._edge_columns:
+            column = self._edge_columns[name]
+            if edge in column:
+                value = column[edge]
+                del column[edge]
+
+        return value
+
+
+    def remove_edge_attributes(self, edge):
+        '''
+        Remove all attributes of an edge, including the ones stored in edge
+        columns.
+
+        :param edge: The graph edge whose attributes to remove.
+        '''
+        if self._is_pending_edge(edge):
+            self._flush_batch()
+
+        self._remove_attributes(self._edge_attributes, edge)
+        for column in self._edge_columns.itervalues():
+            self._remove_attributes(column, edge)
 
 
     def get_edge_attribute(self, edge, name):
@@ -495,13 +1153,87 @@ class EMGraph(object):
         :returns: Attribute value or ``None``.
         :rtype: ``object``
         '''
-        return self._get_attribute(self._edge_attributes, edge, name)
+        attributes = self._pending_edge_attributes.get(edge, {})
+        if name in attributes:
+            value = attributes[name]
+        elif name in self._edge_columns and edge in self._edge_columns[name]:
+            value = self._edge_columns[name][edge]
+        else:
+            # Values set before the column was declared are still found in the
+            # edge's attribute dictionary.
+            value = self._get_attribute(self._edge_attributes, edge, name)
+        return value
+
+
+    def is_frozen(self):
+        '''
+        Check if the graph is frozen.
+
+        :returns: ``True`` if the graph is frozen, ``False`` otherwise.
+        :rtype: ``bool``
+        '''
+        return self._csr is not None
+
+
+    def freeze(self):
+        '''
+        Compact the graph in read-optimized, memory mapped CSR arrays. The graph
+        can't be modified until :func:`thaw()` is called.
+
+        :raises RuntimeError: Raised when a vertex is not a non-negative integer.
+        '''
+
+        self._flush_batch()
+
+        if self._csr is None:
+
+            vertices = sorted(self._graph.keys())
+            for vertex in vertices:
+                if not isinstance(vertex, (int, long)) or vertex < 0:
+                    raise RuntimeError('Cannot freeze graph with vertex %r' % \
+                        (vertex, ))
+
+            successor_offsets, successors = \
+                self._make_csr(self._graph, vertices)
+            predecessor_offsets, predecessors = \
+                self._make_csr(self._transpose_graph, vertices)
+
+            dirname = '%s/csr' % self.dirname
+            if os.access(dirname, os.F_OK) == False:
+                os.makedirs(dirname, 0750)
+
+            # Vertices are saved last; their presence marks the graph as frozen.
+            numpy.save('%s/successor_offsets.npy' % dirname, successor_offsets)
+            numpy.save('%s/successors.npy' % dirname, successors)
+            numpy.save('%s/predecessor_offsets.npy' % dirname, predecessor_offsets)
+            numpy.save('%s/predecessors.npy' % dirname, predecessors)
+            numpy.save('%s/vertices.npy' % dirname,
+                numpy.array(vertices, dtype=numpy.uint64))
+
+            self._load_csr()
+
+
+    def thaw(self):
+        '''Drop the CSR arrays of a frozen graph and allow modifications again.'''
+
+        if self._csr is not None:
+            self._csr = None
+
+            # Vertices are removed first; the graph is no longer frozen.
+            dirname = '%s/csr' % self.dirname
+            for name in ['vertices', 'successor_offsets', 'successors',
+                    'predecessor_offsets', 'predecessors']:
+                os.unlink('%s/%s.npy' % (dirname, name))
 
 
     def close(self):
         '''Finalize this :class:`EMGraph` instance.'''
+        self._flush_batch()
+        self._csr = None
         self._graph.close()
         self._transpose_graph.close()
         self._vertex_attributes.close()
         self._edge_attributes.close()
+        for column in self._edge_columns.itervalues():
+            column.close()
 
@@ -59,6 +59,10 @@ class EMShadowMemory(object):
     .. automethod:: _mark_range
     .. automethod:: _unmark_range
     .. automethod:: _is_marked_range
+    .. automethod:: _mark_many
+    .. automethod:: _find_next_in_range
+    .. automethod:: _find_prev_in_range
+    .. automethod:: _notify
     '''
 
     def __init__(self, dirname, memory_ranges):
@@ -84,6 +88,9 @@ class EMShadowMemory(object):
         self.dirname = dirname
         self.shadows = shadows
 
+        # Functions called when shadow bytes are modified.
+        self.listeners = []
+
 
     def __del__(self):
         for shadow in self.shadows:
@@ -162,12 +169,14 @@ class EMShadowMemory(object):
 
         for i, (start_address, end_address) in enumerate(self.memory_ranges):
             if start_address <= address <= end_address:
-                return (i, end_address - address)
+                return (i, address - start_address)
 
         raise RuntimeError('Address %#x not backed by shadow memory' % address)
 
 
     def _mark(self, address, mark):
+        if self.listeners:
+            self._notify(address, 1)
         i, j = self._get_shadow_memory_coordinates(address)
         shadow = self.shadows[i]
         new_mark = shadow[j]
@@ -177,6 +186,8 @@ class EMShadowMemory(object):
 
 
     def _unmark(self, address, mark):
+        if self.listeners:
+            self._notify(address, 1)
         i, j = self._get_shadow_memory_coordinates(address)
         shadow = self.shadows[i]
         new_mark = shadow[j]
@@ -192,6 +203,8 @@ class EMShadowMemory(object):
 
 
     def _mark_range(self, address, length, mark):
+        if self.listeners:
+            self._notify(address, length)
         i, j = self._get_shadow_memory_coordinates(address)
         shadow = self.shadows[i]
         limit = min(j + length, len(shadow))
@@ -204,6 +217,8 @@ class EMShadowMemory(object):
 
 
     def _unmark_range(self, address, length, mark):
+        if self.listeners:
+            self._notify(address, length)
         i, j = self._get_shadow_memory_coordinates(address)
         shadow = self.shadows[i]
         limit = min(j + length, len(shadow))
@@ -229,6 +244,84 @@ class EMShadowMemory(object):
         return r
 
 
+    def _mark_many(self, addresses, mark):
+        '''
+        Set *mark* on the shadow byte of each address in *addresses*.
+
+        :param addresses: Sequence of addresses to mark.
+        :param mark: Shadow memory marks to set.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        if hasattr(addresses, 'tolist'):
+            addresses = addresses.tolist()
+        for address in addresses:
+            self._mark(address, mark)
+
+
+    def _find_next_in_range(self, i, j, limit, mask, value):
+        '''
+        Scan the *i*-th shadowed memory range forwards, starting from index *j*
+        up to, but not including, index *limit*, for a shadow byte whose bits
+        selected by *mask* equal *value*.
+
+        :param i: Index of shadowed memory range to scan.
+        :param j: Index of first shadow byte to examine.
+        :param limit: Index of the shadow byte where scanning stops.
+        :param mask: Bits of shadow bytes to examine.
+        :param value: Expected value of the bits selected by *mask*.
+        :returns: Index of matching shadow byte or ``None``.
+        :rtype: ``int``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        shadow = self.shadows[i]
+        while j < limit:
+            if shadow[j] & mask == value:
+                return j
+            j += 1
+        return None
+
+
+    def _find_prev_in_range(self, i, j, limit, mask, value):
+        '''
+        Scan the *i*-th shadowed memory range backwards, starting from index *j*
+        down to, and including, index *limit*, for a shadow byte whose bits
+        selected by *mask* equal *value*.
+
+        :param i: Index of shadowed memory range to scan.
+        :param j: Index of first shadow byte to examine.
+        :param limit: Index of the last shadow byte to examine.
+        :param mask: Bits of shadow bytes to examine.
+        :param value: Expected value of the bits selected by *mask*.
+        :returns: Index of matching shadow byte or ``None``.
+        :rtype: ``int``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        shadow = self.shadows[i]
+        while j >= limit:
+            if shadow[j] & mask == value:
+                return j
+            j -= 1
+        return None
+
+
+
+    def _notify(self, address, length):
+        '''
+        Call all listeners registered with :func:`add_listener()` to notify them
+        that *length* shadow bytes, starting at *address*, are being modified.
+
+        :param address: Address of first modified shadow byte.
+        :param length: Number of modified shadow bytes.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        for listener in self.listeners:
+            listener(address, length)
+
+
 
     # Public API begins here.
 
@@ -244,6 +337,159 @@ class EMShadowMemory(object):
             shadow.close()
 
 
+    def add_listener(self, listener):
+        '''
+        Register a function to be called whenever shadow bytes are marked or
+        unmarked. The function is passed the address of the first modified
+        shadow byte and the number of modified shadow bytes.
+
+        :param listener: The function to register.
+        '''
+        self.listeners.append(listener)
+
+
+    def remove_listener(self, listener):
+        '''
+        Unregister a function registered with :func:`add_listener()`.
+
+        :param listener: The function to unregister.
+        '''
+        self.listeners.remove(listener)
+
+
+    def is_shadowed(self, address):
+        '''
+        Check if address is backed by this shadow memory.
+
+        :param address: Address to check.
+        :returns: ``True`` if *address* is shadowed, ``False`` otherwise.
+        :rtype: ``bool``
+        '''
+        r = True
+        try:
+            self._get_shadow_memory_coordinates(address)
+        except RuntimeError:
+            r = False
+        return r
+
+
+    def mark_all(self, addresses, mark):
+        '''
+        Set *mark* on the shadow bytes of all addresses in *addresses*. This is
+        the bulk counterpart of the ``mark_as_*()`` family of functions, meant
+        for analyses that discover large numbers of addresses at once.
+
+        :param addresses: Sequence, or NumPy array, of addresses to mark.
+        :param mark: Shadow memory marks to set, e.g. ``M_ANALYZED | M_DATA``.
+        '''
+        self._mark_many(addresses, mark)
+
+
+    def find_next(self, address, mask, value, end_address=None):
+        '''
+        Find the first address, greater than or equal to *address*, whose shadow
+        byte bits selected by *mask* equal *value*. For example, the following
+        looks for the next basic block leader that hasn't been analyzed yet:
+
+        .. code-block:: python
+
+           shadow.find_next(address, M_ANALYZED | M_BASIC_BLOCK_LEADER,
+               M_BASIC_BLOCK_LEADER)
+
+        :param address: Address to start searching from.
+        :param mask: Shadow memory marks to examine.
+        :param value: Expected value of the marks selected by *mask*.
+        :param end_address: Address where searching stops (not included). If
+            ``None``, all shadowed memory ranges past *address* are searched.
+        :returns: Matching address or ``None``.
+        :rtype: ``long``
+        '''
+
+        for i, (start, end) in enumerate(self.memory_ranges):
+
+            # Skip memory ranges below `address' and stop at the first memory
+            # range past `end_address'.
+            if end < address:
+                continue
+            if end_address is not None and start >= end_address:
+                break
+
+            # Compute the indices of the shadow bytes to scan.
+            j = max(address, start) - start
+            limit = end - start + 1
+            if end_address is not None:
+                limit = min(limit, end_address - start)
+
+            j = self._find_next_in_range(i, j, limit, mask, value)
+            if j is not None:
+                return start + j
+
+        return None
+
+
+    def find_prev(self, address, mask, value, start_address=None):
+        '''
+        Find the last address, less than or equal to *address*, whose shadow
+        byte bits selected by *mask* equal *value*.
+
+        :param address: Address to start searching from.
+        :param mask: Shadow memory marks to examine.
+        :param value: Expected value of the marks selected by *mask*.
+        :param start_address: Address where searching stops (included). If
+            ``None``, all shadowed memory ranges below *address* are searched.
+        :returns: Matching address or ``None``.
+        :rtype: ``long``
+        '''
+
+        for i in reversed(range(len(self.memory_ranges))):
+            start, end = self.memory_ranges[i]
+
+            # Skip memory ranges above `address' and stop at the first memory
+            # range below `start_address'.
+            if start > address:
+                continue
+            if start_address is not None and end < start_address:
+                break
+
+            # Compute the indices of the shadow bytes to scan.
+            j = min(address, end) - start
+            limit = 0
+            if start_address is not None:
+                limit = max(limit, start_address - start)
+
+            j = self._find_prev_in_range(i, j, limit, mask, value)
+            if j is not None:
+                return start + j
+
+        return None
+
+
+    def find_all(self, mask, value, start_address=None, end_address=None):
+        '''
+        Iterate through all addresses whose shadow byte bits selected by *mask*
+        equal *value*, in increasing order. The shadow memory is consulted again
+        after each address is returned, so, marks set or removed while iterating
+        are taken into account.
+
+        :param mask: Shadow memory marks to examine.
+        :param value: Expected value of the marks selected by *mask*.
+        :param start_address: Address to start searching from. If ``None``,
+            searching starts from the lowest shadowed address.
+        :param end_address: Address where searching stops (not included). If
+            ``None``, searching stops at the highest shadowed address.
+        :returns: Generator of matching addresses.
+        :rtype: ``generator``
+        '''
+
+        if start_address is None:
+            start_address = self.memory_ranges[0][0]
+
+        address = self.find_next(start_address, mask, value, end_address)
+        while address is not None:
+            yield address
+            address = self.find_next(address + 1, mask, value, end_address)
+
+
     def mark_as_analyzed(self, address, length=1):
         '''
         Mark address range as analyzed.
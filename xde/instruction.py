@@ -15,6 +15,12 @@ This module defines a class that wraps a ``pyxed.Instruction`` instance and
 provides higher level methods (WIP). We actually use the *delegate* design
 pattern to forward method calls to the wrapped ``pyxed.Instruction`` object.
 
+Instructions are created by the million during disassembly, so the wrapper is
+kept lightweight; it uses ``__slots__``, binds the most frequently used methods
+of the wrapped object directly, and computes operand summaries (register sets
+and bitmasks, memory operands, next instruction address and branch target) at
+most once per instance.
+
 
 Classes
 -------
@@ -33,8 +39,24 @@ class Instruction(object):
 
     .. automethod:: __init__
     .. automethod:: __getattr__
+    .. automethod:: _analyze_register_operands
+    .. automethod:: _analyze_memory_operands
     '''
 
+    __slots__ = (
+        '_instruction', '_cpu', 'runtime_address',
+
+        # Frequently used methods of the wrapped `pyxed.Instruction'.
+        'get_length', 'get_category', 'get_iform', 'get_iclass',
+        'get_number_of_memory_operands',
+
+        # Operand summaries, computed on first use.
+        '_read_registers', '_written_registers', '_registers',
+        '_read_register_mask', '_written_register_mask', '_register_mask',
+        '_memory_operands', '_read_memory_operands', '_written_memory_operands',
+        '_next_instruction_address', '_branch_displacement'
+    )
+
     def __init__(self, instruction, cpu):
         '''
         :param instruction: The ``pyxed.Instruction`` instance to be wrapped.
@@ -48,6 +70,22 @@ class Instruction(object):
         # We also need this for private purposes.
         self._cpu = cpu
 
+        # Bind frequently used attributes and methods directly, to avoid going
+        # through `__getattr__()'.
+        self.runtime_address = instruction.runtime_address
+        self.get_length = instruction.get_length
+        self.get_category = instruction.get_category
+        self.get_iform = instruction.get_iform
+        self.get_iclass = instruction.get_iclass
+        self.get_number_of_memory_operands = \
+            instruction.get_number_of_memory_operands
+
+        # Operand summaries are computed when first asked for.
+        self._read_registers = None
+        self._memory_operands = None
+        self._next_instruction_address = None
+        self._branch_displacement = None
+
 
     def __getattr__(self, name):
         '''
@@ -63,6 +101,72 @@ class Instruction(object):
         return self.runtime_address
 
 
+    def _analyze_register_operands(self):
+        '''
+        Compute the sets, as well as the bitmasks, of registers read, written
+        and accessed by this instruction, in a single pass over its operands.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        instruction = self._instruction
+
+        read_registers = set()
+        written_registers = set()
+        registers = set()
+        for i in range(instruction.get_noperands()):
+            operand = instruction.get_operand(i)
+            if operand.is_register():
+                reg = instruction.get_reg(operand.get_name())
+                registers.add(reg)
+                if operand.is_read():
+                    read_registers.add(reg)
+                if operand.is_written():
+                    written_registers.add(reg)
+
+        self._read_registers = frozenset(read_registers)
+        self._written_registers = frozenset(written_registers)
+        self._registers = frozenset(registers)
+
+        self._read_register_mask = sum([1 << reg for reg in read_registers])
+        self._written_register_mask = sum([1 << reg for reg in written_registers])
+        self._register_mask = sum([1 << reg for reg in registers])
+
+
+    def _analyze_memory_operands(self):
+        '''
+        Compute the tuples describing this instruction's memory operands, as
+        well as the sets of read and written memory operands.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        instruction = self._instruction
+
+        memory_operands = []
+        read_memory_operands = set()
+        written_memory_operands = set()
+        for i in range(instruction.get_number_of_memory_operands()):
+            memop = (
+                instruction.get_seg_reg(i),
+                instruction.get_base_reg(i),
+                instruction.get_index_reg(i),
+                instruction.get_scale(i),
+                self.get_memory_displacement(i),
+                instruction.get_memory_operand_length(i)
+            )
+            memory_operands.append(memop)
+            if instruction.mem_is_read(i):
+                read_memory_operands.add(memop)
+            if instruction.mem_is_written(i):
+                written_memory_operands.add(memop)
+
+        self._memory_operands = tuple(memory_operands)
+        self._read_memory_operands = frozenset(read_memory_operands)
+        self._written_memory_operands = frozenset(written_memory_operands)
+
+
+
     def get_next_instruction_address(self):
         '''
         Get the absolute address of the instruction immediately following the
@@ -71,7 +175,10 @@ class Instruction(object):
         :returns: Next instruction's absolute address.
         :rtype: ``long``
         '''
-        return self.runtime_address + self.get_length()
+        if self._next_instruction_address is None:
+            self._next_instruction_address = self.runtime_address + \
+                self.get_length()
+        return self._next_instruction_address
 
 
     def get_read_registers(self):
@@ -79,15 +186,11 @@ class Instruction(object):
         Get set of registers read by this instruction.
 
         :returns: Set of read registers.
-        :rtype: ``set``
+        :rtype: ``frozenset``
         '''
-
-        regs = set()
-        for i in range(self.get_noperands()):
-            operand = self.get_operand(i)
-            if operand.is_register() and operand.is_read():
-                regs.add(self.get_reg(operand.get_name()))
-        return regs
+        if self._read_registers is None:
+            self._analyze_register_operands()
+        return self._read_registers
 
 
     def get_written_registers(self):
@@ -95,15 +198,11 @@ class Instruction(object):
         Get set of registers written by this instruction.
 
         :returns: Set of written registers.
-        :rtype: ``set``
+        :rtype: ``frozenset``
         '''
-
-        regs = set()
-        for i in range(self.get_noperands()):
-            operand = self.get_operand(i)
-            if operand.is_register() and operand.is_written():
-                regs.add(self.get_reg(operand.get_name()))
-        return regs
+        if self._read_registers is None:
+            self._analyze_register_operands()
+        return self._written_registers
 
 
     def get_registers(self):
@@ -111,15 +210,62 @@ class Instruction(object):
         Get instruction's register operands.
 
         :returns: Set of instruction's register operands.
-        :rtype: ``set``
+        :rtype: ``frozenset``
         '''
+        if self._read_registers is None:
+            self._analyze_register_operands()
+        return self._registers
 
-        regs = set()
-        for i in range(self.get_noperands()):
-            operand = self.get_operand(i)
-            if operand.is_register():
-                regs.add(self.get_reg(operand.get_name()))
-        return regs
+
+    def get_read_register_mask(self):
+        '''
+        Get bitmask of registers read by this instruction. Bit *n* is set if
+        the register whose XED identifier is *n* is read.
+
+        :returns: Bitmask of read registers.
+        :rtype: ``long``
+        '''
+        if self._read_registers is None:
+            self._analyze_register_operands()
+        return self._read_register_mask
+
+
+    def get_written_register_mask(self):
+        '''
+        Get bitmask of registers written by this instruction. Bit *n* is set if
+        the register whose XED identifier is *n* is written.
+
+        :returns: Bitmask of written registers.
+        :rtype: ``long``
+        '''
+        if self._read_registers is None:
+            self._analyze_register_operands()
+        return self._written_register_mask
+
+
+    def get_register_mask(self):
+        '''
+        Get bitmask of instruction's register operands. Bit *n* is set if the
+        register whose XED identifier is *n* is an operand.
+
+        :returns: Bitmask of register operands.
+        :rtype: ``long``
+        '''
+        if self._read_registers is None:
+            self._analyze_register_operands()
+        return self._register_mask
+
+
+    def writes_program_counter(self):
+        '''
+        Check if this instruction writes the program counter.
+
+        :returns: ``True`` if the program counter is written, ``False``
+            otherwise.
+        :rtype: ``bool``
+        '''
+        pc = self._cpu.get_program_counter_name()
+        return self.get_written_register_mask() >> pc & 1 == 1
 
 
     def get_memory_displacement(self, i):
@@ -164,15 +310,9 @@ class Instruction(object):
         :returns: A 6-tuple describing the memory operand.
         :rtype: ``tuple``
         '''
-        memop = (
-            self.get_seg_reg(i),
-            self.get_base_reg(i),
-            self.get_index_reg(i),
-            self.get_scale(i),
-            self.get_memory_displacement(i),
-            self.get_memory_operand_length(i)
-        )
-        return memop
+        if self._memory_operands is None:
+            self._analyze_memory_operands()
+        return self._memory_operands[i]
 
 
     def get_read_memory_operands(self):
@@ -180,14 +320,11 @@ class Instruction(object):
         Get set of memory operands read by this instruction.
 
         :returns: Set of read memory operands.
-        :rtype: ``set``
+        :rtype: ``frozenset``
         '''
-
-        memops = set()
-        for i in range(self.get_number_of_memory_operands()):
-            if self.mem_is_read(i):
-               memops.add(self.get_memory_operand(i))
-        return memops
+        if self._memory_operands is None:
+            self._analyze_memory_operands()
+        return self._read_memory_operands
 
 
     def get_written_memory_operands(self):
@@ -195,14 +332,11 @@ class Instruction(object):
         Get set of memory operands written by this instruction.
 
         :returns: Set of written memory operands.
-        :rtype: ``set``
+        :rtype: ``frozenset``
         '''
-
-        memops = set()
-        for i in range(self.get_number_of_memory_operands()):
-            if self.mem_is_written(i):
-               memops.add(self.get_memory_operand(i))
-        return memops
+        if self._memory_operands is None:
+            self._analyze_memory_operands()
+        return self._written_memory_operands
 
 
     def get_memory_operands(self):
@@ -210,13 +344,11 @@ class Instruction(object):
         Get instruction's memory operands.
 
         :returns: Set of instruction's memory operands.
-        :rtype: ``set``
+        :rtype: ``frozenset``
         '''
-
-        memops = set()
-        for i in range(self.get_number_of_memory_operands()):
-               memops.add(self.get_memory_operand(i))
-        return memops
+        if self._memory_operands is None:
+            self._analyze_memory_operands()
+        return frozenset(self._memory_operands)
 
 
     def get_branch_displacement(self):
@@ -229,6 +361,9 @@ class Instruction(object):
         :rtype: ``long``
         '''
 
+        if self._branch_displacement is not None:
+            return self._branch_displacement
+
         displacement = self._instruction.get_branch_displacement()
 
         # If it's a far control transfer, the branch displacement is absolute.
@@ -243,5 +378,5 @@ class Instruction(object):
             # Branch displacement is relative to next instruction's address.
             displacement += self.get_next_instruction_address()
 
+        self._branch_displacement = displacement
         return displacement
-
@@ -0,0 +1,142 @@
+'''
+:mod:`instruction_cache` -- Cache of decoded instructions
+=========================================================
+
+.. module: instruction_cache
+   :platform: Unix, Windows
+   :synopsis: Cache of decoded instructions
+.. moduleauthor:: huku <huku@grhack.net>
+
+
+About
+-----
+A bounded cache of :class:`instruction.Instruction` objects, keyed by address,
+used by :func:`disassembler.Disassembler.get_instruction()` to avoid decoding
+hot instructions over and over again. When the cache is full, the least
+recently used instruction is evicted.
+
+Cached instructions are only valid as long as the shadow memory of their bytes
+doesn't change. The cache is meant to be registered as a shadow memory listener,
+so that modified shadow bytes invalidate the instructions that cover them:
+
+.. code-block:: python
+
+   cache = InstructionCache(4096)
+   shadow.add_listener(cache.invalidate)
+
+Hits and misses are counted in :attr:`InstructionCache.hits` and
+:attr:`InstructionCache.misses` respectively.
+
+
+Classes
+-------
+'''
+
+__author__ = 'huku <huku@grhack.net>'
+
+
+import collections
+
+
+# Maximum length of x86 instructions.
+MAX_INSTRUCTION_LENGTH = 15
+
+
+
+class InstructionCache(object):
+    '''
+    Bounded cache of decoded instructions with LRU eviction.
+
+    .. automethod:: __init__
+    '''
+
+    def __init__(self, capacity):
+        '''
+        :param capacity: Maximum number of instructions kept in the cache.
+        '''
+
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+
+        # Maps addresses to instructions, least recently used first.
+        self._instructions = collections.OrderedDict()
+
+
+    def __len__(self):
+        return len(self._instructions)
+
+
+    def __contains__(self, address):
+        return address in self._instructions
+
+
+
+    def get(self, address):
+        '''
+        Look up the instruction at *address* and mark it as the most recently
+        used one.
+
+        :param address: Address of instruction to look up.
+        :returns: The cached instruction or ``None``.
+        :rtype: :class:`instruction.Instruction`
+        '''
+
+        insn = self._instructions.pop(address, None)
+        if insn is not None:
+            self._instructions[address] = insn
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        return insn
+
+
+    def put(self, address, insn):
+        '''
+        Add the instruction at *address* in the cache, evicting the least
+        recently used instruction if the cache is full.
+
+        :param address: Address of instruction to add.
+        :param insn: The instruction to add.
+        '''
+
+        self._instructions.pop(address, None)
+        self._instructions[address] = insn
+        while len(self._instructions) > self.capacity:
+            self._instructions.popitem(last=False)
+
+
+    def invalidate(self, address, length=1):
+        '''
+        Drop all cached instructions that overlap with *length* bytes starting
+        at *address*.
+
+        :param address: Address of first modified byte.
+        :param length: Number of modified bytes.
+        '''
+
+        if len(self._instructions) == 0:
+            return
+
+        # Instructions starting up to `MAX_INSTRUCTION_LENGTH - 1' bytes before
+        # `address' may overlap with the modified bytes.
+        start_address = address - MAX_INSTRUCTION_LENGTH + 1
+        end_address = address + length
+        if end_address - start_address > len(self._instructions):
+            insn_addresses = [a for a in self._instructions \
+                if start_address <= a < end_address]
+        else:
+            insn_addresses = xrange(start_address, end_address)
+
+        for insn_address in insn_addresses:
+            insn = self._instructions.get(insn_address)
+            if insn is not None and insn_address + insn.get_length() > address:
+                del self._instructions[insn_address]
+
+
+    def clear(self):
+        '''Drop all cached instructions and reset the hit and miss counters.'''
+        self._instructions.clear()
+        self.hits = 0
+        self.misses = 0
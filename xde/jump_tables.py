@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+'''
+:mod:`jump_tables` - Jump table analysis
+========================================
+
+.. module: jump_tables
+   :platform: Unix, Windows
+   :synopsis: Jump table analysis
+.. moduleauthor:: huku <huku@grhack.net>
+
+
+About
+-----
+Helps the disassembler bound the jump tables accessed by indirect flow control
+instructions. Paths leading to an indirect jump are walked backwards, along the
+graph of code cross references, in search of a comparison and a conditional
+jump guarding the jump table index (e.g. ``cmp eax, n; ja default``). When
+found, exactly as many elements as the guard allows are read. Otherwise, the
+disassembler reads elements in chunks of :data:`CHUNK_SIZE` until one that
+doesn't look like a jump table element is found.
+
+All functions take the :class:`disassembler.Disassembler` instance whose code
+they analyze as their first argument:
+
+.. code-block:: python
+
+   bound = get_bound(disasm, insn, insn.get_index_reg(0))
+
+
+Functions
+---------
+'''
+
+__author__ = 'huku <huku@grhack.net>'
+
+
+import sys
+
+try:
+    import numpy
+except ImportError:
+    sys.exit('NumPy not installed?')
+
+import pyxed
+
+
+# Maps memory operand lengths of indirect flow control instructions to the size
+# of the target address they hold. Far pointers hold the target address after a
+# 16-bit segment selector.
+ELEMENT_SIZES = {
+    4: 4,       # 32-bit EIP
+    6: 4,       # 48-bit pointer (CS+EIP for far branching)
+    8: 8,       # 64-bit RIP
+    10: 8       # 80-bit pointer (CS+RIP for far branching)
+}
+
+# Maps conditional jumps that bound an unsigned jump table index, along with
+# whether the path to the indirect jump takes the branch or not, to the number
+# added to the immediate of the preceding comparison to get the number of jump
+# table elements.
+GUARDS = {
+    (pyxed.XED_ICLASS_JNBE, False): 1,      # cmp eax, n; ja default
+    (pyxed.XED_ICLASS_JNB, False): 0,       # cmp eax, n; jae default
+    (pyxed.XED_ICLASS_JBE, True): 1,        # cmp eax, n; jbe table
+    (pyxed.XED_ICLASS_JB, True): 0          # cmp eax, n; jb table
+}
+
+# Classes of instructions that may copy or extend the jump table index in place
+# between the guard and the indirect jump (e.g. `mov eax, eax').
+INDEX_MOVES = frozenset([
+    pyxed.XED_ICLASS_MOV,
+    pyxed.XED_ICLASS_MOVSX,
+    pyxed.XED_ICLASS_MOVSXD,
+    pyxed.XED_ICLASS_MOVZX
+])
+
+# Maximum number of instructions walked backwards from an indirect jump in
+# search of the guard of its jump table index.
+GUARD_DEPTH = 16
+
+# Maximum number of elements of jump tables with inferred bounds; larger bounds
+# are considered bogus.
+MAX_ELEMENTS = 65536
+
+# Number of elements read at once from jump tables whose bound is unknown.
+CHUNK_SIZE = 64
+
+
+def get_guard(disassembler, insn, target, family):
+    '''
+    Check if conditional jump *insn* guards the index of a jump table on the
+    path leading to address *target*. That is, if *insn* is preceded by a
+    comparison of a register of family *family* with an immediate and the
+    unsigned condition checked, as it applies to the path to *target*, bounds
+    the register's value (e.g. ``cmp eax, n; ja default``).
+
+    :param disassembler: The :class:`disassembler.Disassembler` instance.
+    :param insn: Conditional jump instruction object to check.
+    :param target: Address of the successor of *insn* on the path to the
+        indirect jump.
+    :param family: Register family of the jump table index, as returned by
+        :func:`cpu.CPU.get_register_family()`.
+    :returns: The number of jump table elements implied by the guard or
+        ``None``.
+    :rtype: ``long``
+    '''
+
+    r = None
+
+    code_xrefs = disassembler.code_xrefs
+
+    # Does the path to `target' take the branch or fall through?
+    predicate = code_xrefs.get_edge_attribute((insn.runtime_address, target),
+        'predicate')
+
+    key = (insn.get_iclass(), predicate)
+    if key in GUARDS:
+
+        # Look for the comparison immediately preceding the conditional jump.
+        for address in code_xrefs.get_predecessors(insn.runtime_address):
+            cmp_insn = disassembler.get_instruction(long(address))
+            if cmp_insn is None or \
+                    cmp_insn.get_iclass() != pyxed.XED_ICLASS_CMP or \
+                    cmp_insn.get_next_instruction_address() != \
+                        insn.runtime_address or \
+                    cmp_insn.get_number_of_memory_operands() != 0 or \
+                    cmp_insn.get_immediate_width_bits() == 0:
+                continue
+
+            # The register compared should be the index register.
+            operand = cmp_insn.get_operand(0)
+            if operand.is_register():
+                reg = cmp_insn.get_reg(operand.get_name())
+                if disassembler.cpu.get_register_family(reg) == family:
+                    n = cmp_insn.get_unsigned_immediate() + GUARDS[key]
+                    if 0 < n <= MAX_ELEMENTS:
+                        r = n
+            break
+
+    return r
+
+
+def get_bound(disassembler, insn, index_reg):
+    '''
+    Infer the number of elements of the jump table accessed by indirect flow
+    control instruction *insn* using index register *index_reg*. Paths leading
+    to *insn* are walked backwards, for up to :data:`GUARD_DEPTH` instructions,
+    in search of a conditional jump guarding the index (see
+    :func:`get_guard()`). The index register should not be modified between
+    the guard and *insn*, other than being copied or extended in place (e.g.
+    ``mov eax, eax``).
+
+    :param disassembler: The :class:`disassembler.Disassembler` instance.
+    :param insn: Instruction object whose jump table bound to infer.
+    :param index_reg: Index register of *insn*'s memory operand.
+    :returns: The largest number of elements implied by the guards, or ``None``
+        if some path to *insn* isn't guarded.
+    :rtype: ``long``
+    '''
+
+    cpu = disassembler.cpu
+    family = cpu.get_register_family(index_reg)
+
+    r = None
+
+    visited = set()
+    stack = [(insn.runtime_address, 0)]
+    while len(stack):
+
+        address, depth = stack.pop()
+
+        # Give up on paths that reach the entry of the function, or go on for
+        # too long, without being guarded.
+        predecessors = disassembler.code_xrefs.get_predecessors(address)
+        if len(predecessors) == 0 or depth >= GUARD_DEPTH:
+            return None
+
+        for predecessor in predecessors:
+            predecessor = long(predecessor)
+            if predecessor in visited:
+                continue
+            visited.add(predecessor)
+
+            pred_insn = disassembler.get_instruction(predecessor)
+            if pred_insn is None or \
+                    pred_insn.get_category() == pyxed.XED_CATEGORY_CALL:
+                return None
+
+            # If this is the guard, the path ends here.
+            n = get_guard(disassembler, pred_insn, address, family)
+            if n is not None:
+                if r is None or n > r:
+                    r = n
+                continue
+
+            # Otherwise, make sure the index register is not modified, other
+            # than being copied or extended in place.
+            written = [cpu.get_register_family(reg) \
+                for reg in pred_insn.get_written_registers()]
+            if family in written:
+                read = [cpu.get_register_family(reg) \
+                    for reg in pred_insn.get_read_registers()]
+                if pred_insn.get_iclass() not in INDEX_MOVES or \
+                        pred_insn.get_number_of_memory_operands() != 0 or \
+                        family not in read:
+                    return None
+
+            stack.append((predecessor, depth + 1))
+
+    return r
+
+
+def get_elements(disassembler, addresses, length):
+    '''
+    Read the elements of *length* bytes stored at all addresses in *addresses*
+    at once and determine which of them look like jump table elements, i.e.
+    point to executable memory.
+
+    :param disassembler: The :class:`disassembler.Disassembler` instance.
+    :param addresses: Sorted array of addresses to read elements from.
+    :param length: Length of memory operand of the indirect flow control
+        instruction.
+    :returns: Tuple holding a boolean array, ``True`` for elements pointing to
+        executable memory, and the array of elements read.
+    :rtype: ``tuple``
+    '''
+
+    # Get size of element's target address (shouldn't throw an exception).
+    size = ELEMENT_SIZES[length]
+
+    valid, elements = disassembler.read_pointers_many(addresses + \
+        numpy.uint64(length - size), size)
+    valid &= disassembler.is_memory_executable_many(elements)
+    return valid, elements
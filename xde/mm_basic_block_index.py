@@ -0,0 +1,260 @@
+'''
+:mod:`mm_basic_block_index` -- Sorted index of basic block boundaries
+=====================================================================
+
+.. module: mm_basic_block_index
+   :platform: Unix, Windows
+   :synopsis: Sorted index of basic block boundaries
+.. moduleauthor:: huku <huku@grhack.net>
+
+
+About
+-----
+Maps arbitrary addresses to the basic blocks that contain them. The index is
+made of two parallel, memory mapped arrays holding the start and end addresses
+of all basic blocks, sorted by start address. Looking up the basic block that
+contains an address is a binary search on the array of start addresses, while
+mapping an array of addresses to basic blocks is a single vectorized search:
+
+.. code-block:: python
+
+   index = MMBasicBlockIndex('/tmp/index')
+   for start_address, end_address in basic_blocks:
+       index.add(start_address, end_address)
+   index.flush()
+
+   print index.lookup(address)
+
+The arrays are stored in NumPy's ``.npy`` format and are reloaded when the index
+is instantiated again on the same directory.
+
+
+Classes
+-------
+'''
+
+__author__ = 'huku <huku@grhack.net>'
+
+
+import sys
+import os
+
+try:
+    import numpy
+except ImportError:
+    sys.exit('NumPy not installed?')
+
+
+
+class MMBasicBlockIndex(object):
+    '''
+    Sorted, memory mapped index of basic block start and end addresses.
+
+    .. automethod:: __init__
+    .. automethod:: _load
+    .. automethod:: _save
+    .. automethod:: _get_merged_rows
+    '''
+
+    def __init__(self, dirname):
+        '''
+        :param dirname: Directory where the index arrays will be stored. The
+            directory is created if it does not exist.
+        '''
+
+        # Create container directory if not there.
+        if os.access(dirname, os.F_OK) == False:
+            os.makedirs(dirname, 0750)
+
+        self.dirname = dirname
+
+        # Basic block boundaries added but not flushed yet.
+        self._pending_start_addresses = []
+        self._pending_end_addresses = []
+
+        # Load existing index, if any.
+        self.start_addresses = self._load('start_addresses')
+        self.end_addresses = self._load('end_addresses')
+
+
+    def __del__(self):
+        self.close()
+
+
+    def __len__(self):
+        return len(self.start_addresses)
+
+
+
+    def _load(self, name, dtype=numpy.uint64, mode='r'):
+        '''
+        Memory map array *name* from the index directory. An empty array is
+        returned if the array has not been saved yet.
+
+        :param name: Name of array to load.
+        :param dtype: Type of the empty array returned if *name* doesn't exist.
+        :param mode: Mode the array is memory mapped with, as accepted by
+            ``numpy.load()``.
+        :returns: The memory mapped array.
+        :rtype: ``numpy.ndarray``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        filename = '%s/%s.npy' % (self.dirname, name)
+        if os.access(filename, os.F_OK):
+            r = numpy.load(filename, mmap_mode=mode)
+        else:
+            r = numpy.zeros(0, dtype=dtype)
+        return r
+
+
+    def _save(self, name, data):
+        '''
+        Save array *data* as *name* in the index directory.
+
+        :param name: Name of array to save.
+        :param data: The array to save.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        numpy.save('%s/%s.npy' % (self.dirname, name), data)
+
+
+    def _get_merged_rows(self, start_addresses):
+        '''
+        Given the start addresses of existing and newly added basic blocks, in
+        this order, return the indices of the rows that make up the merged
+        index. Rows are sorted by start address and, for basic blocks added more
+        than once, only the most recently added row is kept.
+
+        :param start_addresses: Array of basic block start addresses.
+        :returns: Array of row indices.
+        :rtype: ``numpy.ndarray``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        # Stable sort, so that duplicate rows remain in insertion order.
+        rows = numpy.argsort(start_addresses, kind='mergesort')
+
+        # Keep the last of each run of rows with equal start addresses.
+        start_addresses = start_addresses[rows]
+        last = numpy.ones(len(rows), dtype=numpy.bool_)
+        last[:-1] = start_addresses[1:] != start_addresses[:-1]
+
+        return rows[last]
+
+
+
+    def add(self, start_address, end_address):
+        '''
+        Add a basic block in the index. The index is not updated until
+        :func:`flush()` is called.
+
+        :param start_address: Address of first instruction in basic block.
+        :param end_address: Address of first instruction in physically bordering
+            basic block.
+        '''
+        self._pending_start_addresses.append(start_address)
+        self._pending_end_addresses.append(end_address)
+
+
+    def flush(self):
+        '''
+        Merge basic blocks added by :func:`add()` in the index and write the
+        updated index arrays on disk.
+        '''
+
+        if len(self._pending_start_addresses):
+            start_addresses = numpy.concatenate((self.start_addresses,
+                numpy.array(self._pending_start_addresses, dtype=numpy.uint64)))
+            end_addresses = numpy.concatenate((self.end_addresses,
+                numpy.array(self._pending_end_addresses, dtype=numpy.uint64)))
+
+            rows = self._get_merged_rows(start_addresses)
+            self._save('start_addresses', start_addresses[rows].astype(numpy.uint64))
+            self._save('end_addresses', end_addresses[rows].astype(numpy.uint64))
+
+            self._pending_start_addresses = []
+            self._pending_end_addresses = []
+
+            self.start_addresses = self._load('start_addresses')
+            self.end_addresses = self._load('end_addresses')
+
+
+    def clear(self):
+        '''Remove all basic blocks from the index.'''
+        self._pending_start_addresses = []
+        self._pending_end_addresses = []
+        self.start_addresses = numpy.zeros(0, dtype=numpy.uint64)
+        self.end_addresses = numpy.zeros(0, dtype=numpy.uint64)
+        self._save('start_addresses', self.start_addresses)
+        self._save('end_addresses', self.end_addresses)
+
+
+    def get_row(self, address):
+        '''
+        Return the row of the basic block that contains *address*.
+
+        :param address: Address to look up.
+        :returns: Index in :attr:`start_addresses` and :attr:`end_addresses`, or
+            -1 if *address* is not in a basic block.
+        :rtype: ``int``
+        '''
+
+        i = int(numpy.searchsorted(self.start_addresses, address, 'right')) - 1
+        if i >= 0 and address >= self.end_addresses[i]:
+            i = -1
+
+        return i
+
+
+    def lookup(self, address):
+        '''
+        Return the start address of the basic block that contains *address*.
+
+        :param address: Address to look up.
+        :returns: Basic block start address or ``None``.
+        :rtype: ``long``
+        '''
+
+        r = None
+
+        i = self.get_row(address)
+        if i >= 0:
+            r = long(self.start_addresses[i])
+
+        return r
+
+
+    def lookup_many(self, addresses):
+        '''
+        Map an array of addresses to the indices of the basic blocks that
+        contain them, in a single pass. Sorted input results in better locality
+        of reference, but is not a requirement.
+
+        :param addresses: Array, or any sequence, of addresses to look up.
+        :returns: Array of indices in :attr:`start_addresses` and
+            :attr:`end_addresses`, or -1 for addresses not in a basic block.
+        :rtype: ``numpy.ndarray``
+        '''
+
+        addresses = numpy.asarray(addresses, dtype=numpy.uint64)
+
+        r = numpy.searchsorted(self.start_addresses, addresses, 'right')
+        r = r.astype(numpy.int64) - 1
+
+        # Addresses below the first basic block, or in gaps between physically
+        # bordering basic blocks, don't belong to any basic block.
+        found = r >= 0
+        found[found] = addresses[found] < self.end_addresses[r[found]]
+        r[~found] = -1
+
+        return r
+
+
+    def close(self):
+        '''Flush and close the index.'''
+        self.flush()
+        self.start_addresses = numpy.zeros(0, dtype=numpy.uint64)
+        self.end_addresses = numpy.zeros(0, dtype=numpy.uint64)
@@ -0,0 +1,281 @@
+'''
+:mod:`mm_basic_block_table` -- Columnar basic block table
+=========================================================
+
+.. module: mm_basic_block_table
+   :platform: Unix, Windows
+   :synopsis: Columnar basic block table
+.. moduleauthor:: huku <huku@grhack.net>
+
+
+About
+-----
+Extends :class:`mm_basic_block_index.MMBasicBlockIndex` to a full, columnar
+representation of the program's basic blocks. Each basic block is a row in a
+set of parallel, memory mapped arrays:
+
+* **start_addresses** -- Address of the basic block's first instruction.
+
+* **end_addresses** -- Address of the first instruction of the physically
+  bordering basic block.
+
+* **instruction_counts** -- Number of instructions in the basic block.
+
+* **instruction_indices** -- Index of the basic block's first instruction
+  offset in **instruction_offsets**.
+
+* **functions** -- Row of the entry point basic block of the function the
+  basic block belongs to, or -1 if unknown.
+
+A flat array, **instruction_offsets**, holds the offsets of all instructions
+from the start addresses of their basic blocks. Whole-program passes can stream
+basic blocks without deserializing anything, and aggregate statistics can be
+computed directly on the columns:
+
+.. code-block:: python
+
+   sizes = table.get_sizes()
+   print numpy.histogram(sizes, bins=16)
+   print table.instruction_counts.sum()
+
+
+Classes
+-------
+'''
+
+__author__ = 'huku <huku@grhack.net>'
+
+
+import sys
+
+try:
+    import numpy
+except ImportError:
+    sys.exit('NumPy not installed?')
+
+import basic_block
+from mm_basic_block_index import MMBasicBlockIndex
+
+
+# Number of rows converted to Python objects at once when streaming basic
+# blocks.
+CHUNK_SIZE = 65536
+
+
+class MMBasicBlockTable(MMBasicBlockIndex):
+    '''
+    Columnar, memory mapped table of basic blocks.
+
+    .. automethod:: __init__
+    .. automethod:: _reload
+    '''
+
+    def __init__(self, dirname):
+        '''
+        :param dirname: Directory where the table arrays will be stored. The
+            directory is created if it does not exist.
+        '''
+
+        super(MMBasicBlockTable, self).__init__(dirname)
+
+        # Instruction offsets of basic blocks added but not flushed yet.
+        self._pending_instruction_counts = []
+        self._pending_instruction_offsets = []
+
+        # Load existing columns, if any.
+        self._reload()
+
+
+
+    def add(self, start_address, end_address, instructions=None):
+        '''
+        Add a basic block in the table. The table is not updated until
+        :func:`flush()` is called.
+
+        :param start_address: Address of first instruction in basic block.
+        :param end_address: Address of first instruction in physically bordering
+            basic block.
+        :param instructions: List of instruction addresses in basic block. If
+            ``None``, the basic block is assumed to hold a single instruction.
+        '''
+        super(MMBasicBlockTable, self).add(start_address, end_address)
+
+        if instructions is None:
+            instructions = [start_address]
+
+        self._pending_instruction_counts.append(len(instructions))
+        self._pending_instruction_offsets.extend(
+            [address - start_address for address in instructions])
+
+
+    def flush(self):
+        '''
+        Merge basic blocks added by :func:`add()` in the table and write the
+        updated table arrays on disk. Function assignments of existing basic
+        blocks are preserved, but are reset if the basic block was re-added.
+        '''
+
+        if len(self._pending_start_addresses):
+            start_addresses = numpy.concatenate((self.start_addresses,
+                numpy.array(self._pending_start_addresses, dtype=numpy.uint64)))
+            end_addresses = numpy.concatenate((self.end_addresses,
+                numpy.array(self._pending_end_addresses, dtype=numpy.uint64)))
+
+            pending_counts = numpy.array(self._pending_instruction_counts,
+                dtype=numpy.uint32)
+            counts = numpy.concatenate((self.instruction_counts, pending_counts))
+            offsets = numpy.concatenate((self.instruction_offsets,
+                numpy.array(self._pending_instruction_offsets,
+                    dtype=numpy.uint32)))
+            functions = numpy.concatenate((self.functions,
+                -numpy.ones(len(pending_counts), dtype=numpy.int64)))
+
+            # Position of each row's instruction offsets in `offsets'.
+            indices = numpy.zeros(len(counts), dtype=numpy.int64)
+            numpy.cumsum(counts[:-1], out=indices[1:])
+
+            # Sort and deduplicate rows. Function entry points are referred to by
+            # row, so, existing assignments are remapped to the new rows.
+            rows = self._get_merged_rows(start_addresses)
+            counts = counts[rows].astype(numpy.uint32)
+            new_rows = -numpy.ones(len(start_addresses), dtype=numpy.int64)
+            new_rows[rows] = numpy.arange(len(rows))
+            functions = functions[rows]
+            assigned = functions >= 0
+            functions[assigned] = new_rows[functions[assigned]]
+
+            # Gather the instruction offsets of the selected rows.
+            new_indices = numpy.zeros(len(rows), dtype=numpy.int64)
+            numpy.cumsum(counts[:-1], out=new_indices[1:])
+            gather = numpy.repeat(indices[rows] - new_indices, counts) + \
+                numpy.arange(counts.sum(dtype=numpy.int64))
+
+            self._save('start_addresses', start_addresses[rows].astype(numpy.uint64))
+            self._save('end_addresses', end_addresses[rows].astype(numpy.uint64))
+            self._save('instruction_counts', counts)
+            self._save('instruction_indices', new_indices.astype(numpy.uint64))
+            self._save('instruction_offsets', offsets[gather].astype(numpy.uint32))
+            self._save('functions', functions)
+
+            self._pending_start_addresses = []
+            self._pending_end_addresses = []
+            self._pending_instruction_counts = []
+            self._pending_instruction_offsets = []
+
+            self._reload()
+
+
+    def _reload(self):
+        '''
+        Memory map all table columns from the table directory.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        self.start_addresses = self._load('start_addresses')
+        self.end_addresses = self._load('end_addresses')
+        self.instruction_counts = self._load('instruction_counts', numpy.uint32)
+        self.instruction_indices = self._load('instruction_indices')
+        self.instruction_offsets = self._load('instruction_offsets',
+            numpy.uint32)
+        self.functions = self._load('functions', numpy.int64, 'r+')
+
+
+    def clear(self):
+        '''Remove all basic blocks from the table.'''
+        super(MMBasicBlockTable, self).clear()
+        self._pending_instruction_counts = []
+        self._pending_instruction_offsets = []
+        self._save('instruction_counts', numpy.zeros(0, dtype=numpy.uint32))
+        self._save('instruction_indices', numpy.zeros(0, dtype=numpy.uint64))
+        self._save('instruction_offsets', numpy.zeros(0, dtype=numpy.uint32))
+        self._save('functions', numpy.zeros(0, dtype=numpy.int64))
+        self._reload()
+
+
+    def set_functions(self, rows, function):
+        '''
+        Assign basic blocks to a function.
+
+        :param rows: Rows of basic blocks belonging to the function.
+        :param function: Row of the function's entry point basic block.
+        '''
+        self.functions[rows] = function
+
+
+    def get_instruction_addresses(self, i):
+        '''
+        Get the addresses of the instructions in the *i*-th basic block.
+
+        :param i: Row of basic block.
+        :returns: Array of instruction addresses.
+        :rtype: ``numpy.ndarray``
+        '''
+        j = self.instruction_indices[i]
+        k = j + self.instruction_counts[i]
+        return self.instruction_offsets[j:k] + self.start_addresses[i]
+
+
+    def get_last_instruction_addresses(self):
+        '''
+        Get the addresses of the last instructions of all basic blocks.
+
+        :returns: Array of instruction addresses.
+        :rtype: ``numpy.ndarray``
+        '''
+        last = self.instruction_indices + self.instruction_counts - 1
+        return self.start_addresses + self.instruction_offsets[last]
+
+
+    def get_sizes(self):
+        '''
+        Get the sizes, in bytes, of all basic blocks.
+
+        :returns: Array of basic block sizes.
+        :rtype: ``numpy.ndarray``
+        '''
+        return self.end_addresses - self.start_addresses
+
+
+    def get_basic_block(self, i):
+        '''
+        Build a :class:`basic_block.BasicBlock` instance for the *i*-th basic
+        block.
+
+        :param i: Row of basic block.
+        :returns: The basic block instance.
+        :rtype: :class:`basic_block.BasicBlock`
+        '''
+        return basic_block.BasicBlock(long(self.start_addresses[i]),
+            long(self.end_addresses[i]),
+            self.get_instruction_addresses(i).tolist())
+
+
+    def iter_basic_blocks(self):
+        '''
+        Stream all basic blocks, in increasing address order, as tuples holding
+        the start address, the end address and the address of the last
+        instruction of each basic block.
+
+        :returns: Generator of 3-tuples.
+        :rtype: ``generator``
+        '''
+
+        last_instruction_addresses = self.get_last_instruction_addresses()
+
+        for i in xrange(0, len(self), CHUNK_SIZE):
+            j = i + CHUNK_SIZE
+            for row in zip(self.start_addresses[i:j].tolist(),
+                    self.end_addresses[i:j].tolist(),
+                    last_instruction_addresses[i:j].tolist()):
+                yield row
+
+
+    def close(self):
+        '''Flush and close the table.'''
+        super(MMBasicBlockTable, self).close()
+        if isinstance(self.functions, numpy.memmap):
+            self.functions.flush()
+        self.instruction_counts = numpy.zeros(0, dtype=numpy.uint32)
+        self.instruction_indices = numpy.zeros(0, dtype=numpy.uint64)
+        self.instruction_offsets = numpy.zeros(0, dtype=numpy.uint32)
+        self.functions = numpy.zeros(0, dtype=numpy.int64)
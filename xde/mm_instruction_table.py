@@ -0,0 +1,355 @@
+'''
+:mod:`mm_instruction_table` -- Table of decoded instructions
+============================================================
+
+.. module: mm_instruction_table
+   :platform: Unix, Windows
+   :synopsis: Table of decoded instructions
+.. moduleauthor:: huku <huku@grhack.net>
+
+
+About
+-----
+Keeps the properties of decoded instructions that are needed by later analysis
+passes, so that instructions don't have to be decoded again. The table is a
+memory mapped array of fixed size records, sorted by instruction address. Each
+record holds the following fields:
+
+* **address** -- The instruction's address.
+
+* **length** -- The instruction's length in bytes.
+
+* **iclass**, **iform**, **category** -- The instruction's XED class, form and
+  category.
+
+* **flags** -- Combination of :data:`F_WRITES_PROGRAM_COUNTER`, set if the
+  instruction writes the program counter, and :data:`F_BRANCH_TARGET`, set if
+  **branch_target** is valid.
+
+* **branch_target** -- Absolute target address of direct branches.
+
+* **memory_operands** -- Number of memory operands.
+
+* **memory_operand_kinds** -- Two bits for each memory operand; the lower is
+  set if the operand is read and the higher if the operand is written.
+
+Records are looked up by binary searching the address field, while arrays of
+addresses can be mapped to records in a single vectorized search:
+
+.. code-block:: python
+
+   table = MMInstructionTable('/tmp/instruction_table')
+   table.add(insn, writes_program_counter)
+   table.flush()
+
+   record = table.get(address)
+   print record.length, record.branch_target
+
+The table is stored in NumPy's ``.npy`` format and is reloaded when the table is
+instantiated again on the same directory.
+
+
+Classes
+-------
+'''
+
+__author__ = 'huku <huku@grhack.net>'
+
+
+import sys
+import os
+import collections
+
+try:
+    import numpy
+except ImportError:
+    sys.exit('NumPy not installed?')
+
+try:
+    import pyxed
+except ImportError:
+    sys.exit('Pyxed not installed?')
+
+
+F_WRITES_PROGRAM_COUNTER = 1    # Instruction writes the program counter
+F_BRANCH_TARGET = 2             # Instruction has a direct branch target
+
+
+# Memory operand kinds; shifted left by twice the memory operand's index.
+MEMORY_OPERAND_READ = 1
+MEMORY_OPERAND_WRITTEN = 2
+
+
+# Type of table records.
+RECORD = numpy.dtype([
+    ('address', numpy.uint64),
+    ('branch_target', numpy.uint64),
+    ('iclass', numpy.uint16),
+    ('iform', numpy.uint16),
+    ('length', numpy.uint8),
+    ('category', numpy.uint8),
+    ('flags', numpy.uint8),
+    ('memory_operands', numpy.uint8),
+    ('memory_operand_kinds', numpy.uint8)
+])
+
+
+# Python view of a table record, as returned by :func:`MMInstructionTable.get()`.
+InstructionRecord = collections.namedtuple('InstructionRecord', RECORD.names)
+
+
+# Forms of direct, unconditional branches. All conditional branches, apart from
+# XEND, are direct.
+DIRECT_BRANCH_IFORMS = frozenset([
+    pyxed.XED_IFORM_JMP_RELBRb,
+    pyxed.XED_IFORM_JMP_RELBRd,
+    pyxed.XED_IFORM_JMP_RELBRz,
+    pyxed.XED_IFORM_JMP_FAR_PTRp_IMMw,
+    pyxed.XED_IFORM_CALL_NEAR_RELBRz,
+    pyxed.XED_IFORM_CALL_NEAR_RELBRd,
+    pyxed.XED_IFORM_CALL_FAR_PTRp_IMMw
+])
+
+
+# Maximum number of records kept in main memory before they are merged in the
+# table.
+PENDING_BUDGET = 1024 * 1024
+
+
+
+class MMInstructionTable(object):
+    '''
+    Sorted, memory mapped table of decoded instruction records.
+
+    .. automethod:: __init__
+    .. automethod:: _load
+    .. automethod:: _make_record
+    '''
+
+    def __init__(self, dirname):
+        '''
+        :param dirname: Directory where the table will be stored. The directory
+            is created if it does not exist.
+        '''
+
+        # Create container directory if not there.
+        if os.access(dirname, os.F_OK) == False:
+            os.makedirs(dirname, 0750)
+
+        self.dirname = dirname
+
+        # Records added but not flushed yet, as tuples and as record arrays.
+        self._pending_records = []
+        self._pending_arrays = []
+
+        # Load existing table, if any.
+        self.records = self._load()
+
+
+    def __del__(self):
+        self.close()
+
+
+    def __len__(self):
+        return len(self.records)
+
+
+
+    def _load(self):
+        '''
+        Memory map the table's records. An empty array is returned if the table
+        has not been saved yet.
+
+        :returns: The memory mapped record array.
+        :rtype: ``numpy.ndarray``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        filename = '%s/records.npy' % self.dirname
+        if os.access(filename, os.F_OK):
+            r = numpy.load(filename, mmap_mode='r')
+        else:
+            r = numpy.zeros(0, dtype=RECORD)
+        return r
+
+
+    def _make_record(self, insn, writes_program_counter):
+        '''
+        Build a table record for a decoded instruction.
+
+        :param insn: The :class:`instruction.Instruction` to build a record for.
+        :param writes_program_counter: ``True`` if *insn* writes the program
+            counter.
+        :returns: The table record as a tuple.
+        :rtype: ``tuple``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        iform = insn.get_iform()
+        category = insn.get_category()
+
+        flags = 0
+        if writes_program_counter:
+            flags |= F_WRITES_PROGRAM_COUNTER
+
+        branch_target = 0
+        if iform in DIRECT_BRANCH_IFORMS or (iform != pyxed.XED_IFORM_XEND and \
+                category == pyxed.XED_CATEGORY_COND_BR):
+            flags |= F_BRANCH_TARGET
+            branch_target = insn.get_branch_displacement() & 0xffffffffffffffff
+
+        memory_operands = insn.get_number_of_memory_operands()
+        memory_operand_kinds = 0
+        for i in range(min(memory_operands, 4)):
+            if insn.mem_is_read(i):
+                memory_operand_kinds |= MEMORY_OPERAND_READ << (i * 2)
+            if insn.mem_is_written(i):
+                memory_operand_kinds |= MEMORY_OPERAND_WRITTEN << (i * 2)
+
+        return (insn.runtime_address, branch_target, insn.get_iclass(), iform,
+            insn.get_length(), category, flags, memory_operands,
+            memory_operand_kinds)
+
+
+
+    def add(self, insn, writes_program_counter):
+        '''
+        Add a decoded instruction in the table. Records are kept in main memory
+        until :func:`flush()` is called, or until :data:`PENDING_BUDGET` records
+        have been added.
+
+        :param insn: The :class:`instruction.Instruction` to add.
+        :param writes_program_counter: ``True`` if *insn* writes the program
+            counter.
+        '''
+        self._pending_records.append(self._make_record(insn,
+            writes_program_counter))
+        if len(self._pending_records) >= PENDING_BUDGET:
+            self.flush()
+
+
+    def add_records(self, records):
+        '''
+        Add an array of records, e.g. the records of another table, in the
+        table. The table is not updated until :func:`flush()` is called.
+
+        :param records: Array of records of type :data:`RECORD`.
+        '''
+        self._pending_arrays.append(numpy.array(records, dtype=RECORD))
+
+
+    def flush(self):
+        '''
+        Merge pending records in the table and write the updated table on disk.
+        Records of instructions added more than once are replaced by the most
+        recently added one.
+        '''
+
+        if len(self._pending_records) or len(self._pending_arrays):
+            records = [self.records] + self._pending_arrays
+            records.append(numpy.array(self._pending_records, dtype=RECORD))
+            records = numpy.concatenate(records)
+
+            # Stable sort by address and keep the last of each run of records
+            # with equal addresses.
+            rows = numpy.argsort(records['address'], kind='mergesort')
+            records = records[rows]
+            last = numpy.ones(len(records), dtype=numpy.bool_)
+            last[:-1] = records['address'][1:] != records['address'][:-1]
+
+            numpy.save('%s/records.npy' % self.dirname, records[last])
+
+            self._pending_records = []
+            self._pending_arrays = []
+            self.records = self._load()
+
+
+    def clear(self):
+        '''Remove all records from the table.'''
+        self._pending_records = []
+        self._pending_arrays = []
+        self.records = numpy.zeros(0, dtype=RECORD)
+        numpy.save('%s/records.npy' % self.dirname, self.records)
+
+
+    def get_row(self, address):
+        '''
+        Return the row of the record of the instruction at *address*.
+
+        :param address: Address of instruction to look up.
+        :returns: Index in :attr:`records` or -1 if not found.
+        :rtype: ``int``
+        '''
+
+        addresses = self.records['address']
+        i = int(numpy.searchsorted(addresses, address))
+        if i >= len(addresses) or addresses[i] != address:
+            i = -1
+        return i
+
+
+    def get(self, address):
+        '''
+        Return the record of the instruction at *address*.
+
+        :param address: Address of instruction to look up.
+        :returns: The instruction's record or ``None``.
+        :rtype: :class:`InstructionRecord`
+        '''
+
+        r = None
+
+        i = self.get_row(address)
+        if i >= 0:
+            r = InstructionRecord._make(self.records[i].tolist())
+
+        return r
+
+
+    def lookup_many(self, addresses):
+        '''
+        Map an array of instruction addresses to the rows of their records, in
+        a single pass.
+
+        :param addresses: Array, or any sequence, of addresses to look up.
+        :returns: Array of indices in :attr:`records`, or -1 for addresses with
+            no record.
+        :rtype: ``numpy.ndarray``
+        '''
+
+        addresses = numpy.asarray(addresses, dtype=numpy.uint64)
+        table_addresses = self.records['address']
+
+        r = numpy.searchsorted(table_addresses, addresses).astype(numpy.int64)
+
+        found = r < len(table_addresses)
+        found[found] = table_addresses[r[found]] == addresses[found]
+        r[~found] = -1
+
+        return r
+
+
+    def get_flags(self, rows):
+        '''
+        Return the flags of the records at *rows*, as returned by
+        :func:`lookup_many()`.
+
+        :param rows: Array of indices in :attr:`records`, or -1.
+        :returns: Array of flags, 0 for rows equal to -1.
+        :rtype: ``numpy.ndarray``
+        '''
+
+        rows = numpy.asarray(rows, dtype=numpy.int64)
+        found = rows >= 0
+
+        r = numpy.zeros(len(rows), dtype=numpy.uint8)
+        r[found] = self.records['flags'][rows[found]]
+
+        return r
+
+
+    def close(self):
+        '''Flush and close the table.'''
+        self.flush()
+        self.records = numpy.zeros(0, dtype=RECORD)
@@ -0,0 +1,236 @@
+'''
+:mod:`mm_section_data` -- Memory mapped section contents
+========================================================
+
+.. module: mm_section_data
+   :platform: Unix, Windows
+   :synopsis: Memory mapped section contents
+.. moduleauthor:: huku <huku@grhack.net>
+
+
+About
+-----
+Serves the contents of a program's sections from memory mapped files, so that
+they need not be kept in main memory as Python strings. The decoder and NumPy
+views read the mapped pages directly, while :func:`MMSectionData.read()` returns
+copies of the bytes requested. Each section's bytes are stored in a file named
+after the section's address range, which is created from the data returned by
+the loader the first time the section is accessed and is reused by later
+sessions. The size of each file is recorded in a fingerprint file next to it; a
+file whose size doesn't match its fingerprint, or exceeds the size of the
+section's address range, is created anew:
+
+.. code-block:: python
+
+   section_data = MMSectionData('/tmp/section_data')
+   decoder.itext = section_data.get_buffer(section)
+   print repr(section_data.read(section, address, 4))
+
+Memory maps are read-only and are created lazily, so sections never accessed
+cost nothing, while accessed ones only cost the page faults actually taken.
+:func:`MMSectionData.get_array()` returns a NumPy view of the same pages for
+vectorized readers.
+
+
+Classes
+-------
+'''
+
+__author__ = 'huku <huku@grhack.net>'
+
+
+import sys
+import os
+import mmap
+
+try:
+    import numpy
+except ImportError:
+    sys.exit('NumPy not installed?')
+
+
+
+class MMSectionData(object):
+    '''
+    Memory mapped contents of a program's sections.
+
+    .. automethod:: __init__
+    .. automethod:: _get_filename
+    .. automethod:: _is_valid
+    .. automethod:: _write
+    .. automethod:: _map
+    '''
+
+    def __init__(self, dirname):
+        '''
+        :param dirname: Directory where the section files will be stored. The
+            directory is created if it does not exist.
+        '''
+
+        # Create container directory if not there.
+        if os.access(dirname, os.F_OK) == False:
+            os.makedirs(dirname, 0750)
+
+        self.dirname = dirname
+
+        # Maps section start addresses to memory mapped section contents.
+        self._buffers = {}
+
+
+    def __del__(self):
+        self.close()
+
+
+
+    def _get_filename(self, section):
+        '''
+        Return the name of the file holding the contents of *section*.
+
+        :param section: The section whose file name to return.
+        :returns: The file name.
+        :rtype: ``str``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        return '%s/%#x-%#x' % (self.dirname, section.start_address,
+            section.end_address)
+
+
+    def _is_valid(self, section, filename):
+        '''
+        Check if file *filename* can be trusted to hold the contents of
+        *section*. The file's size should match the one recorded in its
+        fingerprint file and shouldn't exceed the size of the section's address
+        range. The section's data, which the loader may read lazily, is not
+        touched.
+
+        :param section: The section whose file to check.
+        :param filename: Name of the section's file.
+        :returns: ``True`` if the file is valid, ``False`` otherwise.
+        :rtype: ``bool``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        r = False
+
+        if os.access(filename, os.F_OK) and \
+                os.access('%s.size' % filename, os.F_OK):
+            size = os.path.getsize(filename)
+            with open('%s.size' % filename, 'rb') as fp:
+                fingerprint = fp.read().strip()
+            r = fingerprint == str(size) and \
+                size <= section.end_address - section.start_address + 1
+
+        return r
+
+
+    def _write(self, filename, data):
+        '''
+        Write *data* in file *filename*, followed by its fingerprint. Files are
+        written under a temporary name and renamed once complete, so that a
+        partially written file is never trusted.
+
+        :param filename: Name of the file to write.
+        :param data: Data to write in the file.
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        for name, contents in [(filename, data),
+                ('%s.size' % filename, '%d\n' % len(data))]:
+            with open('%s.tmp' % name, 'wb') as fp:
+                fp.write(contents)
+            if os.access(name, os.F_OK):
+                os.unlink(name)
+            os.rename('%s.tmp' % name, name)
+
+
+    def _map(self, section):
+        '''
+        Memory map the contents of *section*, creating the section's file if it
+        doesn't exist or isn't valid (see :func:`_is_valid()`).
+
+        :param section: The section to map.
+        :returns: The memory map, or an empty string for sections with no data.
+        :rtype: ``mmap.mmap``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        filename = self._get_filename(section)
+
+        if not self._is_valid(section, filename):
+            self._write(filename, section.data)
+
+        size = os.path.getsize(filename)
+
+        # Empty files can't be memory mapped.
+        r = ''
+        if size > 0:
+            with open(filename, 'rb') as fp:
+                r = mmap.mmap(fp.fileno(), size, access=mmap.ACCESS_READ)
+
+        return r
+
+
+
+    def get_buffer(self, section):
+        '''
+        Return the contents of *section* as a read-only buffer, suitable for
+        passing to the decoder.
+
+        :param section: The section whose contents to return.
+        :returns: The memory mapped section contents.
+        :rtype: ``mmap.mmap``
+        '''
+        r = self._buffers.get(section.start_address)
+        if r is None:
+            r = self._buffers[section.start_address] = self._map(section)
+        return r
+
+
+    def get_array(self, section):
+        '''
+        Return the contents of *section* as a read-only NumPy array viewing the
+        memory mapped pages.
+
+        :param section: The section whose contents to return.
+        :returns: Array of type ``uint8``.
+        :rtype: ``numpy.ndarray``
+        '''
+        r = numpy.zeros(0, dtype=numpy.uint8)
+        buf = self.get_buffer(section)
+        if len(buf) > 0:
+            r = numpy.frombuffer(buf, dtype=numpy.uint8)
+        return r
+
+
+    def read(self, section, address, length):
+        '''
+        Read *length* bytes starting at address *address* of section *section*.
+
+        :param section: The section holding *address*.
+        :param address: Address to read data from.
+        :param length: Number of bytes to read.
+        :returns: A string of *length* bytes, or ``None`` if the bytes are not
+            backed by the section's data.
+        :rtype: ``str``
+        '''
+
+        r = None
+
+        offset = address - section.start_address
+        buf = self.get_buffer(section)
+        if 0 <= offset and offset + length <= len(buf):
+            r = buf[offset:offset + length]
+
+        return r
+
+
+    def close(self):
+        '''Unmap all sections.'''
+        for buf in self._buffers.itervalues():
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+        self._buffers = {}
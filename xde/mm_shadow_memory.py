@@ -0,0 +1,280 @@
+'''
+:mod:`mm_shadow_memory` -- Shadow memory implementation on memory mapped files
+==============================================================================
+
+.. module: mm_shadow_memory
+   :platform: Unix, Windows
+   :synopsis: Shadow memory implementation on memory mapped files
+.. moduleauthor:: huku <huku@grhack.net>
+
+
+About
+-----
+A drop-in replacement for :class:`em_shadow_memory.EMShadowMemory` that keeps
+the shadow bytes of each memory range in a plain memory mapped file, one byte
+per program byte. Shadow bytes hold the very same ``M_*`` flags defined in
+:mod:`em_shadow_memory`, but, unlike the external memory list based backend,
+no serialization takes place when reading or writing them.
+
+Each memory mapped file is accessed through a ``numpy.memmap`` array of type
+``uint8``. Range operations are performed on whole array slices, so marking or
+checking an instruction's bytes costs a single bulk operation instead of one
+round-trip per byte:
+
+.. code-block:: python
+
+   shadow[j:j + length] |= mark
+
+Memory ranges are kept sorted by start address, so locating the range that
+backs an address is a simple binary search, as shown below:
+
+.. code-block:: python
+
+   i = bisect.bisect_right(start_addresses, address) - 1
+
+This is the default backend of :class:`disassembler.Disassembler`; the external
+memory list based one can still be selected when instantiating it.
+
+
+Classes
+-------
+'''
+
+__author__ = 'huku <huku@grhack.net>'
+
+
+import sys
+import os
+import bisect
+
+try:
+    import numpy
+except ImportError:
+    sys.exit('NumPy not installed?')
+
+from em_shadow_memory import EMShadowMemory
+
+
+# Initial and maximum number of shadow bytes examined at once by the scanning
+# functions. Scanning starts with small windows, since matches are usually
+# close, and doubles the window size on each miss.
+MIN_SCAN_WINDOW = 4096
+MAX_SCAN_WINDOW = 1024 * 1024
+
+
+
+class MMShadowMemory(EMShadowMemory):
+    '''
+    A class that implements a simple, sparse, 1-1 shadow memory model on top of
+    memory mapped files.
+
+    .. automethod:: __init__
+    .. automethod:: _get_shadow_memory_filename
+    .. automethod:: _make_shadow_memory
+    .. automethod:: _get_shadow_memory_coordinates
+    .. automethod:: _mark
+    .. automethod:: _unmark
+    .. automethod:: _is_marked
+    .. automethod:: _mark_range
+    .. automethod:: _unmark_range
+    .. automethod:: _is_marked_range
+    .. automethod:: _mark_many
+    .. automethod:: _find_next_in_range
+    .. automethod:: _find_prev_in_range
+    '''
+
+    def __init__(self, dirname, memory_ranges):
+        '''
+        :param dirname: Directory where the memory mapped files will be stored.
+            The directory is created if it does not exist.
+        :param memory_ranges: Memory ranges that will be shadowed.
+        '''
+
+        super(MMShadowMemory, self).__init__(dirname, memory_ranges)
+
+        # Start and end addresses of the merged memory ranges, used for binary
+        # searching the range that backs a given address.
+        self._start_addresses = [s for s, _ in self.memory_ranges]
+        self._end_addresses = [e for _, e in self.memory_ranges]
+
+
+    def __del__(self):
+        self.close()
+
+
+    def _get_shadow_memory_filename(self, dirname, memory_range):
+        '''
+        Return the name of the memory mapped file backing *memory_range*.
+
+        :param dirname: Directory where memory mapped files are stored.
+        :param memory_range: Memory range whose file name to return.
+        :returns: Path to the memory mapped file.
+        :rtype: ``str``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        return '%s/%#x-%#x.mm' % (dirname, memory_range[0], memory_range[1])
+
+
+    def _make_shadow_memory(self, dirname, memory_range):
+        '''
+        Make shadow memory for the given memory range. If a file of the correct
+        size already exists, its contents are preserved.
+
+        :param dirname: Directory where the memory mapped file will be stored.
+        :param memory_range: Memory range to be shadowed.
+        :returns: Memory mapped array holding *memory_range*'s shadow bytes.
+        :rtype: ``numpy.memmap``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        start_address, end_address = memory_range
+        filename = self._get_shadow_memory_filename(dirname, memory_range)
+        size = end_address - start_address + 1
+
+        # Create the file, or reset it if its size doesn't match, and fill it
+        # with `M_NONE' bytes.
+        if not os.access(filename, os.F_OK) or os.path.getsize(filename) != size:
+            with open(filename, 'wb') as fp:
+                fp.truncate(size)
+
+        return numpy.memmap(filename, dtype=numpy.uint8, mode='r+', shape=(size,))
+
+
+    def _get_shadow_memory_coordinates(self, address):
+        '''
+        Given an arbitrary address, return the index of the shadowed memory
+        range that contains it and the index of the addressed byte in the memory
+        range. Unlike the base class, the range is located by binary searching
+        the sorted range start addresses.
+
+        Raises ``RuntimeError`` if *address* is not backed by this shadow memory.
+
+        :param address: The address whose coordinates to return.
+        :returns: A tuple holding the *shadow memory coordinates* of *address*.
+        :rtype: ``tuple``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        i = bisect.bisect_right(self._start_addresses, address) - 1
+        if i < 0 or address > self._end_addresses[i]:
+            raise RuntimeError('Address %#x not backed by shadow memory' % address)
+
+        return (i, address - self._start_addresses[i])
+
+
+    def _mark(self, address, mark):
+        if self.listeners:
+            self._notify(address, 1)
+        i, j = self._get_shadow_memory_coordinates(address)
+        self.shadows[i][j] |= mark
+
+
+    def _unmark(self, address, mark):
+        if self.listeners:
+            self._notify(address, 1)
+        i, j = self._get_shadow_memory_coordinates(address)
+        self.shadows[i][j] &= ~mark & 0xff
+
+
+    def _is_marked(self, address, mark):
+        i, j = self._get_shadow_memory_coordinates(address)
+        return self.shadows[i][j] & mark == mark
+
+
+    def _mark_range(self, address, length, mark):
+        if length > 0:
+            if self.listeners:
+                self._notify(address, length)
+            i, j = self._get_shadow_memory_coordinates(address)
+            self.shadows[i][j:j + length] |= mark
+
+
+    def _unmark_range(self, address, length, mark):
+        if length > 0:
+            if self.listeners:
+                self._notify(address, length)
+            i, j = self._get_shadow_memory_coordinates(address)
+            self.shadows[i][j:j + length] &= ~mark & 0xff
+
+
+    def _is_marked_range(self, address, length, mark):
+        i, j = self._get_shadow_memory_coordinates(address)
+
+        # Look for the first byte in the slice that doesn't carry `mark'. Its
+        # index is the number of leading bytes that do.
+        mismatches = self.shadows[i][j:j + length] & mark != mark
+        r = 0
+        if mismatches.size > 0:
+            r = int(mismatches.argmax())
+            if not mismatches[r]:
+                r = mismatches.size
+
+        return r
+
+
+    def _mark_many(self, addresses, mark):
+        addresses = numpy.asarray(addresses, dtype=numpy.uint64)
+        if addresses.size == 0:
+            return
+
+        if self.listeners:
+            for address in addresses.tolist():
+                self._notify(address, 1)
+
+        # Group addresses by the memory range that backs them and mark each
+        # group with a single fancy indexing operation.
+        start_addresses = numpy.array(self._start_addresses, dtype=numpy.uint64)
+        ranges = numpy.searchsorted(start_addresses, addresses, side='right') - 1
+        for i in numpy.unique(ranges).tolist():
+            selected = addresses[ranges == i]
+            if i < 0 or int(selected.max()) > self._end_addresses[i]:
+                address = int(selected.min() if i < 0 else selected.max())
+                raise RuntimeError('Address %#x not backed by shadow memory' % \
+                    address)
+            indices = (selected - start_addresses[i]).astype(numpy.intp)
+            self.shadows[i][indices] |= mark
+
+
+    def _find_next_in_range(self, i, j, limit, mask, value):
+        shadow = self.shadows[i]
+        window = MIN_SCAN_WINDOW
+        while j < limit:
+            k = min(j + window, limit)
+            matches = numpy.flatnonzero(shadow[j:k] & mask == value)
+            if matches.size > 0:
+                return j + int(matches[0])
+            window = min(window * 2, MAX_SCAN_WINDOW)
+            j = k
+        return None
+
+
+    def _find_prev_in_range(self, i, j, limit, mask, value):
+        shadow = self.shadows[i]
+        window = MIN_SCAN_WINDOW
+        while j >= limit:
+            k = max(j - window + 1, limit)
+            matches = numpy.flatnonzero(shadow[k:j + 1] & mask == value)
+            if matches.size > 0:
+                return k + int(matches[-1])
+            window = min(window * 2, MAX_SCAN_WINDOW)
+            j = k - 1
+        return None
+
+
+
+    # Public API begins here.
+
+    def open(self):
+        '''Open, or re-open, shadow memory.'''
+        self.close()
+        self.shadows = [self._make_shadow_memory(self.dirname, memory_range) \
+            for memory_range in self.memory_ranges]
+
+    def close(self):
+        '''Flush and close shadow memory.'''
+        for shadow in self.shadows:
+            shadow.flush()
+        self.shadows = []
@@ -0,0 +1,280 @@
+'''
+:mod:`mm_superset_table` -- Superset disassembly of executable sections
+=======================================================================
+
+.. module: mm_superset_table
+   :platform: Unix, Windows
+   :synopsis: Superset disassembly of executable sections
+.. moduleauthor:: huku <huku@grhack.net>
+
+
+About
+-----
+Holds the result of decoding an instruction at every byte offset of a program's
+executable sections, a technique known as *superset disassembly*. Analyses that
+only need an instruction's length, category, class or branch target, like code
+probes, can look them up in the table instead of invoking the decoder. Each
+section has its own table; a memory mapped array with one record per byte
+offset, holding the following fields:
+
+* **target** -- The absolute branch displacement, as computed by
+  :func:`instruction.Instruction.get_branch_displacement()`.
+
+* **iclass** -- The instruction's XED class.
+
+* **length** -- The instruction's length in bytes, or 0 if the bytes at this
+  offset don't decode to a valid instruction.
+
+* **category** -- The instruction's XED category.
+
+Building the tables is expensive, so it can be distributed among several worker
+processes, each decoding a chunk of a section and writing its records directly
+in the table's memory mapped file:
+
+.. code-block:: python
+
+   table = MMSupersetTable('/tmp/superset_table')
+   table.build(sections, section_data, decoder_mode, cpu, jobs=4)
+
+   records = table.get_records(section)
+   print records[address - section.start_address]['length']
+
+Tables are stored in NumPy's ``.npy`` format and are reused when the table is
+instantiated again on the same directory.
+
+
+Classes
+-------
+'''
+
+__author__ = 'huku <huku@grhack.net>'
+
+
+import sys
+import os
+import multiprocessing
+
+try:
+    import numpy
+except ImportError:
+    sys.exit('NumPy not installed?')
+
+try:
+    import pyxed
+except ImportError:
+    sys.exit('Pyxed not installed?')
+
+import instruction
+
+
+# Type of table records.
+RECORD = numpy.dtype([
+    ('target', numpy.uint64),
+    ('iclass', numpy.uint16),
+    ('length', numpy.uint8),
+    ('category', numpy.uint8)
+])
+
+
+# Number of byte offsets decoded by each worker task.
+CHUNK_SIZE = 1024 * 1024
+
+
+# Build state used by worker processes.
+_build = None
+
+
+def _build_chunk(args):
+    '''
+    Entry point of worker processes. Forwards the call to
+    :func:`MMSupersetTable._build_chunk()`.
+
+    .. warning:: This is a private function, don't use it directly.
+    '''
+    table, sections, section_data, decoder_mode, cpu = _build
+    return table._build_chunk(sections, section_data, decoder_mode, cpu, *args)
+
+
+
+class MMSupersetTable(object):
+    '''
+    Memory mapped superset disassembly tables of executable sections.
+
+    .. automethod:: __init__
+    .. automethod:: _get_filename
+    .. automethod:: _build_chunk
+    '''
+
+    def __init__(self, dirname):
+        '''
+        :param dirname: Directory where the tables will be stored. The directory
+            is created if it does not exist.
+        '''
+
+        # Create container directory if not there.
+        if os.access(dirname, os.F_OK) == False:
+            os.makedirs(dirname, 0750)
+
+        self.dirname = dirname
+
+        # Maps section start addresses to memory mapped tables.
+        self._records = {}
+
+
+    def _get_filename(self, section):
+        '''
+        Return the name of the file holding the table of *section*.
+
+        :param section: The section whose file name to return.
+        :returns: The file name.
+        :rtype: ``str``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+        return '%s/%#x-%#x.npy' % (self.dirname, section.start_address,
+            section.end_address)
+
+
+    def _build_chunk(self, sections, section_data, decoder_mode, cpu, i, start,
+            end):
+        '''
+        Decode an instruction at each byte offset from *start* up to, but not
+        including, *end* of the *i*-th section in *sections* and write the
+        records in the section's table.
+
+        :param sections: List of sections whose tables are being built.
+        :param section_data: The :class:`mm_section_data.MMSectionData` serving
+            the sections' contents.
+        :param decoder_mode: Machine mode and address width passed to the
+            decoder's ``set_mode()``.
+        :param cpu: The :class:`cpu.CPU` instance corresponding to the CPU that
+            decodes the instructions.
+        :param i: Index of section to decode.
+        :param start: First byte offset to decode.
+        :param end: Byte offset where decoding stops.
+        :returns: Number of valid instructions decoded.
+        :rtype: ``int``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        section = sections[i]
+
+        decoder = pyxed.Decoder()
+        decoder.set_mode(*decoder_mode)
+        decoder.itext = section_data.get_buffer(section)
+        decoder.runtime_address = section.start_address
+
+        offsets = []
+        records = []
+        for offset in xrange(start, end):
+            decoder.itext_offset = offset
+            try:
+                insn = decoder.decode()
+            except (pyxed.InvalidInstructionError, pyxed.InvalidOffsetError):
+                continue
+
+            if insn is None or insn.get_category() == pyxed.XED_CATEGORY_INVALID:
+                continue
+
+            insn = instruction.Instruction(insn, cpu)
+            offsets.append(offset)
+            records.append((insn.get_branch_displacement() & 0xffffffffffffffff,
+                insn.get_iclass(), insn.get_length(), insn.get_category()))
+
+        # Records of offsets not decoded are left zeroed, i.e. invalid.
+        if len(offsets):
+            table = numpy.load('%s.tmp' % self._get_filename(section),
+                mmap_mode='r+')
+            table[offsets] = numpy.array(records, dtype=RECORD)
+            table.flush()
+            del table
+
+        return len(offsets)
+
+
+
+    def is_built(self, section):
+        '''
+        Check if the table of *section* has been built.
+
+        :param section: The section to check.
+        :returns: ``True`` if the table exists, ``False`` otherwise.
+        :rtype: ``bool``
+        '''
+        return os.access(self._get_filename(section), os.F_OK)
+
+
+    def build(self, sections, section_data, decoder_mode, cpu, jobs=1):
+        '''
+        Build the tables of all sections in *sections* that haven't been built
+        yet. Sections with no contents are skipped.
+
+        :param sections: List of executable sections.
+        :param section_data: The :class:`mm_section_data.MMSectionData` serving
+            the sections' contents.
+        :param decoder_mode: Machine mode and address width passed to the
+            decoder's ``set_mode()``.
+        :param cpu: The :class:`cpu.CPU` instance corresponding to the CPU that
+            decodes the instructions.
+        :param jobs: Number of worker processes.
+        '''
+
+        global _build
+
+        sections = [s for s in sections if not self.is_built(s) and \
+            len(section_data.get_buffer(s)) > 0]
+
+        # Create zeroed tables and split them in chunks. Tables are written in
+        # temporary files, so that interrupted builds are not mistaken for
+        # complete ones.
+        work = []
+        for i, section in enumerate(sections):
+            size = len(section_data.get_buffer(section))
+            table = numpy.lib.format.open_memmap('%s.tmp' % \
+                self._get_filename(section), mode='w+', dtype=RECORD,
+                shape=(size,))
+            del table
+            for start in xrange(0, size, CHUNK_SIZE):
+                work.append((i, start, min(start + CHUNK_SIZE, size)))
+
+        if jobs > 1 and len(work) > 1:
+            _build = (self, sections, section_data, decoder_mode, cpu)
+            pool = multiprocessing.Pool(min(jobs, len(work)))
+            try:
+                pool.map(_build_chunk, work)
+            finally:
+                pool.close()
+                pool.join()
+                _build = None
+        else:
+            for args in work:
+                self._build_chunk(sections, section_data, decoder_mode, cpu,
+                    *args)
+
+        for section in sections:
+            filename = self._get_filename(section)
+            os.rename('%s.tmp' % filename, filename)
+            self._records.pop(section.start_address, None)
+
+
+    def get_records(self, section):
+        '''
+        Return the table of *section*.
+
+        :param section: The section whose table to return.
+        :returns: The memory mapped array of records, indexed by byte offset in
+            the section, or ``None`` if the table hasn't been built.
+        :rtype: ``numpy.ndarray``
+        '''
+
+        r = self._records.get(section.start_address)
+        if r is None and self.is_built(section):
+            r = self._records[section.start_address] = \
+                numpy.load(self._get_filename(section), mmap_mode='r')
+        return r
+
+
+    def close(self):
+        '''Close all tables.'''
+        self._records = {}
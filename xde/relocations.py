@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+'''
+:mod:`relocations` - Relocation analysis
+========================================
+
+.. module: relocations
+   :platform: Unix, Windows
+   :synopsis: Relocation analysis
+.. moduleauthor:: huku <huku@grhack.net>
+
+
+About
+-----
+Normally, relocations form a series of chains. We refer to chains' last
+elements as *relocated leaves*. This module parses the relocation entries of a
+binary and sets the appropriate marks in the program's shadow memory, so that
+the disassembler can later determine if relocated leaves point to code or data.
+
+All relocations are processed in bulk; relocated elements are read from the
+sections' data in a single pass, chains are resolved by joining the array of
+elements with the array of relocation entries and marks are set using
+:func:`em_shadow_memory.EMShadowMemory.mark_all()`:
+
+.. code-block:: python
+
+   invalid = analyze(disasm, relocations, 8)
+
+
+Functions
+---------
+'''
+
+__author__ = 'huku <huku@grhack.net>'
+
+
+import sys
+import heapq
+
+try:
+    import numpy
+except ImportError:
+    sys.exit('NumPy not installed?')
+
+import em_shadow_memory
+
+
+def find_runs(index, addresses, size):
+    '''
+    Find runs of three or more contiguous relocated elements, which usually
+    indicate a data region. Like a left to right scan of each section would,
+    runs are truncated at the end of the section holding their first element,
+    and runs overlapping with a previously found run resume past its end, or
+    are ignored if less than three elements are left.
+
+    :param index: The :class:`section_index.SectionIndex` of the program's
+        sections.
+    :param addresses: Sorted array of addresses holding relocated elements.
+    :param size: Size of pointers in bytes.
+    :returns: Array of addresses of all elements in the runs.
+    :rtype: ``numpy.ndarray``
+    '''
+
+    r = numpy.zeros(0, dtype=numpy.uint64)
+    if len(addresses) < 3:
+        return r
+
+    # Group addresses by their residue modulo `size', so that elements of the
+    # same run end up adjacent, and split the groups into maximal runs of
+    # elements `size' bytes apart.
+    order = numpy.lexsort((addresses, addresses % size))
+    addresses = addresses[order]
+
+    heads = numpy.ones(len(addresses), dtype=numpy.bool_)
+    heads[1:] = addresses[1:] - addresses[:-1] != size
+    heads = numpy.flatnonzero(heads)
+    lengths = numpy.diff(numpy.append(heads, len(addresses)))
+
+    # Consider runs in address order.
+    keep = lengths >= 3
+    runs = zip(addresses[heads[keep]].tolist(), lengths[keep].tolist())
+    runs.sort()
+
+    selected = []
+    end_address = 0
+    while len(runs):
+        address, length = heapq.heappop(runs)
+
+        # Run starts before the end of the previous one; skip the elements
+        # already passed.
+        if address < end_address:
+            skip = (end_address - address + size - 1) // size
+            if length - skip >= 3:
+                heapq.heappush(runs, (address + skip * size, length - skip))
+            continue
+
+        # Elements outside all sections, or at the last byte of one, are never
+        # reached by a scan; drop the first one and retry.
+        section = index.get_section(address)
+        if section is None or address >= section.end_address:
+            if length - 1 >= 3:
+                heapq.heappush(runs, (address + size, length - 1))
+            continue
+
+        # Truncate run at the end of the section, the rest of it is found when
+        # scanning the next section.
+        count = min(length, (section.end_address - address + size - 1) // size)
+        selected.append((address, count))
+        if length - count >= 3:
+            heapq.heappush(runs, (address + count * size, length - count))
+
+        # The scan of the next section starts afresh at its first byte.
+        end_address = min(address + count * size, section.end_address)
+
+    # Expand runs to the addresses of their elements.
+    if len(selected):
+        run_addresses, lengths = numpy.array(selected, dtype=numpy.uint64).T
+        lengths = lengths.astype(numpy.intp)
+        indices = numpy.arange(lengths.sum()) - \
+            numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+        r = numpy.repeat(run_addresses, lengths) + \
+            indices.astype(numpy.uint64) * numpy.uint64(size)
+
+    return r
+
+
+def analyze(disassembler, relocations, size):
+    '''
+    Mark the relocated elements, the relocated leaves and the data regions made
+    of contiguous relocated elements in the shadow memory of *disassembler*.
+
+    :param disassembler: The :class:`disassembler.Disassembler` instance.
+    :param relocations: Sorted array of addresses of relocation entries.
+    :param size: Size of pointers in bytes.
+    :returns: Array of addresses of invalid relocation entries, i.e. entries
+        whose *size* bytes are not mapped.
+    :rtype: ``numpy.ndarray``
+    '''
+
+    shadow = disassembler.shadow
+
+    # Extract the relocated elements.
+    valid, elements = disassembler.read_pointers_many(relocations, size)
+    valid &= disassembler.is_memory_mapped_many(relocations, size)
+
+    addresses = relocations[valid]
+    elements = elements[valid]
+    shadow.mark_all(addresses,
+        em_shadow_memory.M_ANALYZED | em_shadow_memory.M_RELOCATED)
+
+    # An element may point to another relocated element, in which case the
+    # chain continues and the latter is analyzed as a relocation entry on its
+    # own. Otherwise, the element is the leaf entry of the chain.
+    rows = numpy.searchsorted(relocations, elements)
+    rows[rows == len(relocations)] = 0
+    chained = relocations[rows] == elements
+
+    # Sometimes the relocated elements are not mapped addresses (don't know
+    # why, have seen that in Adobe Flash and haven't investigated it further).
+    mapped = disassembler.is_memory_mapped_many(elements)
+    shadow.mark_all(elements[mapped & ~chained],
+        em_shadow_memory.M_RELOCATED_LEAF)
+
+    # Discover data regions by examining contiguous relocated addresses.
+    shadow.mark_all(find_runs(disassembler.section_index, addresses, size),
+        em_shadow_memory.M_HEAD | em_shadow_memory.M_DATA)
+
+    r = relocations[~valid]
+    return r
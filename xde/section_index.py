@@ -0,0 +1,239 @@
+'''
+:mod:`section_index` -- Address to section interval index
+=========================================================
+
+.. module: section_index
+   :platform: Unix, Windows
+   :synopsis: Address to section interval index
+.. moduleauthor:: huku <huku@grhack.net>
+
+
+About
+-----
+Maps addresses to the sections of a program and answers memory protection
+queries without consulting the loader. Section bounds are kept in sorted arrays,
+so locating the section that holds an address is a binary search, while section
+flags are converted to permission bitmasks once, when the index is built:
+
+.. code-block:: python
+
+   index = SectionIndex(loader.sections)
+   if index.has_permissions(address, P_EXECUTE):
+       print 'Executable'
+
+Consecutive queries usually hit the same section, so the most recently hit
+section is checked before binary searching. Arrays of addresses, e.g. jump table
+elements or pointers found by a scan, can be located or checked at once using
+:func:`SectionIndex.get_indices_many()`,
+:func:`SectionIndex.get_permissions_many()` and
+:func:`SectionIndex.has_permissions_many()`.
+
+Like the shadow memory, the index considers the end address of each section
+inclusive.
+
+
+Classes
+-------
+'''
+
+__author__ = 'huku <huku@grhack.net>'
+
+
+import sys
+import bisect
+
+try:
+    import numpy
+except ImportError:
+    sys.exit('NumPy not installed?')
+
+
+P_READ = 1          # Section is readable
+P_WRITE = 2         # Section is writable
+P_EXECUTE = 4       # Section is executable
+P_LOAD = 8          # Section is loaded in memory
+
+
+# Maps section flags to permission bits.
+FLAG_PERMISSIONS = {
+    'r': P_READ,
+    'w': P_WRITE,
+    'x': P_EXECUTE,
+    'l': P_LOAD
+}
+
+
+
+class SectionIndex(object):
+    '''
+    Interval index mapping addresses to sections and their permissions.
+
+    .. automethod:: __init__
+    .. automethod:: _get_index
+    '''
+
+    def __init__(self, sections):
+        '''
+        :param sections: List of the program's sections, sorted by address.
+        '''
+
+        self.sections = sorted(sections, key=lambda s: s.start_address)
+
+        self._start_addresses = [s.start_address for s in self.sections]
+        self._end_addresses = [s.end_address for s in self.sections]
+
+        self.permissions = []
+        for section in self.sections:
+            permissions = 0
+            for flag in section.flags:
+                permissions |= FLAG_PERMISSIONS.get(flag, 0)
+            self.permissions.append(permissions)
+
+        # Arrays used by the vectorized functions.
+        self._start_address_array = numpy.array(self._start_addresses,
+            dtype=numpy.uint64)
+        self._end_address_array = numpy.array(self._end_addresses,
+            dtype=numpy.uint64)
+        self._permission_array = numpy.array(self.permissions + [0],
+            dtype=numpy.uint8)
+
+        # Index of the most recently hit section.
+        self._last = 0
+
+
+    def __len__(self):
+        return len(self.sections)
+
+
+
+    def _get_index(self, address, length):
+        '''
+        Return the index of the section holding *length* bytes starting at
+        *address*.
+
+        :param address: Address to look up.
+        :param length: Number of bytes that should fall within the section.
+        :returns: Index in :attr:`sections` or -1 if not found.
+        :rtype: ``int``
+
+        .. warning:: This is a private function, don't use it directly.
+        '''
+
+        i = self._last
+        if i < len(self._start_addresses) and \
+                self._start_addresses[i] <= address <= self._end_addresses[i]:
+            pass
+        else:
+            i = bisect.bisect_right(self._start_addresses, address) - 1
+            if i < 0 or address > self._end_addresses[i]:
+                return -1
+            self._last = i
+
+        if address + length - 1 > self._end_addresses[i]:
+            i = -1
+
+        return i
+
+
+
+    def get_section(self, address, length=1):
+        '''
+        Return the section holding *length* bytes starting at *address*.
+
+        :param address: Address to look up.
+        :param length: Number of bytes that should fall within the section.
+        :returns: The section object or ``None``.
+        '''
+        r = None
+        i = self._get_index(address, length)
+        if i >= 0:
+            r = self.sections[i]
+        return r
+
+
+    def get_permissions(self, address, length=1):
+        '''
+        Return the permissions of the section holding *length* bytes starting at
+        *address*.
+
+        :param address: Address to look up.
+        :param length: Number of bytes that should fall within the section.
+        :returns: Combination of ``P_*`` bits, 0 if no section holds the bytes.
+        :rtype: ``int``
+        '''
+        r = 0
+        i = self._get_index(address, length)
+        if i >= 0:
+            r = self.permissions[i]
+        return r
+
+
+    def has_permissions(self, address, permissions, length=1):
+        '''
+        Check if *length* bytes starting at *address* fall within a section
+        with all of *permissions*.
+
+        :param address: Address to check.
+        :param permissions: Combination of ``P_*`` bits.
+        :param length: Number of bytes to check.
+        :returns: ``True`` if the section has all permissions, ``False``
+            otherwise.
+        :rtype: ``bool``
+        '''
+        return self.get_permissions(address, length) & permissions == permissions
+
+
+    def get_indices_many(self, addresses, length=1):
+        '''
+        Return the indices, in :attr:`sections`, of the sections holding
+        *length* bytes starting at each address in *addresses*.
+
+        :param addresses: Array, or any sequence, of addresses to look up.
+        :param length: Number of bytes, starting at each address, that should
+            fall within a section.
+        :returns: Array of indices, -1 for addresses not in any section.
+        :rtype: ``numpy.ndarray``
+        '''
+
+        addresses = numpy.asarray(addresses, dtype=numpy.uint64)
+
+        i = numpy.searchsorted(self._start_address_array, addresses,
+            side='right') - 1
+        found = i >= 0
+        found[found] = addresses[found] + numpy.uint64(length - 1) <= \
+            self._end_address_array[i[found]]
+        i[~found] = -1
+
+        return i
+
+
+    def get_permissions_many(self, addresses, length=1):
+        '''
+        Vectorized version of :func:`get_permissions()`.
+
+        :param addresses: Array, or any sequence, of addresses to look up.
+        :param length: Number of bytes, starting at each address, that should
+            fall within a section.
+        :returns: Array of permissions, 0 for addresses not in any section.
+        :rtype: ``numpy.ndarray``
+        '''
+
+        # Addresses not found are mapped to the last element, which is 0.
+        i = self.get_indices_many(addresses, length)
+        return self._permission_array[i]
+
+
+    def has_permissions_many(self, addresses, permissions, length=1):
+        '''
+        Vectorized version of :func:`has_permissions()`.
+
+        :param addresses: Array, or any sequence, of addresses to check.
+        :param permissions: Combination of ``P_*`` bits.
+        :param length: Number of bytes to check, starting at each address.
+        :returns: Boolean array, ``True`` for addresses whose section has all
+            permissions.
+        :rtype: ``numpy.ndarray``
+        '''
+        permissions = numpy.uint8(permissions)
+        return self.get_permissions_many(addresses, length) & permissions == \
+            permissions